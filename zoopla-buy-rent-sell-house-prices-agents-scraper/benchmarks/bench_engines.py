@@ -0,0 +1,88 @@
+"""Thread vs async engine throughput against a local stand-in for Zoopla.
+
+Usage:
+    python benchmarks/bench_engines.py
+    python benchmarks/bench_engines.py --pages 5000 --latency-ms 200
+
+A child process serves pages rendered from the data/ fixtures, holding
+each response for ``--latency-ms`` to stand in for network round trips.
+Both engines then run the property extractor over the same URLs at each
+concurrency level.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import PROJECT_ROOT, build_page  # noqa: E402
+
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from extractors.property_extractor import PropertyExtractor  # noqa: E402
+from utils.proxy_manager import ProxyManager  # noqa: E402
+
+def serve(port: int, latency_ms: int, kind: str) -> None:
+    from aiohttp import web
+
+    body = build_page(kind).encode("utf-8")
+
+    async def page(request: "web.Request") -> "web.Response":
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return web.Response(body=body, content_type="text/html", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", page)
+    web.run_app(app, host="127.0.0.1", port=port, print=None, backlog=4096)
+
+def wait_for_server(port: int) -> None:
+    import socket
+
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Stand-in server did not start")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--kind", default="property_jsonld")
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    server = multiprocessing.Process(
+        target=serve, args=(args.port, args.latency_ms, args.kind), daemon=True
+    )
+    server.start()
+    try:
+        wait_for_server(args.port)
+        urls = [f"http://127.0.0.1:{args.port}/for-sale/{i}/" for i in range(args.pages)]
+        print(f"{'engine':<8}{'concurrency':>12}{'pages/s':>10}{'records':>10}")
+        for concurrency in args.concurrency:
+            for engine in ("thread", "async"):
+                extractor = PropertyExtractor(
+                    proxy_manager=ProxyManager(),
+                    concurrency=concurrency,
+                    engine=engine,
+                )
+                start = time.perf_counter()
+                records = extractor.extract(urls)
+                elapsed = time.perf_counter() - start
+                extractor.http_client.close()
+                print(f"{engine:<8}{concurrency:>12}{len(urls) / elapsed:>10.1f}{len(records):>10}")
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Lookup time of the record index against scanning the output file.
+
+Usage:
+    python benchmarks/bench_geo_index.py
+    python benchmarks/bench_geo_index.py --records 10000 200000
+
+Indexes N sold-price records spread over Great Britain with
+utils.geo_index.RecordIndex, then times radius, bounding-box, postcode
+prefix and district lookups against answering the same question by
+loading house_prices.json and checking every record, which is what
+downstream jobs did before. Both sides must return the same records.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import PROJECT_ROOT  # noqa: E402
+
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from utils.geo_index import RecordIndex, haversine_km  # noqa: E402
+from utils.normalize import clean_coordinates, split_postcode  # noqa: E402
+
+AREAS = ("OX", "SW", "M", "B", "LS", "EH", "CF", "BS", "NE", "G")
+
+def make_records(count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(0)
+    records = []
+    for i in range(count):
+        outward = f"{rng.choice(AREAS)}{rng.randint(1, 30)}"
+        inward = f"{rng.randint(1, 9)}{rng.choice('ABDEFGHJ')}{rng.choice('LNPQRSTU')}"
+        records.append(
+            {
+                "address": f"{i} Example Road, Sometown {outward} {inward}",
+                "price": rng.randrange(80_000, 2_000_000, 500),
+                "date_sold": f"{rng.randint(1, 28)} Mar {rng.randint(1995, 2025)}",
+                "coordinates": {
+                    "latitude": round(rng.uniform(50.0, 58.5), 6),
+                    "longitude": round(rng.uniform(-5.5, 1.7), 6),
+                },
+            }
+        )
+    return records
+
+def scan(path: Path, keep: Callable[[Dict[str, Any]], bool]) -> List[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        return [r for r in json.load(f) if keep(r)]
+
+def _point(record: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    return clean_coordinates(record.get("coordinates"))
+
+def _district(record: Dict[str, Any]) -> Optional[str]:
+    return split_postcode(record.get("address"))[1]
+
+def median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20, help="Index lookups timed per query")
+    args = parser.parse_args()
+
+    lat, lon, km = 51.93, -1.27, 5.0
+    box = (51.5, -1.5, 52.0, -1.0)
+    queries = {
+        "radius 5 km": (
+            lambda index: index.within_radius(lat, lon, km),
+            lambda r: (p := _point(r)) is not None
+            and haversine_km(lat, lon, p["latitude"], p["longitude"]) <= km,
+        ),
+        "bbox": (
+            lambda index: index.within_bbox(*box),
+            lambda r: (p := _point(r)) is not None
+            and box[0] <= p["latitude"] <= box[2]
+            and box[1] <= p["longitude"] <= box[3],
+        ),
+        "postcode OX25": (
+            lambda index: index.by_postcode("OX25"),
+            lambda r: (split_postcode(r.get("address"))[0] or "").replace(" ", "").startswith("OX25"),
+        ),
+        "district OX2": (
+            lambda index: index.by_district("OX2"),
+            lambda r: _district(r) == "OX2",
+        ),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.records:
+            records = make_records(count)
+            dump = Path(tmp) / f"house_prices_{count}.json"
+            dump.write_text(json.dumps(records), encoding="utf-8")
+            index_path = Path(tmp) / f"index_{count}.sqlite3"
+            start = time.perf_counter()
+            index = RecordIndex(str(index_path))
+            for _ in index.indexing("house_prices", records):
+                pass
+            build = time.perf_counter() - start
+            print(
+                f"{count} record(s): indexed in {build:.1f}s ({count / build:.0f}/s), "
+                f"{index_path.stat().st_size / 1e6:.1f} MB index, "
+                f"{dump.stat().st_size / 1e6:.1f} MB JSON"
+            )
+            print(f"  {'query':<15}{'found':>7}{'index ms':>10}{'scan ms':>10}")
+            for name, (lookup, keep) in queries.items():
+                found = lookup(index)
+                scanned = scan(dump, keep)
+                key = lambda r: r["address"]  # noqa: E731
+                if sorted(map(key, found)) != sorted(map(key, scanned)):
+                    sys.exit(f"{name}: index and scan disagree")
+                index_ms = median_ms(lambda: lookup(index), args.repeat)
+                scan_ms = median_ms(lambda: scan(dump, keep), 3)
+                print(f"  {name:<15}{len(found):>7}{index_ms:>10.2f}{scan_ms:>10.0f}")
+            index.close()
+
+if __name__ == "__main__":
+    main()
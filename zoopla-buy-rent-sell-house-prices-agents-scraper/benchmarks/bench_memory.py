@@ -0,0 +1,78 @@
+"""Peak RSS of the output stage against record count.
+
+Usage:
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --records 10000 100000 1000000
+
+Each measurement runs in a fresh interpreter that writes N property
+records, then reports its own peak RSS. "list" is the old path (collect
+every record, then json.dump the whole list); the other modes stream
+records through utils.writers as they are produced.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from corpus import PROJECT_ROOT  # noqa: E402
+
+MODES = ("list", "json", "jsonl", "csv")
+
+def produce(count: int):
+    sys.path.insert(0, str(PROJECT_ROOT / "src"))
+    from utils.parser import parse_property_listings
+    from corpus import property_page
+
+    page = parse_property_listings(property_page(cards=25, filler_kb=1))
+    for i in range(count):
+        record = dict(page[i % len(page)])
+        record["listingId"] = str(i)
+        yield record
+
+def child(mode: str, count: int, out_dir: Path) -> None:
+    sys.path.insert(0, str(PROJECT_ROOT / "src"))
+    from utils.writers import open_writer
+
+    if mode == "list":
+        rows = list(produce(count))
+        with (out_dir / "sample_property.json").open("w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+    else:
+        with open_writer(mode, out_dir, "property") as writer:
+            writer.write_all(produce(count))
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(peak_kb)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with tempfile.TemporaryDirectory() as tmp:
+            child(args.child[0], int(args.child[1]), Path(tmp))
+        return
+
+    print(f"{'records':>10}" + "".join(f"{mode + ' MB':>12}" for mode in args.modes))
+    for count in args.records:
+        row = f"{count:>10}"
+        for mode in args.modes:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, str(count)],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            row += f"{int(out.stdout.strip()) / 1024:>12.1f}"
+        print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Record normalization throughput, row by row against Arrow batches.
+
+Usage:
+    python benchmarks/bench_normalize.py
+    python benchmarks/bench_normalize.py --stream property --batch 25 100 1000
+
+Parses a corpus page, varies its records (prices, dates, addresses) and
+normalizes batches of ``--batch`` records with ``normalize_rows`` and
+``normalize_columns``, checking both give the same output. Arrow only
+pays off on large batches, which is why the extractors collect
+``normalize_batch`` records across pages first, and why
+``normalize_records`` goes row by row below ``COLUMNAR_MIN_RECORDS``.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import PROJECT_ROOT, house_prices_page, property_page  # noqa: E402
+
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from utils.normalize import normalize_columns, normalize_rows  # noqa: E402
+from utils.parser import parse_house_prices, parse_property_listings  # noqa: E402
+
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+def make_records(stream: str, count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(0)
+    if stream == "house_prices":
+        base = parse_house_prices(house_prices_page(rows=200, filler_kb=1))
+    else:
+        base = parse_property_listings(property_page(cards=25, json_ld=True, filler_kb=1))
+    records = []
+    for i in range(count):
+        record = dict(base[i % len(base)])
+        record["price"] = f"£{rng.randrange(100_000, 2_000_000, 500):,}"
+        record["address"] = f"{i} Heyford Fields, Upper Heyford OX25 {rng.randint(1, 9)}AB"
+        if stream == "house_prices":
+            record["date_sold"] = f"{rng.randint(1, 28)} {rng.choice(MONTHS)} {rng.randint(1995, 2025)}"
+        else:
+            record["num_bedrooms"] = f"{rng.randint(1, 6)} beds"
+            record["coordinates"] = {
+                "latitude": 51.3 + rng.random(),
+                "longitude": -0.5 + rng.random(),
+            }
+        records.append(record)
+    return records
+
+def records_per_s(
+    normalize: Callable, stream: str, records: List[Dict[str, Any]], batch: int, min_seconds: float
+) -> float:
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        for i in range(0, len(records), batch):
+            normalize(stream, [dict(r) for r in records[i : i + batch]])
+        done += len(records)
+    return done / (time.perf_counter() - start)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stream", choices=("house_prices", "property"), default="house_prices")
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[25, 200, 1000, 10_000])
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time budget per measurement")
+    args = parser.parse_args()
+
+    records = make_records(args.stream, args.records)
+    check = records[:1000]
+    if normalize_rows(args.stream, [dict(r) for r in check]) != normalize_columns(
+        args.stream, [dict(r) for r in check]
+    ):
+        sys.exit("normalize_rows and normalize_columns disagree")
+
+    print(f"{args.stream}, {len(records)} record(s)")
+    print(f"{'batch':>7}{'rows/s':>12}{'arrow/s':>12}{'speedup':>9}")
+    for batch in args.batch:
+        rows = records_per_s(normalize_rows, args.stream, records, batch, args.seconds)
+        columns = records_per_s(normalize_columns, args.stream, records, batch, args.seconds)
+        print(f"{batch:>7}{rows:>12.0f}{columns:>12.0f}{columns / rows:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
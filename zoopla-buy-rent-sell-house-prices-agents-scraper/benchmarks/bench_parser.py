@@ -0,0 +1,173 @@
+"""Single-core parser throughput over saved or generated Zoopla pages.
+
+Usage:
+    python benchmarks/bench_parser.py
+    python benchmarks/bench_parser.py --pages /path/to/saved/pages
+    python benchmarks/bench_parser.py --src /path/to/other/checkout/src
+    python benchmarks/bench_parser.py --save-pages corpus/
+    python benchmarks/bench_parser.py --json results.json --baseline main.json
+    python benchmarks/bench_parser.py --input str
+
+Saved pages are matched to a parser by file name prefix: ``property*``,
+``agents*`` or ``house_prices*``. ``--save-pages`` writes the generated
+corpus out in that layout, so it can be kept next to real pages and
+reused. Pointing ``--src`` at another checkout gives the before/after
+comparison for a parser change. Pages are handed to the parsers as raw
+bytes, the way the extractors pass on a response body; ``--input str``
+decodes them first instead.
+
+For each page the table shows pages/s, records/s, p50 and p99 latency of
+a single parse, and the peak memory traced while parsing it once.
+``--json`` stores the same numbers; with ``--baseline`` the run exits
+with status 1 if any page's pages/s fell by more than ``--max-slowdown``
+against a stored result.
+"""
+import argparse
+import importlib
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import PAGE_KINDS, PROJECT_ROOT, build_page  # noqa: E402
+
+def load_parsers(src: Path) -> Dict[str, Callable]:
+    sys.path.insert(0, str(src))
+    parser = importlib.import_module("utils.parser")
+    return {
+        "property": parser.parse_property_listings,
+        "agents": parser.parse_agent_listings,
+        "house_prices": parser.parse_house_prices,
+    }
+
+def load_pages(pages_dir: Path = None) -> List[Tuple[str, bytes]]:
+    if pages_dir is None:
+        return [(kind, build_page(kind).encode("utf-8")) for kind in PAGE_KINDS]
+    return [(path.stem, path.read_bytes()) for path in sorted(pages_dir.glob("*.html"))]
+
+def save_pages(pages_dir: Path) -> None:
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    for kind in PAGE_KINDS:
+        (pages_dir / f"{kind}.html").write_text(build_page(kind), encoding="utf-8")
+    print(f"Wrote {len(PAGE_KINDS)} page(s) to {pages_dir}")
+
+def parser_for(name: str, parsers: Dict[str, Callable]) -> Callable:
+    for prefix, func in parsers.items():
+        if name.startswith(prefix):
+            return func
+    raise ValueError(f"Cannot tell which parser handles page {name!r}")
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def peak_alloc(func: Callable, html: Union[str, bytes]) -> int:
+    """Peak bytes allocated by Python while parsing ``html`` once."""
+    tracemalloc.start()
+    try:
+        func(html)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench(func: Callable, html: Union[str, bytes], min_seconds: float) -> Dict[str, float]:
+    records = len(func(html))
+    latencies: List[float] = []
+    start = time.perf_counter()
+    while True:
+        began = time.perf_counter()
+        func(html)
+        latencies.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    latencies.sort()
+    rate = len(latencies) / elapsed
+    return {
+        "kb": round(len(html) / 1024, 1),
+        "records": records,
+        "iterations": len(latencies),
+        "pages_per_s": round(rate, 2),
+        "records_per_s": round(rate * records, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "peak_alloc_kb": round(peak_alloc(func, html) / 1024, 1),
+    }
+
+def regressions(results: Dict, baseline: Dict, max_slowdown: float) -> List[str]:
+    found = []
+    for name, old in baseline.get("pages", {}).items():
+        new = results["pages"].get(name)
+        if new is None:
+            continue
+        change = new["pages_per_s"] / old["pages_per_s"] - 1
+        if change < -max_slowdown:
+            found.append(
+                f"{name}: {old['pages_per_s']:.1f} -> {new['pages_per_s']:.1f} pages/s ({change:+.0%})"
+            )
+    return found
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--src", type=Path, default=PROJECT_ROOT / "src")
+    parser.add_argument("--pages", type=Path, help="Directory of saved *.html pages")
+    parser.add_argument("--save-pages", type=Path, help="Write the generated corpus here and exit")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time budget per page")
+    parser.add_argument(
+        "--input",
+        choices=("bytes", "str"),
+        default="bytes",
+        help="Hand pages to the parsers as raw bytes or as decoded str",
+    )
+    parser.add_argument("--json", type=Path, help="Store results as JSON")
+    parser.add_argument("--baseline", type=Path, help="Earlier --json results to compare against")
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=0.20,
+        help="Allowed drop in pages/s against --baseline (0.20 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    if args.save_pages:
+        save_pages(args.save_pages)
+        return
+
+    parsers = load_parsers(args.src.resolve())
+    results: Dict = {
+        "python": platform.python_version(),
+        "src": str(args.src.resolve()),
+        "seconds": args.seconds,
+        "input": args.input,
+        "pages": {},
+    }
+    print(
+        f"{'page':<22}{'KB':>8}{'records':>9}{'pages/s':>10}{'records/s':>11}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{'alloc KB':>10}"
+    )
+    for name, raw in load_pages(args.pages):
+        html = raw.decode("utf-8", errors="replace") if args.input == "str" else raw
+        row = bench(parser_for(name, parsers), html, args.seconds)
+        results["pages"][name] = row
+        print(
+            f"{name:<22}{row['kb']:>8.0f}{row['records']:>9}{row['pages_per_s']:>10.1f}"
+            f"{row['records_per_s']:>11.0f}{row['p50_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+            f"{row['peak_alloc_kb']:>10.0f}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        found = regressions(results, baseline, args.max_slowdown)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Full pipeline throughput over a replayed archive, per concurrency level.
+
+Usage:
+    python benchmarks/bench_replay.py
+    python benchmarks/bench_replay.py --archive /path/to/recorded/archive
+    python benchmarks/bench_replay.py --latency-ms 300 --error-rate 0.05
+
+Runs ``main.run`` in replay mode, so fetching, retries, rate limiting,
+parsing and writing all take part, but nothing goes over the network.
+Without ``--archive`` a synthetic one of ``--pages`` property pages is
+built from the corpus; with one recorded by ``main.py --record``, its
+property URLs are replayed.
+"""
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import PROJECT_ROOT, build_page  # noqa: E402
+
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+import main as scraper  # noqa: E402
+from utils.replay import ResponseArchive  # noqa: E402
+
+def build_archive(directory: Path, pages: int, kind: str) -> List[str]:
+    archive = ResponseArchive(str(directory))
+    body = build_page(kind).encode("utf-8")
+    urls = [f"https://www.zoopla.co.uk/for-sale/property/area-{i}/" for i in range(pages)]
+    for url in urls:
+        archive.save(url, 200, body, "text/html; charset=utf-8")
+    archive.close()
+    return urls
+
+def archived_urls(directory: Path) -> List[str]:
+    archive = ResponseArchive(str(directory))
+    urls = archive.urls()
+    archive.close()
+    return [url for url in urls if "/for-sale/" in url or "/to-rent/" in url]
+
+def run_once(
+    archive_dir: Path, urls: List[str], engine: str, concurrency: int, args: argparse.Namespace
+) -> float:
+    with tempfile.TemporaryDirectory() as out_dir:
+        config = {
+            "mode": "property",
+            "property_urls": urls,
+            "agent_urls": [],
+            "house_price_urls": [],
+            "output_format": "jsonl",
+            "output_dir": out_dir,
+            "max_items": 0,
+            "concurrency": concurrency,
+            "engine": engine,
+            "use_proxies": False,
+            "proxies": [],
+            "checkpoint_interval": 0,
+            "fetch_mode": "replay",
+            "archive_dir": str(archive_dir),
+            "replay_latency": args.latency_ms / 1000,
+            "replay_jitter": args.jitter_ms / 1000,
+            "replay_error_rate": args.error_rate,
+            "replay_seed": 0,
+        }
+        started = time.perf_counter()
+        scraper.run(config)
+        return time.perf_counter() - started
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--archive", type=Path, help="Archive recorded with main.py --record")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--kind", default="property_jsonld")
+    parser.add_argument("--latency-ms", type=int, default=200)
+    parser.add_argument("--jitter-ms", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--engines", nargs="+", default=["thread", "async"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[5, 20, 50, 100])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.archive:
+            archive_dir = args.archive
+            urls = archived_urls(archive_dir)
+        else:
+            archive_dir = Path(tmp)
+            urls = build_archive(archive_dir, args.pages, args.kind)
+
+        print(
+            f"{len(urls)} page(s), {args.latency_ms} ms +/- {args.jitter_ms} ms, "
+            f"{args.error_rate:.0%} errors"
+        )
+        print(f"{'engine':<8}{'concurrency':>12}{'seconds':>10}{'pages/s':>10}")
+        for engine in args.engines:
+            for concurrency in args.concurrency:
+                elapsed = run_once(archive_dir, urls, engine, concurrency, args)
+                print(f"{engine:<8}{concurrency:>12}{elapsed:>10.2f}{len(urls) / elapsed:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""File size, write time and load time of each output format.
+
+Usage:
+    python benchmarks/bench_sinks.py
+    python benchmarks/bench_sinks.py --records 10000 200000
+
+Writes N property records through utils.writers in every format, then
+loads each file back the way an analytics job would:
+
+  stdlib  json.load / json.loads per line / csv.DictReader into dicts
+  arrow   pyarrow's readers into a Table (what DuckDB and pandas use);
+          a JSON array has no Arrow reader, so it only has a stdlib time
+
+Parquet and Arrow need pyarrow installed.
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from corpus import PROJECT_ROOT, property_page  # noqa: E402
+
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from utils.parser import parse_property_listings  # noqa: E402
+from utils.writers import OUTPUT_FORMATS, STREAMS, open_writer  # noqa: E402
+
+def produce(count: int) -> Iterator[Dict]:
+    page = parse_property_listings(property_page(cards=25, filler_kb=1))
+    rng = random.Random(0)
+    for i in range(count):
+        record = dict(page[i % len(page)])
+        record["listingId"] = str(60_000_000 + i)
+        record["price"] = rng.randrange(100_000, 2_000_000, 500)
+        record["num_bedrooms"] = rng.randint(1, 6)
+        record["coordinates"] = {
+            "latitude": round(51.3 + rng.random(), 6),
+            "longitude": round(-0.5 + rng.random(), 6),
+        }
+        yield record
+
+def _load_stdlib(output_format: str, path: Path) -> Optional[Callable[[], object]]:
+    if output_format == "json":
+        return lambda: json.loads(path.read_text(encoding="utf-8"))
+    if output_format == "jsonl":
+        return lambda: [json.loads(line) for line in path.open(encoding="utf-8")]
+    if output_format == "csv":
+        return lambda: list(csv.DictReader(path.open(encoding="utf-8", newline="")))
+    return None
+
+def _load_arrow(output_format: str, path: Path) -> Optional[Callable[[], object]]:
+    try:
+        import pyarrow
+        import pyarrow.csv
+        import pyarrow.json
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    if output_format == "jsonl":
+        return lambda: pyarrow.json.read_json(str(path))
+    if output_format == "csv":
+        return lambda: pyarrow.csv.read_csv(str(path))
+    if output_format == "parquet":
+        return lambda: pyarrow.parquet.read_table(str(path))
+    if output_format == "arrow":
+        return lambda: pyarrow.ipc.open_file(str(path)).read_all()
+    return None
+
+def _best_of(load: Optional[Callable[[], object]], repeat: int) -> Optional[float]:
+    if load is None:
+        return None
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        load()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def _seconds(value: Optional[float]) -> str:
+    return f"{value:>11.3f}" if value is not None else f"{'-':>11}"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--formats", nargs="+", choices=OUTPUT_FORMATS, default=list(OUTPUT_FORMATS))
+    parser.add_argument("--repeat", type=int, default=3, help="Loads per format; best is shown")
+    args = parser.parse_args()
+
+    print(f"{'records':>9} {'format':>8} {'MB':>9} {'write s':>9} {'stdlib s':>11} {'arrow s':>11}")
+    for count in args.records:
+        with tempfile.TemporaryDirectory() as tmp:
+            out_dir = Path(tmp)
+            for output_format in args.formats:
+                started = time.perf_counter()
+                try:
+                    with open_writer(output_format, out_dir, "property") as writer:
+                        writer.write_all(produce(count))
+                except RuntimeError as exc:  # pyarrow missing
+                    print(f"{count:>9} {output_format:>8}  skipped: {exc}")
+                    continue
+                written = time.perf_counter() - started
+                path = out_dir / f"{STREAMS['property']['stems'][output_format]}.{output_format}"
+                size_mb = path.stat().st_size / (1024 * 1024)
+                stdlib = _best_of(_load_stdlib(output_format, path), args.repeat)
+                arrow = _best_of(_load_arrow(output_format, path), args.repeat)
+                print(
+                    f"{count:>9} {output_format:>8} {size_mb:>9.1f} {written:>9.2f}"
+                    f" {_seconds(stdlib)} {_seconds(arrow)}"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Cold-start cost of a short scheduled run.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 30 --kind house_prices_table
+
+Times, each in a fresh interpreter: importing main (the cumulative figure
+``python -X importtime`` reports for it), and a whole ``main.py`` run
+scraping one page from a local stand-in for Zoopla, the way a cron job
+crawls a single agent directory page. The first run of a new config
+validates it against the schema; later runs of the same config reuse the
+cached result and skip importing jsonschema.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import PROJECT_ROOT, build_page  # noqa: E402
+
+SRC_DIR = PROJECT_ROOT / "src"
+
+# Page kind -> the mode that scrapes it
+MODES = {
+    "agents_dom": "agent",
+    "agents_jsonld": "agent",
+    "property_dom": "property",
+    "property_jsonld": "property",
+    "house_prices_table": "house_prices",
+}
+URL_KEYS = {"property": "property_urls", "agent": "agent_urls", "house_prices": "house_price_urls"}
+
+def serve(port: int, kind: str) -> None:
+    body = build_page(kind).encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+def wait_for_server(port: int) -> None:
+    import socket
+
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Stand-in server did not start")
+
+def import_ms() -> float:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=SRC_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    match = re.search(r"\|\s*(\d+) \| main$", out.stderr, re.MULTILINE)
+    return int(match.group(1)) / 1000
+
+def run_ms(config_path: Path, env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "main.py", "--config", str(config_path)],
+        cwd=SRC_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+    return (time.perf_counter() - start) * 1000
+
+def summary(times: List[float]) -> str:
+    return f"median {statistics.median(times):6.0f} ms, min {min(times):6.0f} ms"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--kind", choices=list(MODES), default="agents_dom")
+    parser.add_argument("--port", type=int, default=8798)
+    args = parser.parse_args()
+
+    server = multiprocessing.Process(target=serve, args=(args.port, args.kind), daemon=True)
+    server.start()
+    try:
+        wait_for_server(args.port)
+        with tempfile.TemporaryDirectory() as tmp:
+            mode = MODES[args.kind]
+            config = {key: [] for key in URL_KEYS.values()}
+            config.update(
+                {
+                    "mode": mode,
+                    URL_KEYS[mode]: [f"http://127.0.0.1:{args.port}/{args.kind}/"],
+                    "output_format": "json",
+                    "output_dir": str(Path(tmp) / "out"),
+                    "max_items": 100,
+                    "concurrency": 2,
+                    "use_proxies": False,
+                    "proxies": [],
+                }
+            )
+            config_path = Path(tmp) / "config.json"
+            config_path.write_text(json.dumps(config), encoding="utf-8")
+            # An empty validation cache, so the first run validates.
+            env = {**os.environ, "XDG_CACHE_HOME": str(Path(tmp) / "cache")}
+
+            first = run_ms(config_path, env)
+            repeat = [run_ms(config_path, env) for _ in range(args.runs)]
+            imports = [import_ms() for _ in range(args.runs)]
+    finally:
+        server.terminate()
+
+    print(f"import main (-X importtime): {summary(imports)}")
+    print(f"first run (validates):       {first:6.0f} ms")
+    print(f"repeat runs:                 {summary(repeat)}")
+
+if __name__ == "__main__":
+    main()
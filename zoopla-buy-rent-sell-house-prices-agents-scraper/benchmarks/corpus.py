@@ -0,0 +1,142 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = PROJECT_ROOT / "data"
+
+PAGE_KINDS = (
+    "property_jsonld",
+    "property_dom",
+    "agents_jsonld",
+    "agents_dom",
+    "house_prices_table",
+    "property_jsonld_large",
+    "property_dom_large",
+)
+
+def _load_fixture(name: str) -> Dict[str, Any]:
+    with (DATA_DIR / name).open("r", encoding="utf-8") as f:
+        return json.load(f)[0]
+
+def _chrome(body: str, json_ld: List[Dict[str, Any]], filler_kb: int) -> str:
+    """Wrap page content in the header/footer noise a real Zoopla page carries."""
+    filler_block = (
+        '<div class="css-1x2y3z4 layout-slot" data-testid="ad-slot">'
+        '<span class="css-9a8b7c6">Sponsored</span>'
+        '<p class="css-k4j5h6">Get a mortgage in principle in minutes with our partners.</p>'
+        "</div>\n"
+    )
+    filler = filler_block * max(1, (filler_kb * 1024) // len(filler_block))
+    scripts = "".join(
+        '<script type="application/ld+json">%s</script>\n' % json.dumps(block)
+        for block in json_ld
+    )
+    return (
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\">"
+        "<title>Zoopla</title>\n"
+        '<script>window.__APP_STATE__ = {"flags": {"beta": false}};</script>\n'
+        f"{scripts}</head><body>\n<header>{filler}</header>\n"
+        f"<main>{body}</main>\n<footer>{filler}</footer></body></html>"
+    )
+
+def property_page(cards: int = 25, json_ld: bool = True, filler_kb: int = 180) -> str:
+    fixture = _load_fixture("sample_property.json")
+    blocks: List[Dict[str, Any]] = []
+    card_html: List[str] = []
+    for i in range(cards):
+        listing_id = str(int(fixture["listingId"]) + i)
+        url = f"https://www.zoopla.co.uk/for-sale/details/{listing_id}/"
+        if json_ld:
+            blocks.append(
+                {
+                    "@type": "Offer",
+                    "sku": listing_id,
+                    "url": url,
+                    "name": fixture["title"],
+                    "price": fixture["price"] + i * 1000,
+                    "priceCurrency": fixture["currency"],
+                    "availability": "live",
+                    "image": fixture["images"],
+                    "itemOffered": {
+                        "@type": "House",
+                        "numberOfRooms": fixture["num_bedrooms"],
+                        "numberOfBathroomsTotal": fixture["num_bathrooms"],
+                        "address": {
+                            "streetAddress": "The Fairfax, Heyford Fields",
+                            "addressLocality": "Upper Heyford, Bicester",
+                            "postalCode": "OX25",
+                        },
+                        "geo": fixture["coordinates"],
+                    },
+                    "seller": {
+                        "name": fixture["agent_name"],
+                        "telephone": fixture["agent_phone"],
+                        "image": fixture["agent_logo"],
+                    },
+                }
+            )
+        card_html.append(
+            f'<div data-listing-id="{listing_id}" class="css-wfndrn">'
+            f'<a href="{url}"><h2>{fixture["title"]}</h2></a>'
+            f'<p class="css-1e28vvi">£{fixture["price"] + i * 1000:,}</p>'
+            f'<address data-testid="listing-card-address">{fixture["address"]}</address>'
+            f'<p data-testid="listing-card-subtitle">{fixture["property_type"]}</p>'
+            f'<p data-testid="listing-card-agent-name">{fixture["agent_name"]}</p>'
+            + "".join(f'<img src="{img}" alt="">' for img in fixture["images"])
+            + "</div>\n"
+        )
+    return _chrome("".join(card_html), blocks, filler_kb)
+
+def agents_page(cards: int = 20, json_ld: bool = True, filler_kb: int = 120) -> str:
+    fixture = _load_fixture("agents.json")
+    blocks: List[Dict[str, Any]] = []
+    card_html: List[str] = []
+    for i in range(cards):
+        url = fixture["url"].replace("648969", str(648969 + i))
+        if json_ld:
+            blocks.append(
+                {
+                    "@type": "RealEstateAgent",
+                    "name": fixture["name"],
+                    "url": url,
+                    "telephone": fixture["telephone"],
+                    "logo": fixture["logo"],
+                    "address": fixture["address"],
+                    "aggregateRating": fixture["aggregate_rating"],
+                }
+            )
+        card_html.append(
+            f'<div data-testid="agent-card"><a href="{url}"><h2>{fixture["name"]}</h2></a>'
+            f'<a href="tel:{fixture["telephone"]}">{fixture["telephone"]}</a>'
+            f'<img src="{fixture["logo"]}"><address>{fixture["address"]}</address></div>\n'
+        )
+    return _chrome("".join(card_html), blocks, filler_kb)
+
+def house_prices_page(rows: int = 200, filler_kb: int = 120) -> str:
+    fixture = _load_fixture("sample_property.json")
+    table_rows = "".join(
+        f"<tr><td>{i} Heyford Fields, Upper Heyford OX25</td>"
+        f"<td>£{fixture['price'] - i * 250:,}</td><td>{1 + i % 28} Mar 2024</td></tr>\n"
+        for i in range(rows)
+    )
+    body = f"<table><tr><th>Address</th><th>Price</th><th>Date</th></tr>\n{table_rows}</table>"
+    return _chrome(body, [], filler_kb)
+
+def build_page(kind: str) -> str:
+    if kind == "property_jsonld":
+        return property_page(json_ld=True)
+    if kind == "property_dom":
+        return property_page(json_ld=False)
+    if kind == "agents_jsonld":
+        return agents_page(json_ld=True)
+    if kind == "agents_dom":
+        return agents_page(json_ld=False)
+    if kind == "house_prices_table":
+        return house_prices_page()
+    # A long results page (100 cards) under about 1 MB of page chrome.
+    if kind == "property_jsonld_large":
+        return property_page(cards=100, json_ld=True, filler_kb=1024)
+    if kind == "property_dom_large":
+        return property_page(cards=100, json_ld=False, filler_kb=1024)
+    raise ValueError(f"Unknown page kind: {kind}")
@@ -0,0 +1,324 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from utils.frontier import CrawlFrontier
+from utils.http_cache import ResponseCache
+from utils.parse_pool import ParsePool
+from utils.metrics import Metrics
+from utils.parser import ParsedPage, header_encoding, parse_page_timed
+from utils.proxy_manager import ProxyBanned, ProxyManager
+from utils.rate_limiter import AdaptiveRateLimiter, host_of
+from utils.replay import ReplaySession, Replayer, ResponseArchive
+from utils.retry import Retrier, RetryError, classify
+from utils.scheduler import StreamScheduler
+from utils.selector_plans import selector_pool
+
+LOGGER = logging.getLogger("zoopla_scraper.async_engine")
+
+_DONE = object()
+
+class AsyncEngine:
+    """asyncio fetch loop for running thousands of requests in flight.
+
+    URLs are taken from a ``CrawlFrontier`` only as in-flight slots free up,
+    so memory does not grow with the URL list. The connector caps total and
+    per-host connections, and parsing runs in a process pool so the event
+    loop never waits on lxml. The loop runs on a background thread and hands
+    parsed pages to the caller through a bounded queue.
+    """
+
+    def __init__(
+        self,
+        parse_page: Callable[[str], List[Dict[str, Any]]],
+        proxy_manager: ProxyManager,
+        concurrency: int = 100,
+        per_host_concurrency: Optional[int] = None,
+        timeout: int = 30,
+        headers: Optional[Mapping[str, str]] = None,
+        parse_pool: Optional[ParsePool] = None,
+        logger: logging.Logger = LOGGER,
+        records_name: str = "record(s)",
+        cache: Optional[ResponseCache] = None,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+        retrier: Optional[Retrier] = None,
+        on_failure: Optional[Callable[[str, Exception], None]] = None,
+        scheduler: Optional[StreamScheduler] = None,
+        stream: str = "record",
+        archive: Optional[ResponseArchive] = None,
+        replayer: Optional[Replayer] = None,
+        metrics: Optional[Metrics] = None,
+        on_parsed: Optional[Callable[[ParsedPage], None]] = None,
+        dedupe: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None,
+    ) -> None:
+        self.parse_page = parse_page
+        self.proxy_manager = proxy_manager
+        self.concurrency = max(1, concurrency)
+        self.per_host_concurrency = per_host_concurrency or self.concurrency
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.parse_pool = parse_pool
+        self.logger = logger
+        self.records_name = records_name
+        self.cache = cache
+        self.limiter = limiter
+        self.retrier = retrier
+        self.on_failure = on_failure
+        self.scheduler = scheduler
+        self.stream = stream
+        self.archive = archive
+        self.replayer = replayer
+        self.metrics = metrics
+        self.on_parsed = on_parsed
+        self.dedupe = dedupe
+
+    def iter_pages(
+        self, frontier: CrawlFrontier
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]], Optional[str]]]:
+        """Yield ``(url, records, next_url)`` for each page as it is parsed.
+
+        Closing the iterator early stops the crawl and cancels in-flight
+        requests.
+        """
+        pages: "queue.Queue[Any]" = queue.Queue(maxsize=self.concurrency)
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._produce, args=(frontier, pages, stop), name="async-engine", daemon=True
+        )
+        thread.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    def _produce(self, frontier: CrawlFrontier, pages: "queue.Queue[Any]", stop: threading.Event) -> None:
+        try:
+            asyncio.run(self._crawl(frontier, pages, stop))
+            outcome: Any = _DONE
+        except BaseException as exc:  # handed to the consuming thread
+            outcome = exc
+        while not stop.is_set():
+            try:
+                pages.put(outcome, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    async def _crawl(
+        self, frontier: CrawlFrontier, pages: "queue.Queue[Any]", stop: threading.Event
+    ) -> None:
+        try:
+            import aiohttp
+        except ImportError as exc:
+            raise RuntimeError(
+                "The async engine requires aiohttp; install it with `pip install aiohttp`."
+            ) from exc
+
+        owns_pool = self.parse_pool is None
+        parse_pool = self.parse_pool or selector_pool()
+
+        in_flight: Dict["asyncio.Task[Any]", str] = {}
+        if self.replayer is not None:
+            client: Any = ReplaySession(self.replayer)
+        else:
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency,
+                limit_per_host=self.per_host_concurrency,
+                ttl_dns_cache=300,
+            )
+            client = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=self.headers,
+                trace_configs=[self._trace_config(aiohttp)] if self.metrics is not None else None,
+            )
+        try:
+            async with client as session:
+                while not stop.is_set():
+                    while len(in_flight) < self.concurrency:
+                        url = frontier.next_url(in_flight=len(in_flight))
+                        if url is None:
+                            break
+                        task = asyncio.create_task(self._fetch_page(session, parse_pool, url))
+                        in_flight[task] = url
+                    if not in_flight:
+                        return
+
+                    done, _ = await asyncio.wait(
+                        in_flight, timeout=0.1, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        url = in_flight.pop(task)
+                        result = task.result()
+                        if result is None:
+                            frontier.page_failed(url)
+                            continue
+                        items, next_url = result
+                        if self.dedupe is not None:
+                            items = self.dedupe(items)
+                        frontier.page_done(url, len(items), next_url)
+                        await self._emit(pages, (url, items, next_url), stop)
+                    if frontier.limit_reached:
+                        return
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if owns_pool:
+                parse_pool.shutdown()
+
+    async def _emit(self, pages: "queue.Queue[Any]", page: Any, stop: threading.Event) -> None:
+        while not stop.is_set():
+            try:
+                pages.put_nowait(page)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.01)
+
+    async def _fetch_page(
+        self, session: Any, parse_pool: ParsePool, url: str
+    ) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        import aiohttp
+
+        self.logger.debug("Fetching %s", url)
+        errors = (aiohttp.ClientError, asyncio.TimeoutError, ProxyBanned)
+        try:
+            if self.retrier is not None:
+                html, content_type = await self.retrier.call_async(
+                    lambda: self._get(session, url), url, errors=errors
+                )
+            else:
+                html, content_type = await self._get(session, url)
+        except errors + (RetryError,) as exc:
+            self.logger.error("Request failed for %s: %s", url, exc)
+            if self.on_failure is not None:
+                self.on_failure(url, exc)
+            return None
+
+        try:
+            page = await parse_pool.parse_async(
+                parse_page_timed, self.parse_page, html, url, header_encoding(content_type)
+            )
+        except Exception as exc:
+            self.logger.error("Failed to parse %s: %s", url, exc)
+            if self.on_failure is not None:
+                self.on_failure(url, exc)
+            return None
+        if self.on_parsed is not None:
+            self.on_parsed(page)
+        self.logger.info("Parsed %d %s from %s", len(page.items), self.records_name, url)
+        return page.items, page.next_url
+
+    def _trace_config(self, aiohttp: Any) -> Any:
+        """aiohttp hooks timing DNS lookups and new connections (TCP plus TLS)."""
+        trace = aiohttp.TraceConfig()
+
+        def timer(phase: str) -> Tuple[Callable[..., Any], Callable[..., Any]]:
+            async def start(session: Any, ctx: Any, params: Any) -> None:
+                setattr(ctx, phase, time.monotonic())
+
+            async def end(session: Any, ctx: Any, params: Any) -> None:
+                started = getattr(ctx, phase, None)
+                if started is not None:
+                    self.metrics.observe(
+                        "zoopla_http_request_seconds", time.monotonic() - started, phase=phase
+                    )
+
+            return start, end
+
+        dns_start, dns_end = timer("dns")
+        connect_start, connect_end = timer("connect")
+        trace.on_dns_resolvehost_start.append(dns_start)
+        trace.on_dns_resolvehost_end.append(dns_end)
+        trace.on_connection_create_start.append(connect_start)
+        trace.on_connection_create_end.append(connect_end)
+        return trace
+
+    async def _get(self, session: Any, url: str) -> Tuple[bytes, Optional[str]]:
+        if self.scheduler is None:
+            return await self._fetch(session, url)
+        await self.scheduler.acquire_async(self.stream)
+        try:
+            return await self._fetch(session, url)
+        finally:
+            self.scheduler.release(self.stream)
+
+    async def _fetch(self, session: Any, url: str) -> Tuple[bytes, Optional[str]]:
+        """The body of ``url`` and its Content-Type, from the cache where it is fresh."""
+        entry = self.cache.lookup(url) if self.cache is not None else None
+        if entry is not None and entry.is_fresh(self.cache.ttl):
+            self.cache.hit(entry)
+            return entry.body, entry.content_type
+
+        host = host_of(url)
+        proxies = self.proxy_manager.get_next_proxy(session_key=host)
+        if self.limiter is not None:
+            await self.limiter.acquire_async(host)
+        started = time.monotonic()
+        status: Optional[int] = None
+        retry_after: Optional[str] = None
+        body: Optional[bytes] = None
+        first_byte: Optional[float] = None
+        error: Optional[BaseException] = None
+        timed_out = False
+        try:
+            async with session.get(
+                url,
+                proxy=proxies["http"] if proxies else None,
+                headers=entry.conditional_headers() if entry is not None else None,
+            ) as resp:
+                first_byte = time.monotonic() - started
+                status = resp.status
+                retry_after = resp.headers.get("Retry-After")
+                if resp.status == 304 and entry is not None:
+                    self.cache.hit(entry, revalidated=True)
+                    return entry.body, entry.content_type
+                resp.raise_for_status()
+                body = await resp.read()
+                headers = dict(resp.headers)
+        except asyncio.TimeoutError as exc:
+            timed_out = True
+            error = exc
+            raise
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            latency = time.monotonic() - started
+            if self.metrics is not None:
+                self.metrics.record_request(
+                    host,
+                    str(status) if status is not None else classify(error) if error else "cancelled",
+                    latency,
+                    ttfb=first_byte,
+                    size=len(body or b""),
+                )
+            if self.limiter is not None:
+                self.limiter.release(
+                    host,
+                    latency,
+                    status=status,
+                    timed_out=timed_out,
+                    retry_after=retry_after,
+                )
+            blocked = self.proxy_manager.report(proxies, latency, status, body)
+        if blocked:
+            raise ProxyBanned(f"Blocked response (HTTP {status}) for url: {url}")
+        # Compressing a large page takes a few ms; keep it off the loop.
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            await loop.run_in_executor(None, self.cache.store, url, body, headers)
+        if self.archive is not None:
+            await loop.run_in_executor(
+                None, self.archive.save, url, status, body, headers.get("Content-Type")
+            )
+        return body, headers.get("Content-Type")
@@ -0,0 +1,363 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import requests
+
+from extractors.detail_enricher import DetailEnricher
+from utils.checkpoint import StreamCheckpoint
+from utils.dedup import Deduplicator
+from utils.frontier import CrawlFrontier
+from utils.http_client import HttpClient
+from utils.normalize import normalize_records
+from utils.parse_pool import ParsePool
+from utils.parser import ParsedPage, header_encoding, parse_page_timed
+from utils.proxy_manager import ProxyBanned, ProxyManager
+from utils.rate_limiter import host_of
+from utils.retry import DeadLetterQueue, Retrier, RetryError
+from utils.scheduler import StreamScheduler
+
+ENGINES = ("thread", "async")
+
+PageResult = ParsedPage
+
+# (url, records, next page url) for each parsed page
+Page = Tuple[str, List[Dict[str, Any]], Optional[str]]
+
+class ExtractionStopped(Exception):
+    """Raised from ``extract()`` after ``stop()`` was called."""
+
+class BaseExtractor:
+    """Fetch/parse loop shared by the property, agent and house price extractors.
+
+    Subclasses set ``parse_page`` to one of the ``utils.parser`` functions
+    and provide the wording used in log messages.
+    """
+
+    parse_page: Callable[[str], List[Dict[str, Any]]]
+    logger = logging.getLogger("zoopla_scraper.extractor")
+    url_kind = "page"
+    items_name = "items"
+    page_name = "page"
+    records_name = "record(s)"
+    stream = "record"
+
+    def __init__(
+        self,
+        proxy_manager: ProxyManager,
+        max_items: Optional[int] = None,
+        concurrency: int = 5,
+        timeout: int = 30,
+        http_client: Optional[HttpClient] = None,
+        engine: str = "thread",
+        per_host_concurrency: Optional[int] = None,
+        parse_pool: Optional[ParsePool] = None,
+        follow_pagination: bool = False,
+        max_pages_per_url: Optional[int] = None,
+        retrier: Optional[Retrier] = None,
+        dead_letters: Optional[DeadLetterQueue] = None,
+        scheduler: Optional[StreamScheduler] = None,
+    ) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"Unsupported engine: {engine}")
+        self.proxy_manager = proxy_manager
+        self.max_items = max_items
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.engine = engine
+        self.per_host_concurrency = per_host_concurrency
+        self.parse_pool = parse_pool
+        self.follow_pagination = follow_pagination
+        self.max_pages_per_url = max_pages_per_url
+        self.retrier = retrier
+        self.dead_letters = dead_letters
+        self.scheduler = scheduler
+        self._stopped = threading.Event()
+        # True once an extract() run has crawled every page without failures
+        # or stopping at max_items, i.e. its output is the full result set.
+        self.complete = False
+        self.http_client = http_client or HttpClient(
+            pool_size=self.concurrency, timeout=timeout
+        )
+        self.metrics = self.http_client.metrics
+        # Set to drop records already seen, before they are enriched or written.
+        self.deduplicator: Optional[Deduplicator] = None
+        # Set to fetch each record's detail page and merge it into the record.
+        self.enricher: Optional[DetailEnricher] = None
+        # Set to normalize records (prices, dates, postcodes) in batches of
+        # at least ``normalize_batch``, across pages.
+        self.normalize = False
+        self.normalize_batch = 1000
+
+    def extract(
+        self, urls: Iterable[str], checkpoint: Optional[StreamCheckpoint] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield records as pages are parsed, stopping after ``max_items``.
+
+        With a ``checkpoint``, a saved crawl is continued instead of starting
+        from ``urls``, and each page is reported once its records have all
+        been consumed.
+        """
+        url_list = [u for u in urls if u]
+        if not url_list and not (checkpoint is not None and checkpoint.resumed):
+            self.logger.warning("No %s URLs provided; nothing to extract.", self.url_kind)
+            return
+
+        self.logger.info("Extracting %s from %d URL(s)", self.items_name, len(url_list))
+        frontier = CrawlFrontier(
+            url_list,
+            max_items=self.max_items,
+            follow_pagination=self.follow_pagination,
+            max_pages_per_seed=self.max_pages_per_url,
+        )
+        if checkpoint is not None:
+            checkpoint.restore(frontier, url_list)
+        if self.metrics is not None:
+            self.metrics.gauge(
+                "zoopla_frontier_pending", lambda: frontier.pending, stream=self.stream
+            )
+        pages = self._pages(frontier)
+
+        self.complete = False
+        emitted = checkpoint.records if checkpoint is not None else 0
+        try:
+            for url, items, next_url in pages:
+                if self._stopped.is_set():
+                    raise ExtractionStopped(f"{self.items_name} extraction stopped")
+                for item in items:
+                    yield item
+                    emitted += 1
+                    if self.max_items is not None and emitted >= self.max_items:
+                        self.logger.info(
+                            "Reached max_items limit (%d); stopping early.", self.max_items
+                        )
+                        if self.deduplicator is not None:
+                            self.deduplicator.truncated = True
+                        return
+                if checkpoint is not None:
+                    checkpoint.page_done(
+                        url, next_url if self.follow_pagination else None, len(items)
+                    )
+        finally:
+            pages.close()
+        self.complete = frontier.exhausted
+
+    def crawl(self, urls: List[str]) -> Iterator[Page]:
+        """Yield ``(url, records, next page url)`` for each of ``urls`` that could be extracted.
+
+        Next pages are reported, not followed: for workers of a distributed
+        crawl, where the shared queue schedules them.
+        """
+        pages = self._pages(CrawlFrontier(urls))
+        try:
+            for page in pages:
+                if self._stopped.is_set():
+                    raise ExtractionStopped(f"{self.items_name} extraction stopped")
+                yield page
+        finally:
+            pages.close()
+
+    def _pages(self, frontier: CrawlFrontier) -> Iterator[Page]:
+        if self.engine == "async":
+            from extractors.async_engine import AsyncEngine
+
+            engine = AsyncEngine(
+                parse_page=self.parse_page,
+                proxy_manager=self.proxy_manager,
+                concurrency=self.concurrency,
+                per_host_concurrency=self.per_host_concurrency,
+                timeout=self.timeout,
+                headers=self.http_client.headers,
+                parse_pool=self.parse_pool,
+                logger=self.logger,
+                records_name=self.records_name,
+                cache=self.http_client.cache,
+                limiter=self.http_client.limiter,
+                retrier=self.retrier,
+                on_failure=self._dead_letter,
+                on_parsed=self._observe_parse,
+                dedupe=self._unique if self.deduplicator is not None else None,
+                scheduler=self.scheduler,
+                stream=self.stream,
+                archive=self.http_client.archive,
+                replayer=self.http_client.replayer,
+                metrics=self.metrics,
+            )
+            pages = engine.iter_pages(frontier)
+        else:
+            pages = self._iter_pages_threaded(frontier)
+        if self.enricher is not None:
+            pages = self._enriched(pages)
+        if self.normalize:
+            pages = self._normalized(pages)
+        return pages
+
+    def stop(self) -> None:
+        """Make a running ``extract()`` raise ExtractionStopped at the next page."""
+        self._stopped.set()
+
+    def _iter_pages_threaded(self, frontier: CrawlFrontier) -> Iterator[Page]:
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        future_to_url: Dict[Future, str] = {}
+        parse_futures = set()
+        try:
+            while True:
+                fetching = len(future_to_url) - len(parse_futures)
+                while fetching < self.concurrency:
+                    url = frontier.next_url(in_flight=len(future_to_url))
+                    if url is None:
+                        break
+                    future_to_url[executor.submit(self._fetch_and_parse, url)] = url
+                    fetching += 1
+                if not future_to_url:
+                    return
+
+                done, _ = wait(future_to_url, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = future_to_url.pop(future)
+                    parse_futures.discard(future)
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        # Raised while parsing; failed requests return None.
+                        self.logger.error(
+                            "Failed to extract %s from %s: %s", self.items_name, url, exc
+                        )
+                        self._dead_letter(url, exc)
+                        frontier.page_failed(url)
+                        continue
+                    if result is None:
+                        frontier.page_failed(url)
+                        continue
+                    if isinstance(result, Future):
+                        # Page handed to the parse pool; collect its records later.
+                        future_to_url[result] = url
+                        parse_futures.add(result)
+                        continue
+                    self._observe_parse(result)
+                    items, next_url = result.items, result.next_url
+                    self._log_parsed(url, items)
+                    items = self._unique(items)
+                    frontier.page_done(url, len(items), next_url)
+                    yield url, items, next_url
+                    if frontier.limit_reached:
+                        return
+        finally:
+            # Also reached when the consumer stops early: drop queued work and
+            # let requests already on the wire finish in the background.
+            for future in future_to_url:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _enriched(self, pages: Iterator[Page]) -> Iterator[Page]:
+        """Pass ``pages`` through in order, with each record's detail page merged in.
+
+        A page's detail fetches start as soon as it is parsed, and the crawl
+        carries on meanwhile. The page is held back until those fetches are
+        done, or until the enricher falls too far behind, in which case the
+        oldest page is waited for before the crawl continues.
+        """
+        enricher = self.enricher
+        held: Deque[Tuple[Page, List[Optional[Future]]]] = deque()
+        try:
+            for page in pages:
+                url, items, _ = page
+                held.append((page, enricher.submit(items, url)))
+                while held and (
+                    enricher.backlogged or all(f is None or f.done() for f in held[0][1])
+                ):
+                    page, futures = held.popleft()
+                    enricher.merge(page[1], futures)
+                    yield page
+            while held:
+                page, futures = held.popleft()
+                enricher.merge(page[1], futures)
+                yield page
+        finally:
+            pages.close()
+
+    def _normalized(self, pages: Iterator[Page]) -> Iterator[Page]:
+        """Pass ``pages`` through in order, with their records normalized.
+
+        Pages are held back until ``normalize_batch`` records have come in,
+        then normalized together. Runs after enrichment, so fields merged in
+        from detail pages are normalized too.
+        """
+        held: List[Page] = []
+        count = 0
+        try:
+            for page in pages:
+                held.append(page)
+                count += len(page[1])
+                if count >= self.normalize_batch:
+                    yield from self._normalize_pages(held)
+                    held, count = [], 0
+            yield from self._normalize_pages(held)
+        finally:
+            pages.close()
+
+    def _normalize_pages(self, pages: List[Page]) -> List[Page]:
+        batch = [item for _, items, _ in pages for item in items]
+        normalize_records(self.stream, batch)
+        return pages
+
+    def _unique(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.deduplicator is None:
+            return items
+        return self.deduplicator.unique(self.stream, items)
+
+    def _fetch_and_parse(self, url: str) -> Union[None, PageResult, "Future[PageResult]"]:
+        self.logger.debug("Fetching %s: %s", self.page_name, url)
+        try:
+            if self.retrier is not None:
+                resp = self.retrier.call(
+                    lambda: self._get(url), url, errors=(requests.RequestException, ProxyBanned)
+                )
+            else:
+                resp = self._get(url)
+        except (requests.RequestException, ProxyBanned, RetryError) as exc:
+            self.logger.error("Request failed for %s: %s", url, exc)
+            self._dead_letter(url, exc)
+            return None
+
+        # Raw bytes, not resp.text: the parser decodes by the header's
+        # charset (or the page's own) and never needs the whole body decoded.
+        encoding = header_encoding(resp.headers.get("Content-Type"))
+        if self.parse_pool is not None:
+            return self.parse_pool.submit(
+                parse_page_timed, self.parse_page, resp.content, url, encoding
+            )
+        return parse_page_timed(self.parse_page, resp.content, url, encoding)
+
+    def _get(self, url: str) -> requests.Response:
+        # Picked per attempt, so a retry can leave through a different proxy.
+        proxies = self.proxy_manager.get_next_proxy(session_key=host_of(url))
+        if self.scheduler is None:
+            return self.http_client.get(url, proxies=proxies, timeout=self.timeout)
+        self.scheduler.acquire(self.stream)
+        try:
+            return self.http_client.get(url, proxies=proxies, timeout=self.timeout)
+        finally:
+            self.scheduler.release(self.stream)
+
+    def _dead_letter(self, url: str, exc: Exception) -> None:
+        if self.dead_letters is None:
+            return
+        if not isinstance(exc, RetryError):
+            exc = RetryError(exc, attempts=1)
+        self.dead_letters.add(self.stream, url, exc)
+
+    def _observe_parse(self, page: ParsedPage) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.observe("zoopla_parse_seconds", page.seconds, stream=self.stream)
+        self.metrics.inc(
+            "zoopla_pages_parsed_total",
+            stream=self.stream,
+            source="dom" if page.used_dom else "json_ld",
+        )
+
+    def _log_parsed(self, url: str, items: List[Dict[str, Any]]) -> None:
+        self.logger.info("Parsed %d %s from %s", len(items), self.records_name, url)
@@ -0,0 +1,154 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urljoin
+
+from utils.frontier import normalize_url
+from utils.metrics import Metrics
+from utils.parser import DETAIL_FIELDS
+from utils.state_store import ListingStateStore
+
+LOGGER = logging.getLogger("zoopla_scraper.detail_enricher")
+
+Details = Optional[Dict[str, Any]]
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+class DetailEnricher:
+    """Fetches listing detail pages alongside the search crawl.
+
+    Detail URLs come from each search page's records, resolved against the
+    page's URL. Each listing is fetched once per run, however many search
+    pages it shows up on: later records share the first fetch. Up to
+    ``concurrency`` detail pages are fetched at a time, and ``backlogged``
+    turns true once more than ``queue_size`` are waiting, so the search
+    side can hold back until the detail side catches up.
+
+    With ``state`` set (incremental runs), a listing whose search card is
+    unchanged since the last run takes its details from the stored record
+    instead of its detail page.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Details],
+        concurrency: int = 5,
+        queue_size: Optional[int] = None,
+        memo_size: int = 10_000,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.fetch = fetch
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(1, queue_size or 4 * self.concurrency)
+        self.memo_size = max(1, memo_size)
+        self.metrics = metrics
+        self.state: Optional[ListingStateStore] = None
+        self.fetched = 0
+        self.reused = 0
+        self.unchanged = 0
+        self.failed = 0
+        self._outstanding = 0
+        # Most recently requested last; evicting old entries bounds memory on
+        # long crawls, at the cost of refetching a listing seen long ago.
+        self._memo: "OrderedDict[str, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="details"
+        )
+        if metrics is not None:
+            metrics.gauge("zoopla_detail_queue_depth", lambda: self._outstanding)
+
+    @property
+    def backlogged(self) -> bool:
+        return self._outstanding > self.queue_size
+
+    def submit(self, items: List[Dict[str, Any]], page_url: str) -> List[Optional[Future]]:
+        """Start the detail fetches for one search page's records, one future per record.
+
+        Records without a URL, or with every detail field already set, get None.
+        """
+        return [self._submit_one(item, page_url) for item in items]
+
+    def _submit_one(self, item: Dict[str, Any], page_url: str) -> Optional[Future]:
+        href = item.get("url")
+        if not href or not any(_is_empty(item.get(field)) for field in DETAIL_FIELDS):
+            return None
+        stored = self.state.unchanged_record(item) if self.state is not None else None
+        if stored is not None:
+            details = {f: stored[f] for f in DETAIL_FIELDS if not _is_empty(stored.get(f))}
+            # Nothing stored means the last fetch failed; try it again.
+            if details:
+                future: Future = Future()
+                future.set_result(details)
+                with self._lock:
+                    self.unchanged += 1
+                if self.metrics is not None:
+                    self.metrics.inc("zoopla_detail_pages_total", outcome="reused")
+                return future
+        url = urljoin(page_url, href)
+        key = normalize_url(url)
+        with self._lock:
+            future = self._memo.get(key)
+            if future is not None:
+                self._memo.move_to_end(key)
+                self.reused += 1
+                outcome = "reused"
+            else:
+                self._outstanding += 1
+                future = self._executor.submit(self._fetch, url)
+                self._memo[key] = future
+                if len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+                outcome = None
+        if outcome is not None and self.metrics is not None:
+            self.metrics.inc("zoopla_detail_pages_total", outcome=outcome)
+        return future
+
+    def _fetch(self, url: str) -> Details:
+        try:
+            details = self.fetch(url)
+        except Exception as exc:  # pragma: no cover - defensive logging
+            LOGGER.warning("Failed to fetch details from %s: %s", url, exc)
+            details = None
+        with self._lock:
+            self._outstanding -= 1
+            if details is None:
+                self.failed += 1
+            else:
+                self.fetched += 1
+        if self.metrics is not None:
+            self.metrics.inc(
+                "zoopla_detail_pages_total", outcome="failed" if details is None else "fetched"
+            )
+        return details
+
+    @staticmethod
+    def merge(items: List[Dict[str, Any]], futures: List[Optional[Future]]) -> None:
+        """Fill each record's empty fields from its detail page, waiting for it if needed.
+
+        Fields the search card already had are left alone; a failed detail
+        fetch leaves its record as it was.
+        """
+        for item, future in zip(items, futures):
+            if future is None:
+                continue
+            details = future.result()
+            if not details:
+                continue
+            for field, value in details.items():
+                if _is_empty(item.get(field)):
+                    item[field] = value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "fetched": self.fetched,
+            "reused": self.reused,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
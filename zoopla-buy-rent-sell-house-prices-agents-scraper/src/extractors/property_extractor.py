@@ -1,76 +1,44 @@
-thonimport logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, Iterable, List, Optional
+import logging
+from typing import Any, Dict, Optional
 
 import requests
 
-from utils.parser import parse_property_listings
-from utils.proxy_manager import ProxyManager
+from extractors.base_extractor import BaseExtractor
+from utils.parser import header_encoding, parse_property_details, parse_property_listings
+from utils.proxy_manager import ProxyBanned
+from utils.retry import RetryError
 
 LOGGER = logging.getLogger("zoopla_scraper.property_extractor")
 
-class PropertyExtractor:
+class PropertyExtractor(BaseExtractor):
     """Extractor for property listings from Zoopla."""
 
-    def __init__(
-        self,
-        proxy_manager: ProxyManager,
-        max_items: Optional[int] = None,
-        concurrency: int = 5,
-        timeout: int = 30,
-    ) -> None:
-        self.proxy_manager = proxy_manager
-        self.max_items = max_items
-        self.concurrency = max(1, concurrency)
-        self.timeout = timeout
-
-    def extract(self, urls: Iterable[str]) -> List[Dict[str, Any]]:
-        results: List[Dict[str, Any]] = []
-        url_list = [u for u in urls if u]
-        if not url_list:
-            LOGGER.warning("No property URLs provided; nothing to extract.")
-            return results
-
-        LOGGER.info("Extracting properties from %d URL(s)", len(url_list))
-
-        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
-            future_to_url = {
-                executor.submit(self._fetch_and_parse, url): url for url in url_list
-            }
-            for future in as_completed(future_to_url):
-                url = future_to_url[future]
-                try:
-                    items = future.result()
-                except Exception as exc:  # pragma: no cover - defensive logging
-                    LOGGER.error("Failed to extract properties from %s: %s", url, exc)
-                    continue
-                results.extend(items)
-                if self.max_items is not None and len(results) >= self.max_items:
-                    LOGGER.info(
-                        "Reached max_items limit (%d); stopping early.", self.max_items
-                    )
-                    return results[: self.max_items]
-
-        return results
-
-    def _fetch_and_parse(self, url: str) -> List[Dict[str, Any]]:
-        LOGGER.debug("Fetching property page: %s", url)
-        proxies = self.proxy_manager.get_next_proxy()
+    parse_page = staticmethod(parse_property_listings)
+    logger = LOGGER
+    url_kind = "property"
+    items_name = "properties"
+    page_name = "property page"
+    records_name = "property listing(s)"
+    stream = "property"
+
+    def fetch_details(self, url: str) -> Optional[Dict[str, Any]]:
+        """Fetch and parse one listing's detail page; None if it could not be fetched.
+
+        Failures are logged but not dead-lettered: the dead letter file holds
+        search pages, which ``--resume-failed`` crawls again as seeds.
+        """
+        self.logger.debug("Fetching listing details: %s", url)
         try:
-            resp = requests.get(
-                url,
-                timeout=self.timeout,
-                proxies=proxies,
-                headers={
-                    "User-Agent": "Mozilla/5.0 (compatible; ZooplaScraper/1.0; +https://bitbash.dev/)"
-                },
-            )
-            resp.raise_for_status()
-        except requests.RequestException as exc:
-            LOGGER.error("Request failed for %s: %s", url, exc)
-            return []
-
-        html = resp.text
-        items = parse_property_listings(html)
-        LOGGER.info("Parsed %d property listing(s) from %s", len(items), url)
-        return items
\ No newline at end of file
+            if self.retrier is not None:
+                resp = self.retrier.call(
+                    lambda: self._get(url), url, errors=(requests.RequestException, ProxyBanned)
+                )
+            else:
+                resp = self._get(url)
+        except (requests.RequestException, ProxyBanned, RetryError) as exc:
+            self.logger.warning("Could not fetch listing details from %s: %s", url, exc)
+            return None
+        encoding = header_encoding(resp.headers.get("Content-Type"))
+        if self.parse_pool is not None:
+            return self.parse_pool.submit(parse_property_details, resp.content, encoding).result()
+        return parse_property_details(resp.content, encoding)
@@ -1,18 +1,73 @@
-thonimport argparse
+import argparse
+import functools
+import hashlib
+import itertools
 import json
 import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-
-import jsonschema
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+from utils.checkpoint import CrawlCheckpoint
+from utils.http_cache import ResponseCache
+from utils.dedup import Deduplicator, open_deduplicator
+from utils.geo_index import RecordIndex
+from utils.http_client import HttpClient
+from utils.metrics import Metrics, MetricsReporter
+from utils.normalize import NORMALIZED_FIELDS
+from utils.parse_pool import ParsePool, default_workers
 from utils.proxy_manager import ProxyManager
+from utils.rate_limiter import AdaptiveRateLimiter
+from utils.replay import FETCH_MODES, Replayer, ResponseArchive
+from utils.retry import DEFAULT_POLICIES, DeadLetterQueue, Retrier
+from utils.scheduler import StreamScheduler
+from utils.selector_plans import load_selectors, selector_pool
+from utils.state_store import CHANGE_FIELD, ListingStateStore
+from utils.work_queue import QueueDeadLetters, Task, WorkQueue
+from utils.writers import (
+    APPENDABLE_FORMATS,
+    OUTPUT_FORMATS,
+    open_writer,
+    output_path,
+    read_records,
+)
+from extractors.base_extractor import BaseExtractor
+from extractors.detail_enricher import DetailEnricher
 from extractors.property_extractor import PropertyExtractor
 from extractors.agent_extractor import AgentExtractor
 from extractors.house_prices_extractor import HousePricesExtractor
 
 LOGGER = logging.getLogger("zoopla_scraper")
 
+# Output stream -> config key holding its URLs
+URL_KEYS = {
+    "property": "property_urls",
+    "agent": "agent_urls",
+    "house_prices": "house_price_urls",
+}
+
+# Distributed crawls: how often the coordinator and idle workers check the
+# work queue, and how often the coordinator logs its progress.
+POLL_SECONDS = 1.0
+PROGRESS_SECONDS = 10.0
+
+SCHEMA_PATH = Path(__file__).resolve().parent / "config" / "input_schema.json"
+# Digests of the configs (with the schema) that passed validation, so a
+# scheduled run of an unchanged config neither imports jsonschema nor
+# validates again. Kept in the user's cache directory, not the checkout.
+VALIDATED_CONFIGS = (
+    Path(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"))
+    / "zoopla_scraper"
+    / "validated_configs"
+)
+VALIDATED_CONFIGS_KEPT = 100
+
 def setup_logging(verbose: bool = False) -> None:
     level = logging.DEBUG if verbose else logging.INFO
     logging.basicConfig(
@@ -21,9 +76,7 @@ def setup_logging(verbose: bool = False) -> None:
     )
 
 def load_schema() -> Dict[str, Any]:
-    current_dir = Path(__file__).resolve().parent
-    schema_path = current_dir / "config" / "input_schema.json"
-    with schema_path.open("r", encoding="utf-8") as f:
+    with SCHEMA_PATH.open("r", encoding="utf-8") as f:
         return json.load(f)
 
 def default_config() -> Dict[str, Any]:
@@ -49,7 +102,6 @@ def default_config() -> Dict[str, Any]:
     }
 
 def load_config(config_path: Optional[str]) -> Dict[str, Any]:
-    schema = load_schema()
     if config_path:
         config_file = Path(config_path)
         if not config_file.is_file():
@@ -59,103 +111,866 @@ def load_config(config_path: Optional[str]) -> Dict[str, Any]:
     else:
         config = default_config()
 
+    digest = _config_digest(config)
+    if digest in _validated_digests():
+        return config
+    import jsonschema
+
     try:
-        jsonschema.validate(instance=config, schema=schema)
+        jsonschema.validate(instance=config, schema=load_schema())
     except jsonschema.ValidationError as exc:
         raise ValueError(f"Config validation error: {exc.message}") from exc
+    _remember_validated(digest)
     return config
 
+def _config_digest(config: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(SCHEMA_PATH.read_bytes())
+    digest.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def _validated_digests() -> List[str]:
+    try:
+        return VALIDATED_CONFIGS.read_text(encoding="utf-8").split()
+    except OSError:
+        return []
+
+def _remember_validated(digest: str) -> None:
+    kept = [d for d in _validated_digests() if d != digest] + [digest]
+    # Several processes may validate at once (local workers); replace the file whole.
+    temp = VALIDATED_CONFIGS.with_name(f"{VALIDATED_CONFIGS.name}.{os.getpid()}")
+    try:
+        VALIDATED_CONFIGS.parent.mkdir(parents=True, exist_ok=True)
+        temp.write_text("\n".join(kept[-VALIDATED_CONFIGS_KEPT:]) + "\n", encoding="utf-8")
+        os.replace(temp, VALIDATED_CONFIGS)
+    except OSError as exc:
+        LOGGER.warning(
+            "Could not cache the config validation in %s (set XDG_CACHE_HOME to a writable "
+            "directory to skip validating on every run): %s",
+            VALIDATED_CONFIGS,
+            exc,
+        )
+
 def ensure_output_dir(directory: str) -> Path:
     path = Path(directory)
     path.mkdir(parents=True, exist_ok=True)
     return path
 
-def write_json(path: Path, data: Any) -> None:
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    LOGGER.info("Wrote JSON output to %s", path)
-
-def write_csv(path: Path, rows: List[Dict[str, Any]]) -> None:
-    if not rows:
-        LOGGER.warning("No rows to write to CSV at %s", path)
-        return
-    import csv
-
-    fieldnames = sorted({key for row in rows for key in row.keys()})
-    with path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
-    LOGGER.info("Wrote CSV output to %s", path)
-
 def run(config: Dict[str, Any]) -> None:
+    output_format = config["output_format"].lower()
+    if output_format not in APPENDABLE_FORMATS:
+        for flag in ("resume", "resume_failed"):
+            if config.get(flag):
+                raise ValueError(
+                    f"{flag} needs json, jsonl or csv output; {output_format} files cannot be appended to"
+                )
     output_dir = ensure_output_dir(config["output_dir"])
     proxy_manager = ProxyManager(
         proxies=config.get("proxies") or [],
         enabled=config.get("use_proxies", False),
+        sticky=bool(config.get("sticky_proxies", False)),
+        cooldown=float(config.get("proxy_cooldown") or 60),
     )
 
-    mode = config["mode"]
-    output_format = config["output_format"].lower()
     max_items = int(config.get("max_items") or 0) or None
     concurrency = int(config.get("concurrency") or 1)
+    engine = config.get("engine") or "thread"
+    per_host_concurrency = int(config.get("per_host_concurrency") or 0) or None
+    follow_pagination = bool(config.get("follow_pagination", False))
+    max_pages_per_url = int(config.get("max_pages_per_url") or 0) or None
+    # Parse workers load the same selector overrides when they start.
+    load_selectors(config.get("selectors_path"))
+    parse_workers = config.get("parse_workers")
+    if parse_workers is None:
+        parse_workers = default_workers()
+    parse_pool = (
+        selector_pool(workers=parse_workers, queue_size=config.get("parse_queue_size"))
+        if parse_workers > 0
+        else None
+    )
 
-    property_extractor = PropertyExtractor(
-        proxy_manager=proxy_manager,
-        max_items=max_items,
-        concurrency=concurrency,
+    fetch_mode = config.get("fetch_mode") or "live"
+    if fetch_mode not in FETCH_MODES:
+        raise ValueError(f"Unsupported fetch mode: {fetch_mode}")
+    if fetch_mode != "live" and not config.get("archive_dir"):
+        raise ValueError(f"fetch_mode {fetch_mode} needs archive_dir")
+    archive = ResponseArchive(config["archive_dir"]) if fetch_mode != "live" else None
+    replayer = (
+        Replayer(
+            archive,
+            latency=float(config.get("replay_latency") or 0),
+            jitter=float(config.get("replay_jitter") or 0),
+            error_rate=float(config.get("replay_error_rate") or 0),
+            seed=config.get("replay_seed"),
+        )
+        if fetch_mode == "replay"
+        else None
     )
-    agent_extractor = AgentExtractor(
-        proxy_manager=proxy_manager,
-        max_items=max_items,
-        concurrency=concurrency,
+    if replayer is not None:
+        LOGGER.info("Replaying %d archived response(s) from %s", len(archive), archive.path)
+
+    cache = (
+        ResponseCache(
+            config["http_cache_dir"],
+            ttl=float(config.get("http_cache_ttl") or 0),
+            max_bytes=int(config.get("http_cache_max_mb") or 512) * 1024 * 1024,
+        )
+        # Replay never touches the network, so there is nothing to cache.
+        if config.get("http_cache_dir") and replayer is None
+        else None
     )
-    house_prices_extractor = HousePricesExtractor(
-        proxy_manager=proxy_manager,
-        max_items=max_items,
-        concurrency=concurrency,
+
+    limiter = AdaptiveRateLimiter(
+        max_concurrency=concurrency,
+        rate=float(config.get("rate_limit_per_host") or 0),
+        adaptive=bool(config.get("adaptive_concurrency", False)),
+    )
+
+    policies = dict(DEFAULT_POLICIES)
+    if config.get("max_retries") is not None:
+        policies = {
+            name: policy._replace(retries=int(config["max_retries"]))
+            for name, policy in policies.items()
+        }
+    retry_budget = config.get("retry_budget")
+    retrier = Retrier(policies, budget=1000 if retry_budget is None else int(retry_budget))
+    dead_letters = DeadLetterQueue(
+        Path(config.get("dead_letter_path") or output_dir / "failed_urls.jsonl")
+    )
+    worker = config.get("role") == "worker"
+    if worker:
+        # The work queue keeps a distributed crawl's progress and failures.
+        checkpoint = None
+    else:
+        _prepare_dead_letters(config, dead_letters)
+        checkpoint = _open_checkpoint(config, output_dir)
+
+    metrics = Metrics()
+    if parse_pool is not None:
+        metrics.gauge("zoopla_parse_queue_depth", lambda: parse_pool.pending)
+    reporter = MetricsReporter(
+        metrics,
+        path=Path(config["metrics_path"]) if config.get("metrics_path") else None,
+        interval=float(config.get("metrics_interval") or 10),
+        port=config.get("metrics_port"),
     )
+    reporter.start()
+
+    try:
+        with HttpClient(
+            pool_size=concurrency,
+            cache=cache,
+            limiter=limiter,
+            proxy_manager=proxy_manager,
+            archive=archive if fetch_mode == "record" else None,
+            replayer=replayer,
+            metrics=metrics,
+        ) as http_client:
+            if worker:
+                _run_worker(
+                    config,
+                    http_client,
+                    concurrency,
+                    proxy_manager=proxy_manager,
+                    engine=engine,
+                    per_host_concurrency=per_host_concurrency,
+                    parse_pool=parse_pool,
+                    retrier=retrier,
+                )
+            else:
+                _run_extractors(
+                    config,
+                    output_dir=output_dir,
+                    proxy_manager=proxy_manager,
+                    http_client=http_client,
+                    max_items=max_items,
+                    concurrency=concurrency,
+                    engine=engine,
+                    per_host_concurrency=per_host_concurrency,
+                    parse_pool=parse_pool,
+                    follow_pagination=follow_pagination,
+                    max_pages_per_url=max_pages_per_url,
+                    retrier=retrier,
+                    dead_letters=dead_letters,
+                    checkpoint=checkpoint,
+                )
+        dead_letters.finish()
+        if checkpoint is not None:
+            checkpoint.discard()
+            checkpoint = None
+    finally:
+        reporter.stop()
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        LOGGER.info("Run summary:\n  %s", "\n  ".join(metrics.summary_lines()))
+        for host, stats in limiter.summary().items():
+            LOGGER.info(
+                "%s: %d request(s), %.1f req/s average, %d throttled, final window %d",
+                host,
+                stats["requests"],
+                stats["avg_rate"],
+                stats["throttled"],
+                stats["final_limit"],
+            )
+        if cache is not None:
+            stats = cache.stats()
+            LOGGER.info(
+                "HTTP cache: %d hit(s), %d revalidated (304), %d miss(es), %.1f MB saved",
+                stats["hits"],
+                stats["revalidated"],
+                stats["misses"],
+                stats["bytes_saved"] / (1024 * 1024),
+            )
+            cache.close()
+        if replayer is not None:
+            stats = replayer.stats()
+            LOGGER.info(
+                "Replay: %d response(s) served, %d not in archive, %d failure(s) injected",
+                stats["served"],
+                stats["missing"],
+                stats["injected"],
+            )
+        elif archive is not None:
+            LOGGER.info("Recorded %d response(s) to %s", archive.saved, archive.path)
+        if archive is not None:
+            archive.close()
+        if proxy_manager.enabled:
+            _report_proxies(proxy_manager, output_dir)
+        if retrier.retries:
+            LOGGER.info("Retried %d request(s)", retrier.retries)
+        if dead_letters.count:
+            LOGGER.warning(
+                "%d URL(s) failed after retries; listed in %s, re-run them with --resume-failed",
+                dead_letters.count,
+                dead_letters.path,
+            )
+        if checkpoint is not None:
+            checkpoint.close()
+            LOGGER.warning("Run stopped early; continue it with --resume (%s)", checkpoint.path)
+
+def _prepare_dead_letters(config: Dict[str, Any], dead_letters: DeadLetterQueue) -> None:
+    """Queue the failed URLs for ``resume_failed``, or clear the last run's on a fresh run."""
+    if config.get("resume_failed"):
+        failed = dead_letters.drain()
+        for stream, key in URL_KEYS.items():
+            config[key] = failed.get(stream, [])
+        LOGGER.info(
+            "Resuming %d failed URL(s) from %s",
+            sum(len(urls) for urls in failed.values()),
+            dead_letters.path,
+        )
+    elif not config.get("resume"):
+        dead_letters.reset()
+
+def _open_checkpoint(config: Dict[str, Any], output_dir: Path) -> Optional[CrawlCheckpoint]:
+    interval = config.get("checkpoint_interval")
+    interval = 30.0 if interval is None else float(interval)
+    if interval <= 0 or config.get("resume_failed"):
+        return None
+    if config["output_format"].lower() not in APPENDABLE_FORMATS:
+        LOGGER.info("Checkpoints are off for %s output.", config["output_format"])
+        return None
+    path = Path(config.get("checkpoint_path") or output_dir / "checkpoint.sqlite3")
+    resume = bool(config.get("resume"))
+    if resume and not path.is_file():
+        LOGGER.warning("No checkpoint found at %s; starting from scratch.", path)
+    return CrawlCheckpoint(path, interval=interval, fresh=not resume)
+
+def _report_proxies(proxy_manager: ProxyManager, output_dir: Path) -> None:
+    stats = proxy_manager.stats()
+    for proxy in stats:
+        LOGGER.info(
+            "Proxy %s: %d request(s), %d failure(s), %d ban(s), %d cooldown(s), latency %s",
+            proxy["proxy"],
+            proxy["requests"],
+            proxy["failures"],
+            proxy["bans"],
+            proxy["cooldowns"],
+            "n/a" if proxy["latency_ewma"] is None else f"{proxy['latency_ewma']:.2f}s",
+        )
+    stats_path = output_dir / "proxy_stats.json"
+    with stats_path.open("w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+
+def _run_extractors(
+    config: Dict[str, Any],
+    output_dir: Path,
+    proxy_manager: ProxyManager,
+    http_client: HttpClient,
+    max_items: Optional[int],
+    concurrency: int,
+    engine: str,
+    per_host_concurrency: Optional[int],
+    parse_pool: Optional[ParsePool],
+    follow_pagination: bool,
+    max_pages_per_url: Optional[int],
+    retrier: Optional[Retrier] = None,
+    dead_letters: Optional[DeadLetterQueue] = None,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+) -> None:
+    mode = config["mode"]
+    output_format = config["output_format"].lower()
 
     if mode not in {"property", "agent", "house_prices", "all"}:
         raise ValueError(f"Unsupported mode: {mode}")
 
-    if mode in {"property", "all"}:
-        property_urls = config.get("property_urls") or []
-        LOGGER.info("Starting property extraction for %d URL(s)", len(property_urls))
-        property_rows = property_extractor.extract(property_urls)
-        if output_format == "json":
-            write_json(output_dir / "sample_property.json", property_rows)
-        elif output_format == "csv":
-            write_csv(output_dir / "properties.csv", property_rows)
-        else:
-            raise ValueError(f"Unsupported output format: {output_format}")
-
-    if mode in {"agent", "all"}:
-        agent_urls = config.get("agent_urls") or []
-        LOGGER.info("Starting agent extraction for %d URL(s)", len(agent_urls))
-        agent_rows = agent_extractor.extract(agent_urls)
-        if output_format == "json":
-            write_json(output_dir / "agents.json", agent_rows)
-        elif output_format == "csv":
-            write_csv(output_dir / "agents.csv", agent_rows)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+    streams = set(URL_KEYS) if mode == "all" else {mode}
+    append = bool(config.get("resume_failed"))
+    if append:
+        # Only streams with failed URLs run; the others keep their output as is.
+        streams = {stream for stream in streams if config.get(URL_KEYS[stream])}
+
+    parallel = len(streams) > 1 and config.get("parallel_streams", True)
+    scheduler = (
+        StreamScheduler(
+            concurrency,
+            weights={
+                stream: float(config.get(f"{stream}_weight") or 1) for stream in URL_KEYS
+            },
+        )
+        if parallel
+        else None
+    )
+
+    extractors, enricher = _make_extractors(
+        config,
+        streams,
+        http_client,
+        concurrency,
+        proxy_manager=proxy_manager,
+        max_items=max_items,
+        engine=engine,
+        per_host_concurrency=per_host_concurrency,
+        parse_pool=parse_pool,
+        follow_pagination=follow_pagination,
+        max_pages_per_url=max_pages_per_url,
+        retrier=retrier,
+        dead_letters=dead_letters,
+        scheduler=scheduler,
+    )
+    deduplicator = _open_deduplicator(config, http_client.metrics)
+    if deduplicator is not None:
+        for extractor in extractors.values():
+            extractor.deduplicator = deduplicator
+    index = RecordIndex(config["index_path"]) if config.get("index_path") else None
+    normalize = bool(config.get("normalize"))
+
+    jobs: List[Callable[[], None]] = []
+    for stream in ("property", "agent", "house_prices"):
+        if stream not in streams:
+            continue
+        extra_fields = NORMALIZED_FIELDS[stream] if normalize else ()
+        if stream == "property" and config.get("incremental"):
+            jobs.append(
+                functools.partial(
+                    _write_property_delta,
+                    config,
+                    output_format,
+                    output_dir,
+                    extractors[stream],
+                    checkpoint,
+                    extra_fields,
+                    index,
+                )
+            )
         else:
-            raise ValueError(f"Unsupported output format: {output_format}")
-
-    if mode in {"house_prices", "all"}:
-        hp_urls = config.get("house_price_urls") or []
-        LOGGER.info("Starting house price extraction for %d URL(s)", len(hp_urls))
-        hp_rows = house_prices_extractor.extract(hp_urls)
-        if output_format == "json":
-            write_json(output_dir / "house_prices.json", hp_rows)
-        elif output_format == "csv":
-            write_csv(output_dir / "house_prices.csv", hp_rows)
+            jobs.append(
+                functools.partial(
+                    _write_stream,
+                    extractors[stream],
+                    config.get(URL_KEYS[stream]) or [],
+                    output_format,
+                    output_dir,
+                    checkpoint,
+                    append,
+                    extra_fields,
+                    index=index,
+                )
+            )
+
+    finished = False
+    try:
+        if not parallel:
+            for job in jobs:
+                job()
         else:
-            raise ValueError(f"Unsupported output format: {output_format}")
+            LOGGER.info(
+                "Running %d streams side by side, %d request(s) in flight", len(jobs), concurrency
+            )
+            with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="stream") as pool:
+                futures = [pool.submit(job) for job in jobs]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    # SIGTERM or a failed stream: wind the others down so each
+                    # saves its checkpoint, then re-raise once they have.
+                    for extractor in extractors.values():
+                        extractor.stop()
+                    raise
+        finished = True
+    finally:
+        if deduplicator is not None:
+            # Records of an interrupted run may be in the index but not the
+            # output; keep the index as it was so the next run still writes them.
+            deduplicator.close(save=finished)
+            for stream, dropped in sorted(deduplicator.dropped.items()):
+                LOGGER.info("Dropped %d duplicate %s record(s)", dropped, stream)
+        if index is not None:
+            LOGGER.info("Indexed %d record(s) in %s", index.added, index.path)
+            index.close()
+        if enricher is not None:
+            enricher.close()
+            _log_enricher(enricher)
+
+def _make_extractors(
+    config: Dict[str, Any],
+    streams: Iterable[str],
+    http_client: HttpClient,
+    concurrency: int,
+    **options: Any,
+) -> Tuple[Dict[str, BaseExtractor], Optional[DetailEnricher]]:
+    """The extractors of ``streams``, with detail enrichment and normalization as configured."""
+    extractors: Dict[str, BaseExtractor] = {
+        extractor_cls.stream: extractor_cls(
+            concurrency=concurrency, http_client=http_client, **options
+        )
+        for extractor_cls in (PropertyExtractor, AgentExtractor, HousePricesExtractor)
+        if extractor_cls.stream in streams
+    }
+    enricher = None
+    if config.get("enrich_details") and "property" in extractors:
+        property_extractor = extractors["property"]
+        enricher = DetailEnricher(
+            property_extractor.fetch_details,
+            concurrency=int(config.get("detail_concurrency") or concurrency),
+            queue_size=config.get("detail_queue_size"),
+            metrics=http_client.metrics,
+        )
+        property_extractor.enricher = enricher
+    for extractor in extractors.values():
+        extractor.normalize = bool(config.get("normalize"))
+        extractor.normalize_batch = int(config.get("normalize_batch") or 1000)
+    return extractors, enricher
+
+def _open_deduplicator(
+    config: Dict[str, Any], metrics: Optional[Metrics]
+) -> Optional[Deduplicator]:
+    if not config.get("dedupe"):
+        return None
+    return open_deduplicator(
+        config.get("dedupe_path"),
+        bloom_capacity=int(config.get("dedupe_bloom_capacity") or 0),
+        error_rate=float(config.get("dedupe_error_rate") or 0.001),
+        metrics=metrics,
+        # The listing state already tells new listings from ones output
+        # before; dropping those first would report them all as removed.
+        run_only=("property",) if config.get("incremental") else (),
+    )
+
+def _log_enricher(enricher: DetailEnricher) -> None:
+    stats = enricher.stats()
+    LOGGER.info(
+        "Listing details: %d fetched, %d shared between search pages, "
+        "%d unchanged since the last run, %d failed",
+        stats["fetched"],
+        stats["reused"],
+        stats["unchanged"],
+        stats["failed"],
+    )
+
+def _write_stream(
+    extractor: BaseExtractor,
+    urls: List[str],
+    output_format: str,
+    output_dir: Path,
+    checkpoint: Optional[CrawlCheckpoint],
+    append: bool = False,
+    extra_fields: Iterable[str] = (),
+    transform: Optional[Callable[[Iterable[Dict[str, Any]]], Iterable[Dict[str, Any]]]] = None,
+    index: Optional[RecordIndex] = None,
+    store: Optional[ListingStateStore] = None,
+) -> None:
+    """Extract one stream into its output file, checkpointing as pages complete.
+
+    ``store`` is the incremental state behind ``transform``; with a
+    checkpoint it is committed only together with it.
+    """
+    LOGGER.info("Starting %s extraction for %d URL(s)", extractor.url_kind, len(urls))
+    progress = checkpoint.stream(extractor.stream) if checkpoint is not None else None
+    if progress is not None and progress.finished:
+        LOGGER.info("Skipping %s extraction; it finished before the checkpoint.", extractor.url_kind)
+        _restore_seen(extractor.deduplicator, extractor.stream, output_format, output_dir)
+        return
+    with open_writer(
+        output_format,
+        output_dir,
+        extractor.stream,
+        extra_fields=tuple(extra_fields),
+        append=append,
+        resume_offset=progress.offset if progress is not None else None,
+    ) as writer:
+        if progress is not None:
+            if progress.resumed:
+                # Read back once the writer has cut the file to the checkpoint.
+                _restore_seen(extractor.deduplicator, extractor.stream, output_format, output_dir)
+            if store is not None:
+                progress.follow(store)
+            progress.attach(writer)
+        if extractor.metrics is not None:
+            extractor.metrics.gauge(
+                "zoopla_records_written", lambda: writer.count, stream=extractor.stream
+            )
+        records = extractor.extract(urls, checkpoint=progress)
+        if transform is not None:
+            records = transform(records)
+        if index is not None:
+            records = index.indexing(extractor.stream, records)
+        try:
+            writer.write_all(records)
+        finally:
+            # Also on SIGTERM or a crash: keep what was written up to the last page.
+            if progress is not None:
+                progress.save()
+    if progress is not None:
+        progress.finish()
+
+def _restore_seen(
+    deduplicator: Optional[Deduplicator], stream: str, output_format: str, output_dir: Path
+) -> None:
+    """Mark the records already in ``stream``'s output as seen, for a resumed run.
+
+    An interrupted run does not save its deduplication index, so without
+    this a resumed run would not drop duplicates of what it wrote before
+    the checkpoint, here or in later runs.
+    """
+    if deduplicator is None:
+        return
+    path = output_path(output_format, output_dir, stream)
+    count = deduplicator.restore(stream, read_records(path, output_format))
+    LOGGER.info("Marked %d %s record(s) from %s as seen", count, stream, path)
+
+def _write_property_delta(
+    config: Dict[str, Any],
+    output_format: str,
+    output_dir: Path,
+    property_extractor: PropertyExtractor,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+    extra_fields: Iterable[str] = (),
+    index: Optional[RecordIndex] = None,
+) -> None:
+    state_path = config.get("state_path") or str(output_dir / "listing_state.sqlite3")
+    store = ListingStateStore(state_path)
+    # A resumed run covers only part of the crawl (the URLs that failed
+    # before, or the pages left after a checkpoint), so it cannot tell
+    # which listings were removed. Resuming from a checkpoint the store was
+    # not committed with fails (StreamCheckpoint.follow) rather than
+    # writing a delta that misses listings.
+    append = bool(config.get("resume_failed"))
+    partial = append or (checkpoint is not None and bool(config.get("resume")))
+    if property_extractor.enricher is not None:
+        property_extractor.enricher.state = store
+    try:
+        _write_stream(
+            property_extractor,
+            config.get("property_urls") or [],
+            output_format,
+            output_dir,
+            checkpoint,
+            append,
+            extra_fields=(*extra_fields, CHANGE_FIELD),
+            transform=lambda records: store.delta(
+                records, complete=lambda: property_extractor.complete and not partial
+            ),
+            index=index,
+            store=store,
+        )
+        stats = store.stats()
+        LOGGER.info(
+            "Incremental run: %d new, %d changed, %d removed, %d unchanged listing(s)",
+            stats["new"],
+            stats["changed"],
+            stats["removed"],
+            stats["unchanged"],
+        )
+    finally:
+        store.close()
+
+def _queue_path(config: Dict[str, Any]) -> Path:
+    return Path(config.get("queue_path") or Path(config["output_dir"]) / "work_queue.sqlite3")
+
+def _open_queue(config: Dict[str, Any], fresh: bool = False) -> WorkQueue:
+    return WorkQueue(
+        _queue_path(config),
+        lease_seconds=float(config.get("lease_seconds") or 300),
+        max_attempts=int(config.get("max_attempts") or 3),
+        fresh=fresh,
+    )
+
+def _run_worker(
+    config: Dict[str, Any], http_client: HttpClient, concurrency: int, **options: Any
+) -> None:
+    """Extract pages leased from the coordinator's work queue until the crawl is done."""
+    path = _queue_path(config)
+    while not path.is_file():
+        LOGGER.info("Waiting for the coordinator to create %s", path)
+        time.sleep(5 * POLL_SECONDS)
+    queue = _open_queue(config)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    # Built when the first page of a stream is leased; a crawl of one mode builds one.
+    extractors: Dict[str, BaseExtractor] = {}
+    enricher: Optional[DetailEnricher] = None
+    batch = int(config.get("lease_batch") or 10)
+    pages = records = 0
+    LOGGER.info("Worker %s taking pages from %s", worker, path)
+    try:
+        queue.join(worker)
+        while True:
+            tasks = queue.lease(worker, batch)
+            if not tasks:
+                if queue.finished:
+                    break
+                time.sleep(POLL_SECONDS)
+                continue
+            by_stream: Dict[str, Dict[str, Task]] = {}
+            for task in tasks:
+                by_stream.setdefault(task.stream, {})[task.url] = task
+            for stream, leased in by_stream.items():
+                if stream not in extractors:
+                    built, built_enricher = _make_extractors(
+                        config,
+                        [stream],
+                        http_client,
+                        concurrency,
+                        dead_letters=QueueDeadLetters(queue, worker),
+                        **options,
+                    )
+                    extractors.update(built)
+                    enricher = enricher or built_enricher
+                for url, items, next_url in extractors[stream].crawl(list(leased)):
+                    if queue.complete(worker, leased.pop(url), items, next_url):
+                        pages += 1
+                        records += len(items)
+                    else:
+                        LOGGER.warning("Lease on %s expired; another worker will redo it", url)
+                # Neither extracted nor dead-lettered, e.g. the page would not parse.
+                queue.release(worker, [task.id for task in leased.values()], counted=True)
+    finally:
+        # Also on SIGTERM: hand unfinished pages back rather than wait out their leases.
+        queue.release(worker)
+        queue.close()
+        if enricher is not None:
+            enricher.close()
+            _log_enricher(enricher)
+        LOGGER.info("Worker %s extracted %d page(s), %d record(s)", worker, pages, records)
+
+def run_coordinator(config: Dict[str, Any], config_path: Optional[str] = None) -> None:
+    """Queue the configured URLs for workers, wait for the crawl, then write the output.
+
+    Workers are ``main.py --worker`` processes sharing the queue file, on
+    this machine (``local_workers``) or others. Records stay in the queue
+    until every page is done or failed, and the output files are written
+    from it in one go, so a coordinator restarted with ``--resume`` picks
+    up the same crawl.
+    """
+    mode = config["mode"]
+    output_format = config["output_format"].lower()
+    if mode not in {"property", "agent", "house_prices", "all"}:
+        raise ValueError(f"Unsupported mode: {mode}")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    append = bool(config.get("resume_failed"))
+    if append and output_format not in APPENDABLE_FORMATS:
+        raise ValueError(
+            f"resume_failed needs json, jsonl or csv output; {output_format} files cannot be appended to"
+        )
+    output_dir = ensure_output_dir(config["output_dir"])
+    dead_letters = DeadLetterQueue(
+        Path(config.get("dead_letter_path") or output_dir / "failed_urls.jsonl")
+    )
+    _prepare_dead_letters(config, dead_letters)
+    streams = set(URL_KEYS) if mode == "all" else {mode}
+    if append:
+        streams = {stream for stream in streams if config.get(URL_KEYS[stream])}
+
+    queue = _open_queue(config, fresh=not config.get("resume"))
+    if queue.seeded:
+        LOGGER.info("Continuing the crawl queued in %s", queue.path)
+    else:
+        added = queue.seed(
+            {stream: [u for u in config.get(URL_KEYS[stream]) or [] if u] for stream in streams},
+            follow_pagination=bool(config.get("follow_pagination", False)),
+            max_pages_per_url=int(config.get("max_pages_per_url") or 0) or None,
+        )
+        LOGGER.info("Queued %d start page(s) in %s", added, queue.path)
+
+    workers = [
+        _spawn_worker(config_path, queue.path)
+        for _ in range(int(config.get("local_workers") or 0))
+    ]
+    max_items = int(config.get("max_items") or 0) or None
+    deduplicator = _open_deduplicator(config, None)
+    index = RecordIndex(config["index_path"]) if config.get("index_path") else None
+    finished = False
+    try:
+        _wait_for_crawl(queue, streams, max_items, workers)
+        counts = queue.counts()
+        for stream in ("property", "agent", "house_prices"):
+            if stream not in streams:
+                continue
+            extra_fields = NORMALIZED_FIELDS[stream] if config.get("normalize") else ()
+            # Whether the queue holds the full result set, for removal detection.
+            complete = not (
+                append
+                or counts["failed"]
+                or counts["cancelled"]
+                or queue.truncated
+                or (max_items is not None and queue.stream_records(stream) > max_items)
+            )
+            _write_queued(
+                config,
+                queue,
+                stream,
+                output_format,
+                output_dir,
+                append=append,
+                max_items=max_items,
+                extra_fields=extra_fields,
+                deduplicator=deduplicator,
+                index=index,
+                complete=complete,
+            )
+        for entry in queue.failures():
+            dead_letters.add_entry(entry)
+        dead_letters.finish()
+        queue.discard()
+        finished = True
+    finally:
+        for process in workers:
+            try:
+                # Idle workers see the crawl is over at their next poll.
+                process.wait(timeout=10 * POLL_SECONDS if finished else 0)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+                process.wait()
+        if not finished:
+            queue.close()
+            LOGGER.warning("Crawl stopped early; continue it with --coordinator --resume")
+        if deduplicator is not None:
+            deduplicator.close(save=finished)
+            for stream, dropped in sorted(deduplicator.dropped.items()):
+                LOGGER.info("Dropped %d duplicate %s record(s)", dropped, stream)
+        if index is not None:
+            LOGGER.info("Indexed %d record(s) in %s", index.added, index.path)
+            index.close()
+        if dead_letters.count:
+            LOGGER.warning(
+                "%d URL(s) failed after retries; listed in %s, re-run them with --resume-failed",
+                dead_letters.count,
+                dead_letters.path,
+            )
+
+def _spawn_worker(config_path: Optional[str], queue_path: Path) -> subprocess.Popen:
+    command = [sys.executable, str(Path(__file__).resolve()), "--worker"]
+    command += ["--queue", str(queue_path)]
+    if config_path:
+        command += ["--config", config_path]
+    return subprocess.Popen(command)
+
+def _wait_for_crawl(
+    queue: WorkQueue,
+    streams: Iterable[str],
+    max_items: Optional[int],
+    workers: List[subprocess.Popen],
+) -> None:
+    reported = time.monotonic()
+    capped = set()
+    while True:
+        queue.reclaim()
+        if max_items is not None:
+            for stream in set(streams) - capped:
+                if queue.stream_records(stream) >= max_items:
+                    LOGGER.info(
+                        "Reached max_items limit (%d) for %s; stopping early.", max_items, stream
+                    )
+                    queue.cancel(stream)
+                    capped.add(stream)
+        counts = queue.counts()
+        if not counts["pending"] and not counts["leased"]:
+            break
+        if workers and all(process.poll() is not None for process in workers):
+            raise RuntimeError("Every local worker exited with pages left; see their log output")
+        if time.monotonic() - reported >= PROGRESS_SECONDS:
+            reported = time.monotonic()
+            LOGGER.info(
+                "Queue: %d page(s) pending, %d leased, %d done, %d failed; %d record(s)",
+                counts["pending"],
+                counts["leased"],
+                counts["done"],
+                counts["failed"],
+                counts["records"],
+            )
+        time.sleep(POLL_SECONDS)
+    LOGGER.info(
+        "Crawl done: %d page(s), %d failed, %d record(s)",
+        counts["done"],
+        counts["failed"],
+        counts["records"],
+    )
+
+def _write_queued(
+    config: Dict[str, Any],
+    queue: WorkQueue,
+    stream: str,
+    output_format: str,
+    output_dir: Path,
+    append: bool = False,
+    max_items: Optional[int] = None,
+    extra_fields: Iterable[str] = (),
+    deduplicator: Optional[Deduplicator] = None,
+    index: Optional[RecordIndex] = None,
+    complete: bool = True,
+) -> None:
+    """Write one stream's records from the work queue; ``_write_stream`` for distributed crawls."""
+    records: Iterable[Dict[str, Any]] = (
+        record
+        for page in queue.results(stream)
+        for record in (deduplicator.unique(stream, page) if deduplicator is not None else page)
+    )
+    if max_items is not None:
+        records = itertools.islice(records, max_items)
+    store = None
+    if stream == "property" and config.get("incremental"):
+        store = ListingStateStore(
+            config.get("state_path") or str(output_dir / "listing_state.sqlite3")
+        )
+        records = store.delta(records, complete=lambda: complete)
+        extra_fields = (*extra_fields, CHANGE_FIELD)
+    if index is not None:
+        records = index.indexing(stream, records)
+    try:
+        with open_writer(
+            output_format, output_dir, stream, extra_fields=tuple(extra_fields), append=append
+        ) as writer:
+            writer.write_all(records)
+    finally:
+        if store is not None:
+            stats = store.stats()
+            LOGGER.info(
+                "Incremental run: %d new, %d changed, %d removed, %d unchanged listing(s)",
+                stats["new"],
+                stats["changed"],
+                stats["removed"],
+                stats["unchanged"],
+            )
+            store.close()
 
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
-        description="Zoopla | Buy | Rent | Sell | House Prices | Agent(s) | Scraper"
+        description="Zoopla | Buy | Rent | Sell | House Prices | Agent(s) | Scraper",
+        epilog="Run 'main.py query --help' to look up records in an index built with index_path.",
     )
     parser.add_argument(
         "--config",
@@ -171,9 +986,53 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser.add_argument(
         "--output-format",
         type=str,
-        choices=["json", "csv"],
+        choices=list(OUTPUT_FORMATS),
         help="Override output format defined in config file",
     )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=["thread", "async"],
+        help="Override fetch engine defined in config file",
+    )
+    fetch = parser.add_mutually_exclusive_group()
+    fetch.add_argument(
+        "--record",
+        metavar="ARCHIVE_DIR",
+        help="Save every successful response to an archive for later replay",
+    )
+    fetch.add_argument(
+        "--replay",
+        metavar="ARCHIVE_DIR",
+        help="Serve responses from a recorded archive instead of the network",
+    )
+    role = parser.add_mutually_exclusive_group()
+    role.add_argument(
+        "--coordinator",
+        action="store_true",
+        help="Queue the configured URLs for --worker processes and write their records",
+    )
+    role.add_argument(
+        "--worker",
+        action="store_true",
+        help="Extract pages from a coordinator's work queue until its crawl is done",
+    )
+    parser.add_argument(
+        "--queue",
+        metavar="QUEUE_FILE",
+        help="Override the work queue file shared by coordinator and workers (queue_path)",
+    )
+    resume = parser.add_mutually_exclusive_group()
+    resume.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its last checkpoint",
+    )
+    resume.add_argument(
+        "--resume-failed",
+        action="store_true",
+        help="Re-crawl only the URLs recorded as failed by the previous run",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -181,7 +1040,74 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     )
     return parser.parse_args(argv)
 
+def _floats(count: int) -> Callable[[str], List[float]]:
+    def parse(value: str) -> List[float]:
+        try:
+            numbers = [float(part) for part in value.split(",")]
+        except ValueError:
+            numbers = []
+        if len(numbers) != count:
+            raise argparse.ArgumentTypeError(f"expected {count} comma-separated numbers")
+        return numbers
+
+    return parse
+
+def parse_query_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py query",
+        description="Look up records in an index built with index_path, printing them as JSON Lines",
+    )
+    parser.add_argument("--index", required=True, help="Index file (index_path of the run)")
+    lookup = parser.add_mutually_exclusive_group(required=True)
+    lookup.add_argument(
+        "--near",
+        type=_floats(2),
+        metavar="LAT,LON",
+        help="Records within --radius-km of a point, nearest first",
+    )
+    lookup.add_argument(
+        "--bbox",
+        type=_floats(4),
+        metavar="SOUTH,WEST,NORTH,EAST",
+        help="Records inside a latitude/longitude box",
+    )
+    lookup.add_argument("--postcode", help="Records whose postcode starts with this prefix")
+    lookup.add_argument("--district", help="Records in this postcode district, e.g. OX25")
+    parser.add_argument("--radius-km", type=float, default=1.0, help="Radius for --near")
+    parser.add_argument("--stream", choices=list(URL_KEYS), help="Only records of this stream")
+    parser.add_argument("--limit", type=int, help="Return at most this many records")
+    return parser.parse_args(argv)
+
+def query(argv: Optional[List[str]] = None) -> None:
+    args = parse_query_args(argv)
+    setup_logging()
+    if not Path(args.index).is_file():
+        LOGGER.error("No index at %s", args.index)
+        raise SystemExit(1)
+    index = RecordIndex(args.index)
+    start = time.perf_counter()
+    try:
+        if args.near is not None:
+            records = index.within_radius(*args.near, args.radius_km, args.stream, args.limit)
+        elif args.bbox is not None:
+            records = index.within_bbox(*args.bbox, args.stream, args.limit)
+        elif args.postcode is not None:
+            records = index.by_postcode(args.postcode, args.stream, args.limit)
+        else:
+            records = index.by_district(args.district, args.stream, args.limit)
+    finally:
+        index.close()
+    elapsed = time.perf_counter() - start
+    for record in records:
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    LOGGER.info("%d record(s) in %.1f ms", len(records), elapsed * 1000)
+
 def main(argv: Optional[List[str]] = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["query"]:
+        query(argv[1:])
+        return
     args = parse_args(argv)
     setup_logging(verbose=args.verbose)
 
@@ -195,12 +1121,40 @@ def main(argv: Optional[List[str]] = None) -> None:
         config["mode"] = args.mode
     if args.output_format:
         config["output_format"] = args.output_format
+    if args.engine:
+        config["engine"] = args.engine
+    if args.record:
+        config["fetch_mode"] = "record"
+        config["archive_dir"] = args.record
+    if args.replay:
+        config["fetch_mode"] = "replay"
+        config["archive_dir"] = args.replay
+    if args.coordinator:
+        config["role"] = "coordinator"
+    if args.worker:
+        config["role"] = "worker"
+    if args.queue:
+        config["queue_path"] = args.queue
+    if args.resume:
+        config["resume"] = True
+    if args.resume_failed:
+        config["resume_failed"] = True
+
+    # Turn SIGTERM into SystemExit so the checkpoint is saved on the way out.
+    signal.signal(signal.SIGTERM, _terminate)
 
     try:
-        run(config)
+        if config.get("role") == "coordinator":
+            run_coordinator(config, args.config)
+        else:
+            run(config)
     except Exception as exc:
         LOGGER.exception("Scraper run failed: %s", exc)
         raise SystemExit(1)
 
+def _terminate(signum: int, frame: Any) -> None:
+    LOGGER.warning("Received SIGTERM; saving checkpoint and exiting.")
+    raise SystemExit(128 + signum)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
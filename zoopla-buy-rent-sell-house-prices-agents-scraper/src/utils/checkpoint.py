@@ -0,0 +1,216 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.frontier import CrawlFrontier
+from utils.state_store import ListingStateStore
+from utils.writers import RecordWriter
+
+LOGGER = logging.getLogger("zoopla_scraper.checkpoint")
+
+class CrawlCheckpoint:
+    """SQLite record of a run's progress, so ``--resume`` can pick it up.
+
+    For each output stream it keeps the pages whose records are safely in
+    the output file, the pages still to fetch (seeds and discovered next
+    pages), the record count and the output file's length at that point.
+    Pages that were in flight when the run died are simply still pending.
+    Streams running in parallel share the connection under ``lock``.
+    """
+
+    def __init__(self, path: Path, interval: float = 30.0, fresh: bool = True) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fresh and path.is_file():
+            LOGGER.info("Discarding old checkpoint %s", path)
+            path.unlink()
+        self.path = path
+        self.interval = interval
+        self.lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS streams (
+                stream TEXT PRIMARY KEY,
+                finished INTEGER NOT NULL DEFAULT 0,
+                records INTEGER NOT NULL DEFAULT 0,
+                output_offset INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                stream TEXT NOT NULL,
+                url TEXT NOT NULL,
+                seed TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (stream, url)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def stream(self, name: str) -> "StreamCheckpoint":
+        with self.lock:
+            row = self._conn.execute(
+                "SELECT finished, records, output_offset FROM streams WHERE stream = ?", (name,)
+            ).fetchone()
+            if row is None:
+                return StreamCheckpoint(self, name)
+            pages = self._conn.execute(
+                "SELECT url, seed, done FROM pages WHERE stream = ? ORDER BY rowid", (name,)
+            ).fetchall()
+        return StreamCheckpoint(
+            self, name, finished=bool(row[0]), records=row[1], offset=row[2], pages=pages
+        )
+
+    def discard(self) -> None:
+        """Drop the checkpoint once the run has finished cleanly."""
+        self._conn.close()
+        self.path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        self._conn.close()
+
+class StreamCheckpoint:
+    """Progress of one output stream within a ``CrawlCheckpoint``.
+
+    The extractor reports each page once all its records have been handed
+    to the writer; together with the writer's offset at that moment this
+    marks a point where the output file and the crawl state agree. Reports
+    are saved every ``interval`` seconds and whenever the stream stops.
+    """
+
+    def __init__(
+        self,
+        checkpoint: CrawlCheckpoint,
+        name: str,
+        finished: bool = False,
+        records: int = 0,
+        offset: Optional[int] = None,
+        pages: Optional[List[Tuple[str, str, int]]] = None,
+    ) -> None:
+        self.checkpoint = checkpoint
+        self.name = name
+        self.finished = finished
+        self.records = records
+        self.offset = offset
+        self.resumed = offset is not None
+        self._seed_of: Dict[str, str] = {url: seed for url, seed, _ in pages or []}
+        self._done = [(url, seed) for url, seed, done in pages or [] if done]
+        self._pending = [(url, seed) for url, seed, done in pages or [] if not done]
+        # (url, next_url, records so far, offset) reported but not yet saved.
+        # Each report is a single append and saving it twice is harmless, so
+        # a SIGTERM landing in the middle of either cannot corrupt the state.
+        self._unsaved: List[Tuple[str, Optional[str], int, int]] = []
+        self._reported = records
+        self._writer: Optional[RecordWriter] = None
+        self._stores: List[ListingStateStore] = []
+        self._saved_at = time.monotonic()
+
+    def follow(self, store: ListingStateStore) -> None:
+        """Keep ``store`` in step with the output: marked at each page, committed with each save.
+
+        Raises ValueError when resuming from a checkpoint the store was not
+        committed with, since its listings would not match the output.
+        """
+        if self.resumed and store.checkpointed_at() != (self.records, self.offset):
+            raise ValueError(
+                f"Listing state {store.path} does not match the checkpoint {self.checkpoint.path}; "
+                "run again without --resume"
+            )
+        store.follows_checkpoint = True
+        self._stores.append(store)
+
+    def attach(self, writer: RecordWriter) -> None:
+        """Tie the stream to its output writer; a new stream is saved right away."""
+        self._writer = writer
+        if self.offset is None:
+            self.offset = writer.tell()
+            with self.checkpoint.lock:
+                self._conn.execute(
+                    "INSERT INTO streams (stream, output_offset) VALUES (?, ?)",
+                    (self.name, self.offset),
+                )
+                self._conn.commit()
+            for store in self._stores:
+                store.commit(self.records, self.offset)
+
+    def restore(self, frontier: CrawlFrontier, seeds: List[str]) -> None:
+        """Load saved progress into ``frontier``, or record ``seeds`` for a new stream."""
+        if self._done or self._pending:
+            frontier.restore(self._done, self._pending, self.records)
+            LOGGER.info(
+                "Resuming %s from checkpoint: %d page(s) done, %d pending, %d record(s) written",
+                self.name,
+                len(self._done),
+                len(self._pending),
+                self.records,
+            )
+            return
+        for url in seeds:
+            self._seed_of.setdefault(url, url)
+        with self.checkpoint.lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO pages (stream, url, seed) VALUES (?, ?, ?)",
+                [(self.name, url, url) for url in seeds],
+            )
+            self._conn.commit()
+
+    def page_done(self, url: str, next_url: Optional[str], records: int) -> None:
+        """Report a page whose records have all been handed to the writer."""
+        self._unsaved.append((url, next_url, self._reported + records, self._writer.tell()))
+        self._reported += records
+        for store in self._stores:
+            store.mark()
+        if time.monotonic() - self._saved_at >= self.checkpoint.interval:
+            self.save()
+
+    def save(self) -> None:
+        """Make the reported pages durable: output file first, then the checkpoint."""
+        if self._writer is None or self.offset is None:
+            return
+        unsaved = self._unsaved[:]
+        if not unsaved:
+            return
+        self._writer.sync()
+        with self.checkpoint.lock:
+            for url, next_url, _, _ in unsaved:
+                seed = self._seed_of.get(url, url)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (stream, url, seed, done) VALUES (?, ?, ?, 1)",
+                    (self.name, url, seed),
+                )
+                if next_url:
+                    self._seed_of.setdefault(next_url, seed)
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO pages (stream, url, seed) VALUES (?, ?, ?)",
+                        (self.name, next_url, seed),
+                    )
+            _, _, records, offset = unsaved[-1]
+            self._conn.execute(
+                "UPDATE streams SET records = ?, output_offset = ? WHERE stream = ?",
+                (records, offset, self.name),
+            )
+            self._conn.commit()
+        # After the checkpoint: if the run dies in between, the store is
+        # behind and listings are reported again, rather than ahead and lost.
+        for store in self._stores:
+            store.commit(records, offset)
+        self.records, self.offset = records, offset
+        del self._unsaved[: len(unsaved)]
+        self._saved_at = time.monotonic()
+
+    def finish(self) -> None:
+        self.save()
+        self.finished = True
+        with self.checkpoint.lock:
+            self._conn.execute("UPDATE streams SET finished = 1 WHERE stream = ?", (self.name,))
+            self._conn.commit()
+        # Removals and a truncated last page come after the last page report.
+        for store in self._stores:
+            store.mark()
+            store.commit(self.records, self.offset)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self.checkpoint._conn
@@ -0,0 +1,184 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.normalize import number_of
+from utils.writers import RecordWriter
+
+LOGGER = logging.getLogger("zoopla_scraper.columnar")
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+# Rows buffered before they are written out as one Parquet row group or
+# Arrow record batch.
+ROW_GROUP_SIZE = 10_000
+
+# Column kinds per stream; anything not listed is stored as a string.
+COLUMN_KINDS: Dict[str, Dict[str, str]] = {
+    "property": {
+        "price": "int",
+        "num_bedrooms": "int",
+        "num_bathrooms": "int",
+        "num_reception_rooms": "int",
+        "features": "string_list",
+        "images": "string_list",
+        "floorplans": "string_list",
+        "coordinates": "coordinates",
+        "broadband": "json",
+        "transport": "json",
+        "price_history": "json",
+    },
+    "agent": {
+        "aggregate_rating": "rating",
+    },
+    "house_prices": {
+        "price": "int",
+        "coordinates": "coordinates",
+    },
+}
+
+def _to_int(value: Any) -> Optional[int]:
+    if value is None or isinstance(value, bool):
+        return None
+    return number_of(value)
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _to_string(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+def _to_string_list(value: Any) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        value = [value]
+    return [_to_string(item) for item in value]
+
+def _to_json(value: Any) -> Optional[str]:
+    if value is None or value == {} or value == []:
+        return None
+    return json.dumps(value, ensure_ascii=False)
+
+def _to_coordinates(value: Any) -> Optional[Dict[str, Optional[float]]]:
+    if not isinstance(value, dict):
+        return None
+    return {
+        "latitude": _to_float(value.get("latitude")),
+        "longitude": _to_float(value.get("longitude")),
+    }
+
+def _to_rating(value: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(value, dict):
+        return None
+    return {
+        "rating": _to_float(value.get("ratingValue")),
+        "review_count": _to_int(value.get("reviewCount")),
+    }
+
+def _column_type(pa: Any, kind: str) -> Any:
+    return {
+        "int": pa.int64(),
+        "string": pa.string(),
+        "string_list": pa.list_(pa.string()),
+        "json": pa.string(),
+        "coordinates": pa.struct(
+            [("latitude", pa.float64()), ("longitude", pa.float64())]
+        ),
+        "rating": pa.struct([("rating", pa.float64()), ("review_count", pa.int64())]),
+    }[kind]
+
+CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "int": _to_int,
+    "string": _to_string,
+    "string_list": _to_string_list,
+    "json": _to_json,
+    "coordinates": _to_coordinates,
+    "rating": _to_rating,
+}
+
+def _import_pyarrow() -> Tuple[Any, Any]:
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise RuntimeError(
+            "Parquet and Arrow output require pyarrow; install it with `pip install pyarrow`."
+        ) from exc
+    return pyarrow, pyarrow.parquet
+
+class ColumnarWriter(RecordWriter):
+    """Typed Parquet or Arrow IPC file, written ``ROW_GROUP_SIZE`` rows at a time.
+
+    Numbers, coordinates and image lists get real column types; nested
+    values without a fixed shape (price history, transport) are kept as
+    JSON strings. Fields outside the stream's schema are dropped, as in
+    CSV output.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        output_format: str,
+        stream: str,
+        fieldnames: Sequence[str],
+        row_group_size: int = ROW_GROUP_SIZE,
+    ) -> None:
+        pa, pq = _import_pyarrow()
+        self.path = path
+        self.count = 0
+        self.row_group_size = max(1, row_group_size)
+        kinds = COLUMN_KINDS.get(stream, {})
+        self._columns = [(name, kinds.get(name, "string")) for name in fieldnames]
+        self._schema = pa.schema(
+            [(name, _column_type(pa, kind)) for name, kind in self._columns]
+        )
+        self._rows: List[Dict[str, Any]] = []
+        self._pa = pa
+        if output_format == "parquet":
+            self._sink = pq.ParquetWriter(str(path), self._schema, compression="zstd")
+        else:
+            self._sink = pa.ipc.new_file(
+                str(path),
+                self._schema,
+                options=pa.ipc.IpcWriteOptions(compression="zstd"),
+            )
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._rows.append(record)
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        arrays = [
+            self._pa.array(
+                [CONVERTERS[kind](row.get(name)) for row in self._rows],
+                type=self._schema.field(name).type,
+            )
+            for name, kind in self._columns
+        ]
+        self._sink.write_batch(self._pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+        self._rows = []
+
+    def tell(self) -> int:
+        raise NotImplementedError("Columnar output cannot be checkpointed")
+
+    def sync(self) -> None:
+        raise NotImplementedError("Columnar output cannot be checkpointed")
+
+    def close(self) -> None:
+        self._flush()
+        self._sink.close()
+        LOGGER.info("Wrote %d record(s) to %s", self.count, self.path)
@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import shutil
+import struct
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from utils.frontier import normalize_url
+from utils.metrics import Metrics
+from utils.normalize import iso_date
+
+LOGGER = logging.getLogger("zoopla_scraper.dedup")
+
+_SPACE_RE = re.compile(r"\s+")
+
+# File layouts: magic, then the digests as little-endian uint64s (digest
+# set), or bit count and hash count followed by the bits (Bloom filter).
+_DIGESTS_MAGIC = b"ZDDS0001"
+_BLOOM_MAGIC = b"ZDBF0001"
+_BLOOM_HEADER = struct.Struct("<8sQQ")
+
+def _text(value: Any) -> str:
+    return _SPACE_RE.sub(" ", str(value)).strip().casefold()
+
+def record_key(stream: str, record: Dict[str, Any]) -> Optional[str]:
+    """What makes two records of ``stream`` the same, or None if the record has nothing to go by.
+
+    Properties are keyed on listing ID, agents on branch URL (or phone
+    number, for cards without a link) and sold prices on address plus sale
+    date. The date is keyed as normalized, so a record has the same key
+    before and after ``normalize``. Records without a key are never
+    treated as duplicates.
+    """
+    if stream == "property":
+        if record.get("listingId"):
+            return f"property:id:{record['listingId']}"
+        return f"property:url:{normalize_url(record['url'])}" if record.get("url") else None
+    if stream == "agent":
+        if record.get("url"):
+            return f"agent:url:{normalize_url(record['url'])}"
+        phone = "".join(ch for ch in str(record.get("telephone") or "") if ch.isdigit())
+        return f"agent:tel:{phone}" if phone else None
+    if stream == "house_prices":
+        if not record.get("address"):
+            return None
+        return f"house_prices:{_text(record['address'])}|{iso_date(record.get('date_sold')) or ''}"
+    return None
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+class DigestSet:
+    """Exact index of 64-bit record digests.
+
+    About 70 bytes per record in memory however long the keys are; the
+    chance of two different records sharing a digest stays below one in a
+    million up to about six million records.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self._digests = set()
+        if path is not None and path.is_file():
+            with path.open("rb") as f:
+                if f.read(len(_DIGESTS_MAGIC)) != _DIGESTS_MAGIC:
+                    raise ValueError(f"{path} is not a digest set")
+                stored = array("Q")
+                stored.frombytes(f.read())
+            self._digests.update(stored)
+            LOGGER.info("Loaded %d record digest(s) from %s", len(stored), path)
+
+    def add(self, digest: bytes) -> bool:
+        """Add ``digest``; False if it was already there."""
+        value = int.from_bytes(digest[:8], "little")
+        if value in self._digests:
+            return False
+        self._digests.add(value)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def close(self, save: bool = True) -> None:
+        if self.path is None or not save:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("wb") as f:
+            f.write(_DIGESTS_MAGIC)
+            array("Q", self._digests).tofile(f)
+        os.replace(tmp, self.path)
+
+class BloomFilter:
+    """Fixed-size, memory-mapped Bloom filter for runs too big for a digest set.
+
+    Sized for ``capacity`` records at ``error_rate`` false positives, about
+    1.8 bytes per record at 0.1%. A false positive drops a record that was
+    not a duplicate, so keep the rate low. With ``path`` the filter lives
+    in that file; changes go to a copy that replaces it on ``close(save=True)``.
+    """
+
+    def __init__(
+        self, capacity: int, error_rate: float = 0.001, path: Optional[Path] = None
+    ) -> None:
+        self.path = path
+        self.added = 0
+        bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hashes = max(1, round(bits / max(1, capacity) * math.log(2)))
+        self._tmp: Optional[Path] = None
+        self._file = None
+        if path is not None and path.is_file():
+            self._tmp = path.with_name(path.name + ".tmp")
+            shutil.copyfile(path, self._tmp)
+            self._file = self._tmp.open("r+b")
+            magic, bits, hashes = _BLOOM_HEADER.unpack(self._file.read(_BLOOM_HEADER.size))
+            if magic != _BLOOM_MAGIC:
+                raise ValueError(f"{path} is not a Bloom filter")
+            LOGGER.info("Loaded Bloom filter of %.1f MB from %s", bits / 8 / 1e6, path)
+        elif path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._tmp = path.with_name(path.name + ".tmp")
+            self._file = self._tmp.open("w+b")
+            self._file.write(_BLOOM_HEADER.pack(_BLOOM_MAGIC, bits, hashes))
+            self._file.truncate(_BLOOM_HEADER.size + (bits + 7) // 8)
+        self.bits = bits
+        self.hashes = hashes
+        if self._file is not None:
+            self._map = mmap.mmap(self._file.fileno(), 0)
+            self._offset = _BLOOM_HEADER.size
+        else:
+            self._map = mmap.mmap(-1, (bits + 7) // 8)
+            self._offset = 0
+
+    def add(self, digest: bytes) -> bool:
+        """Add ``digest``; False if it was (probably) already there."""
+        # Double hashing: the k positions are h1 + i * h2, from one digest.
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        present = True
+        bitmap = self._map
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.bits
+            index = self._offset + (position >> 3)
+            mask = 1 << (position & 7)
+            byte = bitmap[index]
+            if not byte & mask:
+                present = False
+                bitmap[index] = byte | mask
+        if not present:
+            self.added += 1
+        return not present
+
+    def __len__(self) -> int:
+        return self.added
+
+    def close(self, save: bool = True) -> None:
+        self._map.close()
+        if self._file is None:
+            return
+        self._file.close()
+        if save:
+            os.replace(self._tmp, self.path)
+        else:
+            self._tmp.unlink()
+
+Index = Union[DigestSet, BloomFilter]
+
+class Deduplicator:
+    """Drops records already seen earlier in the run, or in earlier runs.
+
+    Streams share one index; keys are prefixed with the stream name.
+    Streams in ``run_only`` are deduplicated within the run only, in an
+    index of their own that is never saved.
+    """
+
+    def __init__(
+        self, index: Index, metrics: Optional[Metrics] = None, run_only: Iterable[str] = ()
+    ) -> None:
+        self.index = index
+        self.metrics = metrics
+        self.run_only = frozenset(run_only)
+        self._run_index = DigestSet() if self.run_only else None
+        self.dropped: Dict[str, int] = {}
+        # Set when records went into the index without being written (a run
+        # stopped at max_items), so saving it would hide them from the next run.
+        self.truncated = False
+        self._lock = threading.Lock()
+
+    def unique(self, stream: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The records of ``items`` not seen before, in order."""
+        kept = []
+        index = self._run_index if stream in self.run_only else self.index
+        with self._lock:
+            for item in items:
+                key = record_key(stream, item)
+                if key is None or index.add(_digest(key)):
+                    kept.append(item)
+            dropped = len(items) - len(kept)
+            if dropped:
+                self.dropped[stream] = self.dropped.get(stream, 0) + dropped
+        if dropped and self.metrics is not None:
+            self.metrics.inc("zoopla_duplicates_dropped_total", dropped, stream=stream)
+        return kept
+
+    def restore(self, stream: str, records: Iterable[Dict[str, Any]]) -> int:
+        """Mark ``records``, already in the output, as seen; returns how many there were.
+
+        For a resumed run, whose index was not saved when it stopped.
+        """
+        index = self._run_index if stream in self.run_only else self.index
+        count = 0
+        with self._lock:
+            for record in records:
+                key = record_key(stream, record)
+                if key is not None:
+                    index.add(_digest(key))
+                count += 1
+        return count
+
+    def close(self, save: bool = True) -> None:
+        save = save and not self.truncated
+        if not save and self.index.path is not None:
+            LOGGER.info("Not saving the deduplication index; this run's output is incomplete.")
+        self.index.close(save=save)
+
+def open_deduplicator(
+    path: Optional[str] = None,
+    bloom_capacity: int = 0,
+    error_rate: float = 0.001,
+    metrics: Optional[Metrics] = None,
+    run_only: Iterable[str] = (),
+) -> Deduplicator:
+    """A ``Deduplicator`` over a digest set, or a Bloom filter if ``bloom_capacity`` is set.
+
+    With ``path`` the index is loaded from and saved back to that file, so
+    records output by earlier runs are dropped too, except for the streams
+    in ``run_only``.
+    """
+    index_path = Path(path) if path else None
+    if bloom_capacity > 0:
+        index: Index = BloomFilter(bloom_capacity, error_rate, index_path)
+    else:
+        index = DigestSet(index_path)
+    return Deduplicator(index, metrics=metrics, run_only=run_only)
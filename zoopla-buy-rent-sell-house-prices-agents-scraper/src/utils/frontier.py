@@ -0,0 +1,136 @@
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+LOGGER = logging.getLogger("zoopla_scraper.frontier")
+
+def normalize_url(url: str) -> str:
+    """Canonical form of ``url`` for de-duplication and cache keys."""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    path = parts.path or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+class CrawlFrontier:
+    """Search-result pages waiting to be fetched.
+
+    Seeded with the configured URLs and grown one page at a time as
+    next-page links are found, so later pages are only scheduled once the
+    page before them has been parsed. With ``max_items`` set, it stops
+    handing out URLs once the pages already in flight are expected to
+    produce enough records, judged by the average records per page so far.
+    """
+
+    def __init__(
+        self,
+        seeds: Iterable[str],
+        max_items: Optional[int] = None,
+        follow_pagination: bool = False,
+        max_pages_per_seed: Optional[int] = None,
+    ) -> None:
+        self.max_items = max_items
+        self.follow_pagination = follow_pagination
+        self.max_pages_per_seed = max_pages_per_seed or None
+        self.records = 0
+        self.pages = 0
+        self.failed = 0
+        # Set when a known next page is left uncrawled (pagination off or
+        # the per-seed page cap hit), so the results are not the full set.
+        self.truncated = False
+        self._queue: Deque[str] = deque()
+        self._seen: Set[str] = set()
+        self._seed_of: Dict[str, str] = {}
+        self._pages_per_seed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        for url in seeds:
+            self._add(url, seed=url)
+
+    def _add(self, url: str, seed: str) -> bool:
+        key = normalize_url(url)
+        if key in self._seen:
+            return False
+        scheduled = self._pages_per_seed.get(seed, 0)
+        if self.max_pages_per_seed is not None and scheduled >= self.max_pages_per_seed:
+            LOGGER.debug("Page limit reached for %s; not following %s", seed, url)
+            self.truncated = True
+            return False
+        self._seen.add(key)
+        self._seed_of[url] = seed
+        self._pages_per_seed[seed] = scheduled + 1
+        self._queue.append(url)
+        return True
+
+    def restore(
+        self,
+        done: Iterable[Tuple[str, str]],
+        pending: Iterable[Tuple[str, str]],
+        records: int,
+    ) -> None:
+        """Continue an earlier crawl: skip ``done`` pages and queue ``pending`` ones.
+
+        Both are ``(url, seed)`` pairs, so per-seed page limits carry over.
+        """
+        with self._lock:
+            self._queue.clear()
+            self._seen.clear()
+            self._seed_of.clear()
+            self._pages_per_seed.clear()
+            for url, seed in done:
+                self._seen.add(normalize_url(url))
+                self._pages_per_seed[seed] = self._pages_per_seed.get(seed, 0) + 1
+                self.pages += 1
+            self.records = records
+            for url, seed in pending:
+                self._add(url, seed=seed)
+
+    def next_url(self, in_flight: int = 0) -> Optional[str]:
+        """Pop the next URL to fetch, or None if there is none worth fetching now."""
+        with self._lock:
+            if not self._queue or not self._budget_allows(in_flight):
+                return None
+            return self._queue.popleft()
+
+    def page_done(self, url: str, records: int, next_url: Optional[str] = None) -> None:
+        """Record a finished page and schedule its next page, if any."""
+        with self._lock:
+            self.pages += 1
+            self.records += records
+            seed = self._seed_of.pop(url, url)
+            if not next_url or self.limit_reached:
+                return
+            if not self.follow_pagination:
+                self.truncated = True
+            elif self._add(next_url, seed=seed):
+                LOGGER.debug("Scheduled next page %s", next_url)
+
+    def page_failed(self, url: str) -> None:
+        """Record a page that could not be fetched or parsed."""
+        with self._lock:
+            self.failed += 1
+            self._seed_of.pop(url, None)
+
+    def _budget_allows(self, in_flight: int) -> bool:
+        if self.max_items is None:
+            return True
+        if self.records >= self.max_items:
+            return False
+        if not self.pages:
+            # Nothing parsed yet, so there is no per-page yield to judge by.
+            return True
+        expected = self.records + in_flight * (self.records / self.pages)
+        return expected < self.max_items
+
+    @property
+    def exhausted(self) -> bool:
+        """True if every page of every seed was crawled successfully."""
+        return not (self.failed or self.truncated or self.limit_reached or self._queue)
+
+    @property
+    def limit_reached(self) -> bool:
+        return self.max_items is not None and self.records >= self.max_items
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
@@ -0,0 +1,258 @@
+import json
+import logging
+import math
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.dedup import record_key
+from utils.normalize import clean_coordinates, split_postcode
+from utils.state_store import CHANGE_FIELD
+
+LOGGER = logging.getLogger("zoopla_scraper.geo_index")
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+DISTANCE_FIELD = "distance_km"
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points, in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def _compact(postcode: str) -> str:
+    return "".join(postcode.split()).upper()
+
+def _postcodes(record: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    # Normalized records carry their postcode; otherwise read it off the address.
+    if record.get("postcode"):
+        postcode = str(record["postcode"])
+        district = record.get("postcode_district") or postcode.split()[0]
+        return _compact(postcode), _compact(str(district))
+    postcode, district = split_postcode(record.get("address"))
+    return (_compact(postcode), district) if postcode else (None, None)
+
+class RecordIndex:
+    """SQLite store of scraped records, indexed by location and postcode.
+
+    Coordinates go in an R*Tree, postcodes (without spaces) and their
+    districts in B-tree indexes, so radius, bounding-box and postcode
+    lookups read only the matching records instead of scanning an output
+    file. Records are keyed like deduplication (``utils.dedup.record_key``):
+    one seen again replaces the stored copy. Safe to share between streams
+    running side by side.
+    """
+
+    def __init__(self, path: str, commit_every: int = 1000) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.commit_every = max(1, commit_every)
+        self.added = 0
+        self.removed = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                stream TEXT NOT NULL,
+                key TEXT UNIQUE,
+                postcode TEXT,
+                district TEXT,
+                latitude REAL,
+                longitude REAL,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_postcode ON records (postcode);
+            CREATE INDEX IF NOT EXISTS records_district ON records (district);
+            CREATE VIRTUAL TABLE IF NOT EXISTS locations USING rtree (
+                id, min_lat, max_lat, min_lon, max_lon
+            );
+            """
+        )
+
+    def indexing(self, stream: str, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Pass ``records`` through, adding each to the index on the way.
+
+        A record tagged ``change: removed`` by an incremental run is taken
+        out of the index instead.
+        """
+        try:
+            for record in records:
+                if record.get(CHANGE_FIELD) == "removed":
+                    self.remove(stream, record)
+                else:
+                    self.add(stream, record)
+                yield record
+        finally:
+            with self._lock:
+                self._conn.commit()
+
+    def add(self, stream: str, record: Dict[str, Any]) -> None:
+        key = record_key(stream, record)
+        postcode, district = _postcodes(record)
+        coordinates = clean_coordinates(record.get("coordinates"))
+        latitude = coordinates["latitude"] if coordinates else None
+        longitude = coordinates["longitude"] if coordinates else None
+        stored = json.dumps(
+            {k: v for k, v in record.items() if k != CHANGE_FIELD}, ensure_ascii=False, default=str
+        )
+        with self._lock:
+            row = (
+                self._conn.execute("SELECT id FROM records WHERE key = ?", (key,)).fetchone()
+                if key is not None
+                else None
+            )
+            values = (stream, key, postcode, district, latitude, longitude, stored)
+            if row is None:
+                record_id = self._conn.execute(
+                    "INSERT INTO records "
+                    "(stream, key, postcode, district, latitude, longitude, record) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    values,
+                ).lastrowid
+            else:
+                record_id = row[0]
+                self._conn.execute(
+                    "UPDATE records SET stream = ?, key = ?, postcode = ?, district = ?, "
+                    "latitude = ?, longitude = ?, record = ? WHERE id = ?",
+                    (*values, record_id),
+                )
+                self._conn.execute("DELETE FROM locations WHERE id = ?", (record_id,))
+            if coordinates is not None:
+                self._conn.execute(
+                    "INSERT INTO locations VALUES (?, ?, ?, ?, ?)",
+                    (record_id, latitude, latitude, longitude, longitude),
+                )
+            self.added += 1
+            self._committed()
+
+    def remove(self, stream: str, record: Dict[str, Any]) -> None:
+        key = record_key(stream, record)
+        if key is None:
+            return
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM records WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            self._conn.execute("DELETE FROM records WHERE id = ?", row)
+            self._conn.execute("DELETE FROM locations WHERE id = ?", row)
+            self.removed += 1
+            self._committed()
+
+    def _committed(self) -> None:
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self._conn.commit()
+            self._pending = 0
+
+    def within_radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        stream: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Records within ``radius_km`` of a point, nearest first, with ``distance_km`` set."""
+        dlat = radius_km / KM_PER_DEGREE
+        # Widest at the edge of the circle nearest a pole.
+        widest = min(89.9, abs(latitude) + dlat)
+        dlon = min(180.0, radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest))))
+        found = []
+        for stored, lat, lon in self._in_box(
+            latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon, stream
+        ):
+            distance = haversine_km(latitude, longitude, lat, lon)
+            if distance <= radius_km:
+                found.append((distance, stored))
+        found.sort(key=lambda pair: pair[0])
+        records = []
+        for distance, stored in found[:limit] if limit is not None else found:
+            record = json.loads(stored)
+            record[DISTANCE_FIELD] = round(distance, 4)
+            records.append(record)
+        return records
+
+    def within_bbox(
+        self,
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        stream: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Records inside a latitude/longitude box."""
+        found = [stored for stored, _, _ in self._in_box(south, west, north, east, stream)]
+        return [json.loads(stored) for stored in (found[:limit] if limit is not None else found)]
+
+    def by_postcode(
+        self, prefix: str, stream: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Records whose postcode starts with ``prefix``, spaces and case ignored.
+
+        "OX2" also matches OX25 and OX26; use ``by_district`` for one district.
+        """
+        start = _compact(prefix)
+        if not start:
+            return []
+        # A range over the index rather than LIKE, which SQLite will not index here.
+        end = start[:-1] + chr(ord(start[-1]) + 1)
+        return self._select("postcode >= ? AND postcode < ?", [start, end], stream, limit)
+
+    def by_district(
+        self, district: str, stream: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Records in the postcode district ``district`` ("OX25")."""
+        return self._select("district = ?", [_compact(district)], stream, limit)
+
+    def _in_box(
+        self, south: float, west: float, north: float, east: float, stream: Optional[str]
+    ) -> Iterator[Tuple[str, float, float]]:
+        sql = (
+            "SELECT r.record, r.latitude, r.longitude FROM locations l "
+            "JOIN records r ON r.id = l.id "
+            "WHERE l.max_lat >= ? AND l.min_lat <= ? AND l.max_lon >= ? AND l.min_lon <= ?"
+        )
+        params: List[Any] = [south, north, west, east]
+        if stream is not None:
+            sql += " AND r.stream = ?"
+            params.append(stream)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for stored, lat, lon in rows:
+            # The R*Tree stores 32-bit floats, rounded outwards; check the exact values.
+            if south <= lat <= north and west <= lon <= east:
+                yield stored, lat, lon
+
+    def _select(
+        self, where: str, params: List[Any], stream: Optional[str], limit: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        sql = f"SELECT record FROM records WHERE {where}"
+        if stream is not None:
+            sql += " AND stream = ?"
+            params.append(stream)
+        sql += " ORDER BY postcode, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(stored) for (stored,) in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
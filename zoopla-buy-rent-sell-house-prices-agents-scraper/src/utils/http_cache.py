@@ -0,0 +1,191 @@
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Mapping, NamedTuple, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from utils.frontier import normalize_url
+
+LOGGER = logging.getLogger("zoopla_scraper.http_cache")
+
+# Least recently used entries read per eviction query.
+EVICT_BATCH = 64
+
+class CacheEntry(NamedTuple):
+    key: str
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_type: Optional[str]
+    stored_at: float
+
+    def is_fresh(self, ttl: float) -> bool:
+        return ttl > 0 and time.time() - self.stored_at < ttl
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self, url: str) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp._content = self.body
+        resp.headers = CaseInsensitiveDict(
+            {"Content-Type": self.content_type} if self.content_type else {}
+        )
+        resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+        return resp
+
+class ResponseCache:
+    """On-disk HTTP response cache with ETag/Last-Modified revalidation.
+
+    Bodies are stored zlib-compressed in SQLite, keyed by normalized URL.
+    Entries younger than ``ttl`` seconds are served without a request;
+    older ones are revalidated with a conditional GET, and a 304 counts as
+    a hit. Once compressed bodies exceed ``max_bytes`` the least recently
+    used entries are evicted. Their total size is counted at open and kept
+    up to date in memory, so writes by other processes sharing the
+    directory are only seen at the next open.
+    """
+
+    def __init__(self, directory: str, ttl: float = 0, max_bytes: int = 512 * 1024 * 1024) -> None:
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path / "http_cache.sqlite3"
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+        )
+        self._conn.commit()
+        (self._size,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        key = normalize_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, content_type, stored_at "
+                "FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, content_type, stored_at = row
+        return CacheEntry(key, zlib.decompress(body), etag, last_modified, content_type, stored_at)
+
+    def hit(self, entry: CacheEntry, revalidated: bool = False) -> None:
+        """Count a response served from ``entry`` and refresh its recency."""
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self.revalidated += 1
+                self._conn.execute(
+                    "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                    (now, now, entry.key),
+                )
+            else:
+                self.hits += 1
+                self._conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, entry.key)
+                )
+            self._conn.commit()
+            self.bytes_saved += len(entry.body)
+
+    def store(self, url: str, body: bytes, headers: Mapping[str, str]) -> None:
+        """Cache a 200 response; responses marked no-store are skipped."""
+        with self._lock:
+            self.misses += 1
+        if "no-store" in (headers.get("Cache-Control") or "").lower():
+            return
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+        key = normalize_url(url)
+        with self._lock:
+            replaced = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, body, size, etag, last_modified, content_type, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    compressed,
+                    len(compressed),
+                    headers.get("ETag"),
+                    headers.get("Last-Modified"),
+                    headers.get("Content-Type"),
+                    now,
+                    now,
+                ),
+            )
+            self._size += len(compressed) - (replaced[0] if replaced else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        freed = 0
+        evicted = 0
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at ASC LIMIT ?",
+                (EVICT_BATCH,),
+            ).fetchall()
+            if not rows:
+                # Emptied by another process; nothing of ours is left to count.
+                self._size = 0
+                break
+            for key, size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                if self._conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount:
+                    freed += size
+                    evicted += 1
+                self._size -= size
+        if evicted:
+            LOGGER.debug("Evicted %d cached response(s) (%d bytes)", evicted, freed)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from utils.http_cache import ResponseCache
+from utils.metrics import Metrics
+from utils.proxy_manager import ProxyBanned, ProxyManager, looks_blocked
+from utils.rate_limiter import AdaptiveRateLimiter, host_of
+from utils.replay import RecordingAdapter, ReplayAdapter, Replayer, ResponseArchive
+from utils.retry import classify
+
+LOGGER = logging.getLogger("zoopla_scraper.http")
+
+USER_AGENT = "Mozilla/5.0 (compatible; ZooplaScraper/1.0; +https://bitbash.dev/)"
+
+def _accept_encoding() -> str:
+    # urllib3 only decodes brotli bodies when a brotli package is importable,
+    # so only advertise "br" when we can actually read the response.
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return "gzip, deflate"
+    return "gzip, deflate, br"
+
+DEFAULT_HEADERS: Dict[str, str] = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-GB,en;q=0.9",
+    "Accept-Encoding": _accept_encoding(),
+}
+
+class HttpClient:
+    """Keep-alive HTTP transport shared by all extractors.
+
+    One ``requests.Session`` is kept per proxy (plus one for direct
+    connections) so pooled connections are never reused through the wrong
+    exit. Each session's pool holds ``pool_size`` connections per host.
+    With a ``ResponseCache`` attached, fresh cached pages are served
+    without a request and stale ones are revalidated conditionally. With an
+    ``AdaptiveRateLimiter`` attached, every request that goes on the wire
+    waits for a per-host slot and reports its outcome back; with a
+    ``ProxyManager`` attached, the outcome is also credited to the proxy
+    that carried it. Block pages (403 or a bot challenge) raise
+    ``ProxyBanned`` so they are retried rather than parsed. With an
+    ``archive``, successful responses are also recorded to it; with a
+    ``replayer``, responses come from a recorded archive instead of the
+    network, while everything above the transport runs as usual.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 5,
+        timeout: int = 30,
+        headers: Optional[Mapping[str, str]] = None,
+        cache: Optional[ResponseCache] = None,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+        proxy_manager: Optional[ProxyManager] = None,
+        archive: Optional[ResponseArchive] = None,
+        replayer: Optional[Replayer] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.headers: Dict[str, str] = dict(DEFAULT_HEADERS)
+        if headers:
+            self.headers.update(headers)
+        self.cache = cache
+        self.limiter = limiter
+        self.proxy_manager = proxy_manager
+        self.archive = archive
+        self.replayer = replayer
+        self.metrics = metrics
+        self._sessions: Dict[Optional[str], requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, proxies: Optional[Dict[str, str]]) -> requests.Session:
+        key = proxies.get("https") if proxies else None
+        session = self._sessions.get(key)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                session.headers.update(self.headers)
+                if proxies:
+                    session.proxies.update(proxies)
+                adapter = self._adapter()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[key] = session
+                LOGGER.debug("Opened HTTP session for %s", key or "direct connections")
+        return session
+
+    def _adapter(self) -> BaseAdapter:
+        if self.replayer is not None:
+            return ReplayAdapter(self.replayer)
+        pool = {"pool_connections": 4, "pool_maxsize": self.pool_size, "pool_block": False}
+        if self.archive is not None:
+            return RecordingAdapter(self.archive, **pool)
+        return HTTPAdapter(**pool)
+
+    def get(
+        self,
+        url: str,
+        proxies: Optional[Dict[str, str]] = None,
+        timeout: Optional[int] = None,
+    ) -> requests.Response:
+        """GET ``url`` over a pooled connection, raising for HTTP errors."""
+        entry = self.cache.lookup(url) if self.cache is not None else None
+        if entry is not None and entry.is_fresh(self.cache.ttl):
+            self.cache.hit(entry)
+            return entry.to_response(url)
+
+        session = self._session_for(proxies)
+        host = host_of(url)
+        if self.limiter is not None:
+            self.limiter.acquire(host)
+        started = time.monotonic()
+        try:
+            resp = session.get(
+                url,
+                timeout=timeout or self.timeout,
+                headers=entry.conditional_headers() if entry is not None else None,
+            )
+        except requests.RequestException as exc:
+            latency = time.monotonic() - started
+            if self.metrics is not None:
+                self.metrics.record_request(host, classify(exc), latency)
+            if self.limiter is not None:
+                self.limiter.release(host, latency, timed_out=isinstance(exc, requests.Timeout))
+            if self.proxy_manager is not None:
+                self.proxy_manager.report(proxies, latency)
+            raise
+        latency = time.monotonic() - started
+        if self.metrics is not None:
+            # requests reads the whole body before returning; ``elapsed`` stops
+            # at the response headers, so the rest is download time.
+            self.metrics.record_request(
+                host,
+                str(resp.status_code),
+                latency,
+                ttfb=resp.elapsed.total_seconds(),
+                size=len(resp.content),
+            )
+        if self.limiter is not None:
+            self.limiter.release(
+                host,
+                latency,
+                status=resp.status_code,
+                retry_after=resp.headers.get("Retry-After"),
+            )
+        if self.proxy_manager is not None:
+            blocked = self.proxy_manager.report(proxies, latency, resp.status_code, resp.content)
+        else:
+            blocked = looks_blocked(resp.status_code, resp.content)
+        if blocked:
+            raise ProxyBanned(f"Blocked response (HTTP {resp.status_code}) for url: {url}")
+        if resp.status_code == 304 and entry is not None:
+            self.cache.hit(entry, revalidated=True)
+            return entry.to_response(url)
+        resp.raise_for_status()
+        if self.cache is not None:
+            self.cache.store(url, resp.content, resp.headers)
+        return resp
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def __enter__(self) -> "HttpClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+LOGGER = logging.getLogger("zoopla_scraper.metrics")
+
+# Histogram upper bounds in seconds; fine enough to tell a 2 ms parse from
+# a 20 ms one and a 200 ms request from a 2 s one.
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+HELP = {
+    "zoopla_http_request_seconds": "Request time by phase (total, dns, connect, ttfb, download)",
+    "zoopla_http_requests_total": "Requests by host and outcome (HTTP status or error class)",
+    "zoopla_http_response_bytes_total": "Decoded response body bytes by host",
+    "zoopla_parse_seconds": "Time to parse one page, by stream",
+    "zoopla_pages_parsed_total": "Parsed pages by stream and source (json_ld or dom fallback)",
+    "zoopla_records_written": "Records written to the output file, by stream",
+    "zoopla_frontier_pending": "Pages queued for fetching, by stream",
+    "zoopla_parse_queue_depth": "Pages queued for or being parsed in the parse pool",
+    "zoopla_duplicates_dropped_total": "Records dropped as duplicates of earlier ones, by stream",
+    "zoopla_detail_pages_total": "Listing detail pages by outcome (fetched, reused or failed)",
+    "zoopla_detail_queue_depth": "Listing detail pages queued for or being fetched",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus exposes it."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate of the ``q`` quantile, interpolated within its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        estimate = self.max
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / count
+                break
+            seen += count
+        # Never report outside what was actually seen.
+        return min(max(estimate, self.min), self.max)
+
+class Metrics:
+    """Counters, sampled gauges and latency histograms for one run.
+
+    Shared by the HTTP client, both fetch engines and the output stage.
+    Gauges are callables read when a snapshot is taken, so queue depths
+    and record counts cost nothing between reports.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Dict[Labels, Callable[[], float]]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name: str, read: Callable[[], float], **labels: Any) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = read
+
+    def record_request(
+        self,
+        host: str,
+        outcome: str,
+        total: float,
+        ttfb: Optional[float] = None,
+        size: int = 0,
+    ) -> None:
+        """One request that went on the wire; ``outcome`` is its status or error class."""
+        self.observe("zoopla_http_request_seconds", total, phase="total")
+        if ttfb is not None:
+            self.observe("zoopla_http_request_seconds", ttfb, phase="ttfb")
+            self.observe("zoopla_http_request_seconds", max(0.0, total - ttfb), phase="download")
+        self.inc("zoopla_http_requests_total", host=host, status=outcome)
+        if size:
+            self.inc("zoopla_http_response_bytes_total", size, host=host)
+
+    def _read_gauges(self) -> Dict[str, Dict[Labels, float]]:
+        with self._lock:
+            gauges = {name: dict(series) for name, series in self._gauges.items()}
+        values: Dict[str, Dict[Labels, float]] = {}
+        for name, series in gauges.items():
+            for key, read in series.items():
+                try:
+                    values.setdefault(name, {})[key] = float(read())
+                except Exception as exc:  # pragma: no cover - defensive
+                    LOGGER.debug("Could not read gauge %s: %s", name, exc)
+        return values
+
+    def snapshot(self) -> Dict[str, Any]:
+        gauges = self._read_gauges()
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {
+                    key: {
+                        "count": h.count,
+                        "sum": round(h.sum, 6),
+                        "p50": h.quantile(0.5),
+                        "p90": h.quantile(0.9),
+                        "p99": h.quantile(0.99),
+                    }
+                    for key, h in series.items()
+                }
+                for name, series in self._histograms.items()
+            }
+
+        def rows(series: Dict[Labels, Any]) -> List[Dict[str, Any]]:
+            out = []
+            for key, value in sorted(series.items()):
+                row: Dict[str, Any] = {"labels": dict(key)}
+                if isinstance(value, dict):
+                    row.update(value)
+                else:
+                    row["value"] = value
+                out.append(row)
+            return out
+
+        return {
+            "elapsed_s": round(time.monotonic() - self.started, 3),
+            "counters": {name: rows(series) for name, series in sorted(counters.items())},
+            "gauges": {name: rows(series) for name, series in sorted(gauges.items())},
+            "histograms": {name: rows(series) for name, series in sorted(histograms.items())},
+        }
+
+    def render_prometheus(self) -> str:
+        gauges = self._read_gauges()
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {_number(value)}")
+            for name, series in sorted(self._histograms.items()):
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+                for key, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(
+                            f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}"
+                        )
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        for name, series in sorted(gauges.items()):
+            lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} gauge"]
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self) -> List[str]:
+        """End-of-run table: where the time went, page sources and throughput."""
+        snap = self.snapshot()
+        elapsed = max(snap["elapsed_s"], 1e-9)
+        lines = [f"{'timing':<26}{'count':>8}{'mean ms':>10}{'p50 ms':>9}{'p99 ms':>9}"]
+        for name, label in (
+            ("zoopla_http_request_seconds", "phase"),
+            ("zoopla_parse_seconds", "stream"),
+        ):
+            prefix = "request " if label == "phase" else "parse "
+            for row in snap["histograms"].get(name, []):
+                if not row["count"]:
+                    continue
+                lines.append(
+                    f"{prefix + row['labels'].get(label, ''):<26}{row['count']:>8}"
+                    f"{row['sum'] / row['count'] * 1000:>10.1f}"
+                    f"{row['p50'] * 1000:>9.1f}{row['p99'] * 1000:>9.1f}"
+                )
+
+        pages: Dict[str, Dict[str, float]] = {}
+        for row in snap["counters"].get("zoopla_pages_parsed_total", []):
+            pages.setdefault(row["labels"]["stream"], {})[row["labels"]["source"]] = row["value"]
+        for stream, sources in sorted(pages.items()):
+            total = sum(sources.values())
+            lines.append(
+                f"pages {stream}: {total:.0f}, "
+                f"{sources.get('json_ld', 0) / total:.0%} from JSON-LD, "
+                f"{sources.get('dom', 0) / total:.0%} DOM fallback"
+            )
+        for row in snap["gauges"].get("zoopla_records_written", []):
+            lines.append(
+                f"records {row['labels']['stream']}: {row['value']:.0f} "
+                f"({row['value'] / elapsed:.1f}/s)"
+            )
+        received = sum(
+            row["value"] for row in snap["counters"].get("zoopla_http_response_bytes_total", [])
+        )
+        requests = snap["counters"].get("zoopla_http_requests_total", [])
+        outcomes: Dict[str, float] = {}
+        for row in requests:
+            status = row["labels"]["status"]
+            outcomes[status] = outcomes.get(status, 0) + row["value"]
+        lines.append(
+            f"requests: {sum(outcomes.values()):.0f} in {elapsed:.1f}s "
+            f"({', '.join(f'{n:.0f} x {s}' for s, n in sorted(outcomes.items())) or 'none'}), "
+            f"{received / (1024 * 1024):.1f} MB received"
+        )
+        return lines
+
+class _Handler(BaseHTTPRequestHandler):
+    metrics: Metrics
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        LOGGER.debug("metrics endpoint: " + format, *args)
+
+class MetricsReporter:
+    """Publishes ``Metrics`` while a run is going.
+
+    With ``path``, a JSON snapshot (plus records/s over the last interval)
+    is rewritten every ``interval`` seconds and once more at the end. With
+    ``port``, Prometheus text format is served at ``/metrics`` on localhost.
+    """
+
+    def __init__(
+        self,
+        metrics: Metrics,
+        path: Optional[Path] = None,
+        interval: float = 10.0,
+        port: Optional[int] = None,
+    ) -> None:
+        self.metrics = metrics
+        self.path = path
+        self.interval = max(0.1, interval)
+        self.port = port
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._last: Tuple[float, float] = (time.monotonic(), 0.0)
+
+    def start(self) -> None:
+        if self.port is not None:
+            handler = type("MetricsHandler", (_Handler,), {"metrics": self.metrics})
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), handler)
+            threading.Thread(
+                target=self._server.serve_forever, name="metrics-http", daemon=True
+            ).start()
+            LOGGER.info("Serving metrics on http://127.0.0.1:%d/metrics", self._server.server_port)
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._thread = threading.Thread(target=self._loop, name="metrics-file", daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def _write(self) -> None:
+        snapshot = self.metrics.snapshot()
+        written = sum(row["value"] for row in snapshot["gauges"].get("zoopla_records_written", []))
+        now = time.monotonic()
+        last_at, last_written = self._last
+        snapshot["records_per_s"] = round((written - last_written) / max(now - last_at, 1e-9), 1)
+        self._last = (now, written)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            LOGGER.warning("Could not write metrics to %s: %s", self.path, exc)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,307 @@
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Fields normalization adds to each stream's records.
+NORMALIZED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "property": ("postcode", "postcode_district"),
+    "agent": ("postcode", "postcode_district"),
+    "house_prices": ("postcode", "postcode_district"),
+}
+
+# Integer fields per stream, cast from whatever the page gave ("3 beds", 3.0).
+INT_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "property": ("num_bedrooms", "num_bathrooms", "num_reception_rooms"),
+    "agent": (),
+    "house_prices": (),
+}
+
+DATE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "property": (),
+    "agent": (),
+    "house_prices": ("date_sold",),
+}
+
+CURRENCY_SYMBOLS = (("£", "GBP"), ("€", "EUR"), ("$", "USD"))
+
+# Tried in order; the first that parses wins.
+DATE_FORMATS = ("%d %b %Y", "%d %B %Y", "%Y-%m-%d", "%d/%m/%Y")
+# Earlier years are typos or two-digit years, not sale dates.
+MIN_YEAR = 1000
+
+# Below this many records Arrow's per-call overhead outweighs its speed,
+# and row by row is faster (see benchmarks/bench_normalize.py).
+COLUMNAR_MIN_RECORDS = 1000
+
+# Shared by both implementations below, so they agree on every input.
+_NUMBER_PATTERN = r"\d[\d,]*(?:\.\d+)?"
+# A magnitude straight after a number: "£1.2m", "£450k". Not if another
+# letter follows ("3 months", "450kg"); RE2 has no lookahead to say so.
+_SCALE_PATTERN = r"(?P<scale>[kKmM]?)(?P<tail>[A-Za-z]?)"
+_SCALES = {"k": 1_000, "m": 1_000_000}
+_INT_PATTERN = r"\d+"
+_ORDINAL_PATTERN = r"(\d)(?:st|nd|rd|th)\b"
+_ISO_DATETIME_PATTERN = r"^(\d{4}-\d{2}-\d{2})T.*$"
+# A UK postcode at the end of an address: the outward code ("OX25") and,
+# if present, the inward code ("4AB").
+_POSTCODE_PATTERN = (
+    r"(?:^|[\s,])(?P<outward>[A-Z]{1,2}\d[A-Z\d]?)(?:\s*(?P<inward>\d[A-Z]{2}))?[\s.,]*$"
+)
+
+_NUMBER_RE = re.compile(f"(?P<n>{_NUMBER_PATTERN}){_SCALE_PATTERN}")
+_INT_RE = re.compile(_INT_PATTERN)
+_ORDINAL_RE = re.compile(_ORDINAL_PATTERN)
+_ISO_DATETIME_RE = re.compile(_ISO_DATETIME_PATTERN)
+_POSTCODE_RE = re.compile(_POSTCODE_PATTERN)
+
+def normalize_records(stream: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normalize a batch of ``stream`` records in place, and return them.
+
+    Prices become ints with the currency filled in from their symbol, the
+    count fields become ints, dates become ISO ``YYYY-MM-DD``, coordinates
+    outside the valid range are dropped, and the postcode at the end of
+    the address is split out into ``postcode`` and ``postcode_district``.
+    Values that cannot be read become None. Batches of at least
+    ``COLUMNAR_MIN_RECORDS`` run column-wise on Arrow compute when pyarrow
+    is installed; smaller ones, or all without pyarrow, row by row.
+    """
+    if len(records) < COLUMNAR_MIN_RECORDS:
+        return normalize_rows(stream, records)
+    try:
+        import pyarrow.compute  # noqa: F401
+    except ImportError:
+        return normalize_rows(stream, records)
+    return normalize_columns(stream, records)
+
+def _text(value: Any) -> Optional[str]:
+    """``value`` as text, or None for missing and non-scalar values."""
+    if value is None or isinstance(value, (bool, dict, list)):
+        return None
+    return str(value)
+
+# Row by row, in plain Python.
+
+def number_of(value: Any) -> Optional[int]:
+    """The number in ``value`` ("£705,000", "705000.00", "£1.2m") rounded to an int, or None."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return round(value)
+    match = _NUMBER_RE.search(_text(value) or "")
+    if match is None:
+        return None
+    number = float(match.group("n").replace(",", ""))
+    scale = match.group("scale").lower()
+    return round(number * _SCALES[scale] if scale and not match.group("tail") else number)
+
+def _integer(value: Any) -> Optional[int]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    match = _INT_RE.search(_text(value) or "")
+    return int(match.group(0)) if match else None
+
+def currency_of(price: Any) -> Optional[str]:
+    """The currency code of the symbol in a price such as "£705,000", if any."""
+    if not isinstance(price, str):
+        return None
+    for symbol, code in CURRENCY_SYMBOLS:
+        if symbol in price:
+            return code
+    return None
+
+def iso_date(value: Any) -> Optional[str]:
+    """``value`` ("3rd Mar 2024", "03/03/2024") as an ISO date, or None if it is not a date."""
+    text = _text(value)
+    if text is None:
+        return None
+    text = _ISO_DATETIME_RE.sub(r"\1", _ORDINAL_RE.sub(r"\1", text.strip()))
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return parsed.date().isoformat() if parsed.year >= MIN_YEAR else None
+    return None
+
+def _coordinate(value: Any, limit: float) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if -limit <= number <= limit else None
+
+def clean_coordinates(value: Any) -> Optional[Dict[str, float]]:
+    """``value``'s latitude and longitude as floats, or None if missing or out of range."""
+    if not isinstance(value, dict):
+        return None
+    latitude = _coordinate(value.get("latitude"), 90.0)
+    longitude = _coordinate(value.get("longitude"), 180.0)
+    # 0, 0 is where missing geocodes end up, not a place anyone sells houses.
+    if latitude is None or longitude is None or (latitude == 0 and longitude == 0):
+        return None
+    return {"latitude": latitude, "longitude": longitude}
+
+def split_postcode(address: Any) -> Tuple[Optional[str], Optional[str]]:
+    """The postcode at the end of ``address`` and its district ("OX25 4AB", "OX25")."""
+    if not isinstance(address, str):
+        return None, None
+    match = _POSTCODE_RE.search(address.upper())
+    if match is None:
+        return None, None
+    outward, inward = match.group("outward"), match.group("inward")
+    return (f"{outward} {inward}" if inward else outward), outward
+
+def normalize_rows(stream: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """``normalize_records`` one record at a time, without pyarrow."""
+    for record in records:
+        if "price" in record:
+            price = record["price"]
+            if not record.get("currency"):
+                record["currency"] = currency_of(price)
+            record["price"] = number_of(price)
+        for field in INT_FIELDS[stream]:
+            if field in record:
+                record[field] = _integer(record[field])
+        for field in DATE_FIELDS[stream]:
+            if field in record:
+                record[field] = iso_date(record[field])
+        if "coordinates" in record:
+            record["coordinates"] = clean_coordinates(record["coordinates"])
+        record["postcode"], record["postcode_district"] = split_postcode(record.get("address"))
+    return records
+
+# Column-wise, on Arrow compute.
+
+def _strings(pa: Any, values: Sequence[Any]) -> Any:
+    return pa.array([_text(v) for v in values], type=pa.string())
+
+def _numbers_column(
+    pa: Any, pc: Any, values: Sequence[Any], pattern: str, scalar: Callable[[Any], Any]
+) -> List[Any]:
+    # struct_field, unlike StructArray.field, keeps non-matches null.
+    found = pc.struct_field(pc.extract_regex(_strings(pa, values), f"(?P<n>{pattern})"), "n")
+    cleaned = pc.replace_substring(found, ",", "")
+    numbers = pc.cast(cleaned, pa.float64())
+    rounded = pc.cast(pc.round(numbers, round_mode="half_to_even"), pa.int64())
+    column = rounded.to_pylist()
+    # Numbers the page gave as numbers skip the text round trip.
+    for i, value in enumerate(values):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            column[i] = scalar(value)
+    return column
+
+def _prices_column(pa: Any, pc: Any, values: Sequence[Any]) -> List[Any]:
+    found = pc.extract_regex(_strings(pa, values), f"(?P<n>{_NUMBER_PATTERN}){_SCALE_PATTERN}")
+    numbers = pc.cast(pc.replace_substring(pc.struct_field(found, "n"), ",", ""), pa.float64())
+    scale = pc.if_else(
+        pc.equal(pc.struct_field(found, "tail"), ""),
+        pc.utf8_lower(pc.struct_field(found, "scale")),
+        "",
+    )
+    factor = pc.if_else(
+        pc.equal(scale, "m"), _SCALES["m"], pc.if_else(pc.equal(scale, "k"), _SCALES["k"], 1)
+    )
+    scaled = pc.multiply(numbers, pc.cast(factor, pa.float64()))
+    column = pc.cast(pc.round(scaled, round_mode="half_to_even"), pa.int64()).to_pylist()
+    for i, value in enumerate(values):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            column[i] = number_of(value)
+    return column
+
+def _currency_column(pa: Any, pc: Any, prices: Sequence[Any]) -> List[Optional[str]]:
+    text = pa.array([v if isinstance(v, str) else None for v in prices], type=pa.string())
+    found = pa.nulls(len(prices), pa.string())
+    # Reversed, so the first symbol in CURRENCY_SYMBOLS wins, as in currency_of.
+    for symbol, code in reversed(CURRENCY_SYMBOLS):
+        found = pc.if_else(pc.fill_null(pc.match_substring(text, symbol), False), code, found)
+    return found.to_pylist()
+
+def _dates_column(pa: Any, pc: Any, values: Sequence[Any]) -> List[Optional[str]]:
+    text = pc.utf8_trim_whitespace(_strings(pa, values))
+    text = pc.replace_substring_regex(text, _ORDINAL_PATTERN, r"\1")
+    text = pc.replace_substring_regex(text, _ISO_DATETIME_PATTERN, r"\1")
+    parsed = pc.coalesce(
+        *(pc.strptime(text, format=fmt, unit="s", error_is_null=True) for fmt in DATE_FORMATS)
+    )
+    # Arrow rolls a day past the end of the month over (31/02 -> 02/03)
+    # where Python rejects it, so check the day against the one written:
+    # the text's first number, or its last in an ISO date.
+    written = pc.coalesce(
+        pc.struct_field(pc.extract_regex(text, r"^(?P<day>\d{1,2})\D"), "day"),
+        pc.struct_field(pc.extract_regex(text, r"-(?P<day>\d{1,2})$"), "day"),
+    )
+    valid = pc.and_(
+        pc.equal(pc.day(parsed), pc.cast(written, pa.int64())),
+        # Arrow's %Y also takes two-digit years ("3 Mar 24" -> year 24).
+        pc.greater_equal(pc.year(parsed), MIN_YEAR),
+    )
+    dates = pc.cast(pc.if_else(valid, parsed, None), pa.date32())
+    return pc.cast(dates, pa.string()).to_pylist()
+
+def _coordinates_column(pa: Any, pc: Any, values: Sequence[Any]) -> List[Optional[Dict[str, float]]]:
+    def axis(key: str, limit: float) -> Any:
+        numbers = pa.array(
+            [_coordinate(v.get(key), float("inf")) if isinstance(v, dict) else None for v in values],
+            type=pa.float64(),
+        )
+        in_range = pc.and_(pc.greater_equal(numbers, -limit), pc.less_equal(numbers, limit))
+        return pc.if_else(in_range, numbers, None)
+
+    latitude = axis("latitude", 90.0)
+    longitude = axis("longitude", 180.0)
+    valid = pc.and_(
+        pc.and_(pc.is_valid(latitude), pc.is_valid(longitude)),
+        pc.invert(pc.and_(pc.equal(latitude, 0.0), pc.equal(longitude, 0.0))),
+    )
+    return [
+        {"latitude": lat, "longitude": lon} if ok else None
+        for ok, lat, lon in zip(valid.to_pylist(), latitude.to_pylist(), longitude.to_pylist())
+    ]
+
+def _postcodes_column(pa: Any, pc: Any, addresses: Sequence[Any]) -> Tuple[List[Any], List[Any]]:
+    text = pc.utf8_upper(
+        pa.array([v if isinstance(v, str) else None for v in addresses], type=pa.string())
+    )
+    found = pc.extract_regex(text, _POSTCODE_PATTERN)
+    outward = pc.struct_field(found, "outward")
+    inward = pc.struct_field(found, "inward")
+    has_inward = pc.fill_null(pc.not_equal(inward, ""), False)
+    full = pc.if_else(has_inward, pc.binary_join_element_wise(outward, inward, " "), outward)
+    return full.to_pylist(), outward.to_pylist()
+
+def normalize_columns(stream: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """``normalize_records`` on Arrow arrays, one column at a time."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    def column(field: str) -> List[Any]:
+        return [r.get(field) for r in records]
+
+    columns: Dict[str, List[Any]] = {}
+    # Output field -> the field a record must have for it to be set.
+    needs: Dict[str, str] = {}
+    if any("price" in r for r in records):
+        prices = column("price")
+        columns["price"] = _prices_column(pa, pc, prices)
+        detected = _currency_column(pa, pc, prices)
+        columns["currency"] = [r.get("currency") or c for r, c in zip(records, detected)]
+        needs["price"] = needs["currency"] = "price"
+    for field in INT_FIELDS[stream]:
+        columns[field] = _numbers_column(pa, pc, column(field), _INT_PATTERN, _integer)
+        needs[field] = field
+    for field in DATE_FIELDS[stream]:
+        columns[field] = _dates_column(pa, pc, column(field))
+        needs[field] = field
+    if any("coordinates" in r for r in records):
+        columns["coordinates"] = _coordinates_column(pa, pc, column("coordinates"))
+        needs["coordinates"] = "coordinates"
+    columns["postcode"], columns["postcode_district"] = _postcodes_column(
+        pa, pc, column("address")
+    )
+
+    for field, values in columns.items():
+        need = needs.get(field)
+        for record, value in zip(records, values):
+            if need is None or need in record:
+                record[field] = value
+    return records
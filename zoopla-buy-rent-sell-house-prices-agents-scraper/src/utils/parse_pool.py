@@ -0,0 +1,84 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+LOGGER = logging.getLogger("zoopla_scraper.parse_pool")
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+class ParsePool:
+    """Process pool that runs the ``utils.parser`` functions off the fetch threads.
+
+    At most ``queue_size`` pages are queued or being parsed at once. Once
+    that many are outstanding, ``submit`` blocks the calling fetch thread, so
+    raw pages cannot pile up in memory when parsing falls behind fetching.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple[Any, ...] = (),
+    ) -> None:
+        self.workers = max(1, workers or default_workers())
+        self.queue_size = max(1, queue_size or self.workers * 4)
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=initializer, initargs=initargs
+        )
+        LOGGER.debug(
+            "Started %d parse worker(s) with a queue of %d page(s)",
+            self.workers,
+            self.queue_size,
+        )
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> "Future[Any]":
+        """Queue ``func(*args)`` for a parse worker, blocking while the queue is full."""
+        self._slots.acquire()
+        return self._submit(func, *args)
+
+    async def parse_async(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Awaitable ``submit`` that waits for a queue slot without blocking the loop."""
+        import asyncio
+
+        # Poll rather than block a helper thread, so a cancelled caller never
+        # leaves behind a slot that nobody will release.
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(0.005)
+        return await asyncio.wrap_future(self._submit(func, *args))
+
+    def _submit(self, func: Callable[..., Any], *args: Any) -> "Future[Any]":
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending += 1
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future: "Future[Any]") -> None:
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    @property
+    def pending(self) -> int:
+        """Pages queued for or being parsed right now."""
+        return self._pending
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
@@ -1,17 +1,190 @@
-thonimport json
+import codecs
+import html as html_lib
+import json
 import logging
-from typing import Any, Dict, Iterable, List
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 
-from bs4 import BeautifulSoup
+from lxml import etree
+
+from utils.normalize import currency_of
+from utils.selector_plans import plan
 
 LOGGER = logging.getLogger("zoopla_scraper.parser")
 
-def _extract_json_ld(html: str) -> Iterable[Dict[str, Any]]:
-    """Extract JSON-LD structures embedded in the page."""
-    soup = BeautifulSoup(html, "lxml")
-    for script in soup.find_all("script", type="application/ld+json"):
+def _patterns(pattern: str, flags: int = 0) -> Dict[type, "re.Pattern[Any]"]:
+    """``pattern`` compiled for both str and bytes, so pages can be scanned undecoded."""
+    return {str: re.compile(pattern, flags), bytes: re.compile(pattern.encode("ascii"), flags)}
+
+# Script bodies are raw text in HTML (no entity decoding), so a regex scan
+# returns exactly what a DOM parser would hand back for the same element.
+_JSON_LD_RE = _patterns(
+    r"<script\b[^>]*\btype\s*=\s*[\"']?application/ld\+json[\"']?[^>]*>(.*?)</script\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_TAG_RE = _patterns(r"<(?:a|link)\b[^>]*>", re.IGNORECASE)
+_REL_NEXT_RE = _patterns(r"\brel\s*=\s*[\"']?next\b", re.IGNORECASE)
+_HREF_RE = _patterns(r"\bhref\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>]+))", re.IGNORECASE)
+_PAGE_PARAM_RE = _patterns(r"[?&](?:amp;)?pn=(\d+)")
+_META_CHARSET_RE = re.compile(rb"<meta\b[^>]*?\bcharset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+_HEADER_CHARSET_RE = re.compile(r";\s*charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+
+# UTF-16 byte order marks and codecs: the bytes scans above cannot read
+# UTF-16 or UTF-32, so those pages are decoded up front.
+_WIDE_BOMS = (b"\xff\xfe", b"\xfe\xff")
+_WIDE_CODECS = ("utf-16", "utf-32")
+
+_parsers = threading.local()
+
+# Output schemas, in column order. Every record a parser returns uses a
+# subset of its page type's fields, so writers can fix the CSV header up front.
+PROPERTY_FIELDS = (
+    "listingId",
+    "url",
+    "title",
+    "price",
+    "currency",
+    "address",
+    "property_type",
+    "category",
+    "num_bedrooms",
+    "num_bathrooms",
+    "num_reception_rooms",
+    "description",
+    "features",
+    "agent_name",
+    "agent_phone",
+    "agent_logo",
+    "coordinates",
+    "tenure",
+    "council_tax_band",
+    "broadband",
+    "transport",
+    "images",
+    "floorplans",
+    "price_history",
+    "publication_status",
+)
+AGENT_FIELDS = ("name", "url", "telephone", "logo", "address", "aggregate_rating")
+HOUSE_PRICE_FIELDS = ("address", "price", "currency", "date_sold", "coordinates")
+
+class ParsedDocument:
+    """A fetched page, parsed at most once and shared by every extraction pass.
+
+    JSON-LD blocks are pulled out with a plain text scan; the lxml tree is
+    only built if a caller falls back to DOM parsing. Pages fetched as
+    bytes stay bytes: the scans run on them directly and lxml decodes
+    while parsing, so the page is never copied into a str. The encoding is
+    taken from a byte order mark, else ``encoding`` (the charset of the
+    HTTP Content-Type header), else the page's ``<meta charset>``, else
+    UTF-8.
+    """
+
+    def __init__(self, html: Union[str, bytes], encoding: Optional[str] = None) -> None:
+        self.encoding: Optional[str] = None
+        if isinstance(html, bytes):
+            declared = _declared_encoding(html, encoding)
+            encoding = None if _is_wide(declared) else _usable_encoding(declared)
+            if html.startswith(_WIDE_BOMS):
+                html = html.decode("utf-16", errors="replace")
+            elif _is_wide(declared):
+                html = html.decode(declared, errors="replace")
+            elif encoding is None:
+                html = html.decode("utf-8", errors="replace")
+            else:
+                self.encoding = encoding
+        self.markup: Union[str, bytes] = html
+        self._json_ld: Optional[List[Dict[str, Any]]] = None
+        self._tree: Any = None
+        self._parsed = False
+
+    def text(self, raw: Union[str, bytes]) -> str:
+        """A piece of the page's markup as str."""
+        if isinstance(raw, str):
+            return raw
+        return raw.decode(self.encoding, errors="replace")
+
+    @property
+    def json_ld(self) -> List[Dict[str, Any]]:
+        if self._json_ld is None:
+            self._json_ld = list(_scan_json_ld(self))
+        return self._json_ld
+
+    @property
+    def used_dom(self) -> bool:
+        """True once something needed the DOM tree, i.e. JSON-LD was not enough."""
+        return self._parsed
+
+    @property
+    def tree(self) -> Any:
+        """lxml root element, or None for a page with no markup at all."""
+        if not self._parsed:
+            if not self.markup.strip():
+                self._tree = None
+            elif self.encoding is None:
+                self._tree = etree.HTML(self.markup)
+            else:
+                self._tree = etree.HTML(self.markup, parser=_html_parser(self.encoding))
+            self._parsed = True
+        return self._tree
+
+def header_encoding(content_type: Optional[str]) -> Optional[str]:
+    """The charset a Content-Type header declares, if any."""
+    match = _HEADER_CHARSET_RE.search(content_type or "")
+    return match.group(1) if match else None
+
+def _declared_encoding(html: bytes, header: Optional[str] = None) -> Optional[str]:
+    if html.startswith(b"\xef\xbb\xbf"):
+        return "utf-8"
+    if header and (_is_wide(header) or _usable_encoding(header) is not None):
+        return header
+    match = _META_CHARSET_RE.search(html, 0, 2048)
+    return match.group(1).decode("ascii") if match else None
+
+def _is_wide(encoding: Optional[str]) -> bool:
+    try:
+        return bool(encoding) and codecs.lookup(encoding).name.startswith(_WIDE_CODECS)
+    except LookupError:
+        return False
+
+def _usable_encoding(encoding: Optional[str]) -> Optional[str]:
+    """``encoding`` if both Python and lxml know it, UTF-8 if none was declared, else None."""
+    if not encoding:
+        return "utf-8"
+    try:
+        codecs.lookup(encoding)
+        _html_parser(encoding)
+    except LookupError:
+        LOGGER.debug("Unknown page encoding %r; decoding as UTF-8", encoding)
+        return None
+    return encoding
+
+def _html_parser(encoding: str) -> etree.HTMLParser:
+    # lxml parsers are not thread-safe, so each thread keeps its own.
+    cache = getattr(_parsers, "by_encoding", None)
+    if cache is None:
+        cache = _parsers.by_encoding = {}
+    parser = cache.get(encoding)
+    if parser is None:
+        parser = cache[encoding] = etree.HTMLParser(encoding=encoding)
+    return parser
+
+Document = Union[str, bytes, ParsedDocument]
+
+def as_document(html: Document, encoding: Optional[str] = None) -> ParsedDocument:
+    """Wrap raw HTML in a ParsedDocument, passing existing documents through."""
+    if isinstance(html, ParsedDocument):
+        return html
+    return ParsedDocument(html, encoding)
+
+def _scan_json_ld(doc: ParsedDocument) -> Iterable[Dict[str, Any]]:
+    for match in _JSON_LD_RE[type(doc.markup)].finditer(doc.markup):
         try:
-            data = json.loads(script.string or "")
+            data = json.loads(doc.text(match.group(1)))
         except (TypeError, json.JSONDecodeError):
             continue
         if isinstance(data, dict):
@@ -21,16 +194,21 @@ def _extract_json_ld(html: str) -> Iterable[Dict[str, Any]]:
                 if isinstance(item, dict):
                     yield item
 
-def parse_property_listings(html: str) -> List[Dict[str, Any]]:
+def _extract_json_ld(html: Document) -> Iterable[Dict[str, Any]]:
+    """Extract JSON-LD structures embedded in the page."""
+    return iter(as_document(html).json_ld)
+
+def parse_property_listings(html: Document) -> List[Dict[str, Any]]:
     """Parse property listing data from Zoopla HTML.
 
     This implementation prefers structured JSON-LD data but falls back to
     simple DOM-based extraction for robustness.
     """
+    doc = as_document(html)
     properties: List[Dict[str, Any]] = []
 
     # First, try JSON-LD
-    for block in _extract_json_ld(html):
+    for block in doc.json_ld:
         if block.get("@type") in {"Offer", "SingleFamilyResidence", "Apartment", "House"}:
             try:
                 props = _map_json_ld_to_property(block)
@@ -43,34 +221,26 @@ def parse_property_listings(html: str) -> List[Dict[str, Any]]:
         return properties
 
     # Fallback: DOM parsing
-    soup = BeautifulSoup(html, "lxml")
-    cards = soup.select("[data-listing-id]")
-    for card in cards:
-        listing_id = card.get("data-listing-id")
-        title_el = card.select_one("h2, h3")
-        price_el = card.select_one(".css-1e28vvi, .css-1e4fdj9, .price")
-        address_el = card.select_one("[data-testid='listing-card-address'], .css-1f3n3r9, .address")
-        link_el = card.select_one("a[href*='/for-sale/'], a[href*='/to-rent/'], a[href*='/details/']")
-        property_type_el = card.select_one("[data-testid='listing-card-subtitle'], .property-type")
-        agent_el = card.select_one("[data-testid='listing-card-agent-name'], .agent_name")
-
-        if not listing_id:
+    for card in plan("property").extract(doc.tree):
+        if not card["listingId"]:
             continue
-
+        price = card["price"]
         property_data: Dict[str, Any] = {
-            "listingId": listing_id,
-            "url": link_el["href"] if link_el and link_el.has_attr("href") else None,
-            "title": title_el.get_text(strip=True) if title_el else None,
-            "price": _parse_price(price_el.get_text(strip=True)) if price_el else None,
-            "address": address_el.get_text(strip=True) if address_el else None,
-            "property_type": property_type_el.get_text(strip=True) if property_type_el else None,
+            "listingId": card["listingId"],
+            "url": card["url"],
+            "title": card["title"],
+            "price": _parse_price(price) if price is not None else None,
+            # From the text, as _parse_price drops the symbol.
+            "currency": currency_of(price),
+            "address": card["address"],
+            "property_type": card["property_type"],
             "category": None,
             "num_bedrooms": None,
             "num_bathrooms": None,
             "num_reception_rooms": None,
             "description": None,
             "features": [],
-            "agent_name": agent_el.get_text(strip=True) if agent_el else None,
+            "agent_name": card["agent_name"],
             "agent_phone": None,
             "agent_logo": None,
             "coordinates": None,
@@ -87,6 +257,59 @@ def parse_property_listings(html: str) -> List[Dict[str, Any]]:
 
     return properties
 
+# Fields a listing's detail page can fill in that search cards leave empty.
+DETAIL_FIELDS = (
+    "description",
+    "features",
+    "num_bedrooms",
+    "num_bathrooms",
+    "num_reception_rooms",
+    "tenure",
+    "council_tax_band",
+    "broadband",
+    "transport",
+    "floorplans",
+    "images",
+    "price_history",
+    "coordinates",
+)
+
+def parse_property_details(html: Document, encoding: Optional[str] = None) -> Dict[str, Any]:
+    """Parse the fields of a listing detail page that search cards lack.
+
+    Only fields with a value are returned. JSON-LD is used where the page
+    has it, with the ``property_detail`` selector plan filling the rest.
+    ``encoding`` is the charset of the response's Content-Type header.
+    """
+    doc = as_document(html, encoding)
+    details: Dict[str, Any] = {}
+
+    for block in doc.json_ld:
+        if block.get("@type") in {"Offer", "SingleFamilyResidence", "Apartment", "House"}:
+            try:
+                mapped = _map_json_ld_to_property(block)
+            except Exception as exc:  # pragma: no cover - defensive
+                LOGGER.debug("Failed to map JSON-LD detail block: %s", exc)
+                continue
+            for field in DETAIL_FIELDS:
+                if mapped.get(field) and field not in details:
+                    details[field] = mapped[field]
+
+    cards = plan("property_detail").extract(doc.tree)
+    page = cards[0] if cards else {}
+    for field in ("num_bedrooms", "num_bathrooms", "num_reception_rooms"):
+        if page.get(field):
+            page[field] = _parse_price(page[field])
+    if page.get("first_published") or page.get("first_published_price"):
+        page["price_history"] = {
+            "firstPublished": page.get("first_published"),
+            "price": page.get("first_published_price"),
+        }
+    for field in DETAIL_FIELDS:
+        if page.get(field) and field not in details:
+            details[field] = page[field]
+    return details
+
 def _map_json_ld_to_property(block: Dict[str, Any]) -> Dict[str, Any]:
     offer = block
     listing_id = (
@@ -157,14 +380,13 @@ def _parse_price(raw: str) -> Any:
         LOGGER.debug("Failed to parse price from %r", raw)
         return None
 
-def parse_agent_listings(html: str) -> List[Dict[str, Any]]:
+def parse_agent_listings(html: Document) -> List[Dict[str, Any]]:
     """Parse agent and branch information from Zoopla HTML."""
+    doc = as_document(html)
     agents: List[Dict[str, Any]] = []
 
-    soup = BeautifulSoup(html, "lxml")
-
     # Try JSON-LD first
-    for block in _extract_json_ld(html):
+    for block in doc.json_ld:
         if block.get("@type") in {"RealEstateAgent", "Organization"}:
             agent = {
                 "name": block.get("name"),
@@ -180,33 +402,26 @@ def parse_agent_listings(html: str) -> List[Dict[str, Any]]:
         return agents
 
     # Fallback DOM parsing for agents directory
-    cards = soup.select("[data-testid='agent-card'], .agent-card")
-    for card in cards:
-        name_el = card.select_one("h2, h3, .agent-name")
-        phone_el = card.select_one("a[href^='tel:'], .agent-phone")
-        logo_el = card.select_one("img")
-        address_el = card.select_one(".agent-address, address")
-        url_el = card.select_one("a[href]")
-
+    for card in plan("agent").extract(doc.tree):
+        telephone = card["telephone"]
         agent: Dict[str, Any] = {
-            "name": name_el.get_text(strip=True) if name_el else None,
-            "telephone": (phone_el.get("href") or "").replace("tel:", "") if phone_el else None,
-            "logo": logo_el.get("src") if logo_el and logo_el.has_attr("src") else None,
-            "address": address_el.get_text(strip=True) if address_el else None,
-            "url": url_el.get("href") if url_el and url_el.has_attr("href") else None,
+            "name": card["name"],
+            "telephone": telephone.replace("tel:", "") if telephone is not None else None,
+            "logo": card["logo"],
+            "address": card["address"],
+            "url": card["url"],
         }
         agents.append(agent)
 
     return agents
 
-def parse_house_prices(html: str) -> List[Dict[str, Any]]:
+def parse_house_prices(html: Document) -> List[Dict[str, Any]]:
     """Parse sold house price information from Zoopla HTML."""
+    doc = as_document(html)
     records: List[Dict[str, Any]] = []
 
-    soup = BeautifulSoup(html, "lxml")
-
     # Attempt JSON-LD extraction first
-    for block in _extract_json_ld(html):
+    for block in doc.json_ld:
         if block.get("@type") in {"Offer", "Product"} and "price" in block:
             address = block.get("itemOffered", {}).get("address", {})
             coordinates = block.get("itemOffered", {}).get("geo", {})
@@ -233,19 +448,78 @@ def parse_house_prices(html: str) -> List[Dict[str, Any]]:
         return records
 
     # Fallback to table-based parsing
-    rows = soup.select("table tr")
-    for row in rows:
-        cols = [col.get_text(strip=True) for col in row.find_all("td")]
+    for row in plan("house_prices").extract(doc.tree):
+        cols = row["cells"]
         if len(cols) < 3:
             continue
         address, price_text, date_text = cols[:3]
         record = {
             "address": address,
             "price": _parse_price(price_text),
-            "currency": None,
+            "currency": currency_of(price_text),
             "date_sold": date_text,
             "coordinates": None,
         }
         records.append(record)
 
-    return records
\ No newline at end of file
+    return records
+
+def find_next_page(html: Document, url: str) -> Optional[str]:
+    """Return the URL of the search results page after ``url``, if there is one.
+
+    Prefers an explicit ``rel="next"`` link; otherwise looks for Zoopla's
+    ``?pn=N`` pagination links and steps to the following page number.
+    """
+    doc = as_document(html)
+    kind = type(doc.markup)
+    for tag in _TAG_RE[kind].finditer(doc.markup):
+        text = tag.group(0)
+        if _REL_NEXT_RE[kind].search(text):
+            href = _HREF_RE[kind].search(text)
+            if href:
+                target = next(g for g in href.groups() if g is not None)
+                return urljoin(url, html_lib.unescape(doc.text(target)))
+
+    page_numbers = [int(n) for n in _PAGE_PARAM_RE[kind].findall(doc.markup)]
+    if not page_numbers:
+        return None
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    try:
+        current = int(query.get("pn", "1"))
+    except ValueError:
+        return None
+    if max(page_numbers) <= current:
+        return None
+    query["pn"] = str(current + 1)
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def parse_with_next_page(
+    parse: Callable[[Document], List[Dict[str, Any]]],
+    html: Document,
+    url: str,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Run ``parse`` and find the next results page from the same document."""
+    doc = as_document(html)
+    return parse(doc), find_next_page(doc, url)
+
+class ParsedPage(NamedTuple):
+    items: List[Dict[str, Any]]
+    next_url: Optional[str]
+    seconds: float
+    used_dom: bool
+
+def parse_page_timed(
+    parse: Callable[[Document], List[Dict[str, Any]]],
+    html: Document,
+    url: str,
+    encoding: Optional[str] = None,
+) -> ParsedPage:
+    """``parse_with_next_page``, plus how long it took and whether the DOM fallback ran.
+
+    ``encoding`` is the charset of the response's Content-Type header.
+    """
+    started = time.perf_counter()
+    doc = as_document(html, encoding)
+    items, next_url = parse_with_next_page(parse, doc, url)
+    return ParsedPage(items, next_url, time.perf_counter() - started, doc.used_dom)
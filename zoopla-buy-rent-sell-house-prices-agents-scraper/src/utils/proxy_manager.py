@@ -1,30 +1,196 @@
-thonimport itertools
 import logging
-from typing import Dict, Iterable, List, Optional
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
 
 LOGGER = logging.getLogger("zoopla_scraper.proxy")
 
+BAN_STATUSES = {403}
+
+# Markers of the bot-challenge pages anti-scraping services serve with a 200.
+CHALLENGE_MARKERS = (b"captcha-delivery.com", b"px-captcha", b"cf_chl_opt", b"_Incapsula_Resource")
+
+# Challenge pages are small; only the start of a body is searched.
+CHALLENGE_SCAN_BYTES = 64 * 1024
+
+class ProxyBanned(Exception):
+    """The response was a block page (403 or a bot challenge)."""
+
+    error_class = "banned"
+
+def looks_blocked(status: Optional[int], body: Optional[bytes] = None) -> bool:
+    if status in BAN_STATUSES:
+        return True
+    if status != 200 or not body:
+        return False
+    head = body[:CHALLENGE_SCAN_BYTES]
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+def redact(proxy_url: str) -> str:
+    """``proxy_url`` without credentials, for logs and stats."""
+    parts = urlsplit(proxy_url)
+    if not parts.password and not parts.username:
+        return proxy_url
+    host = parts.hostname or ""
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return f"{parts.scheme}://{host}"
+
+class _ProxyState:
+    """Health of one proxy, updated after every request through it."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.latency: Optional[float] = None  # EWMA, seconds
+        self.error_rate = 0.0  # EWMA of failures, 0..1
+        self.requests = 0
+        self.failures = 0
+        self.bans = 0
+        self.strikes = 0  # consecutive failures
+        self.cooldowns = 0
+        self.cooldown_until = 0.0
+
+    def score(self) -> float:
+        latency = self.latency if self.latency is not None else 1.0
+        return max(0.05, 1.0 - self.error_rate) / max(latency, 0.05)
+
 class ProxyManager:
-    """Simple round-robin proxy manager for requests."""
+    """Health-scored proxy pool.
+
+    Each proxy tracks a latency EWMA, an error-rate EWMA and ban signals
+    (403 responses and challenge pages). Proxies are drawn at random
+    weighted by ``(1 - error_rate) / latency``. A ban, or ``max_strikes``
+    failures in a row, puts a proxy into cooldown for ``cooldown`` seconds,
+    doubling on each repeat; once that ends the proxy is tried again. With
+    ``sticky`` on, each session key (the target host) keeps its proxy until
+    that proxy goes into cooldown.
 
-    def __init__(self, proxies: Optional[Iterable[str]] = None, enabled: bool = False) -> None:
+    All state sits behind one lock held only for bookkeeping, so the pool
+    can be shared by worker threads and the async engine's event loop.
+    """
+
+    def __init__(
+        self,
+        proxies: Optional[Iterable[str]] = None,
+        enabled: bool = False,
+        sticky: bool = False,
+        cooldown: float = 60.0,
+        max_cooldown: float = 900.0,
+        max_strikes: int = 3,
+        alpha: float = 0.2,
+    ) -> None:
         self._enabled = enabled
-        self._proxies: List[str] = list(proxies or [])
-        self._cycle = itertools.cycle(self._proxies) if self._proxies else None
+        self._proxies: List[str] = list(dict.fromkeys(proxies or []))
+        self._states = {url: _ProxyState(url) for url in self._proxies}
+        self.sticky = sticky
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_strikes = max(1, max_strikes)
+        self.alpha = alpha
+        self._sticky: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
         if self._enabled and not self._proxies:
             LOGGER.warning("ProxyManager enabled but no proxies were provided.")
 
-    def get_next_proxy(self) -> Optional[Dict[str, str]]:
-        """Return the next proxy mapping for requests, or None if disabled."""
-        if not self._enabled or not self._cycle:
+    def get_next_proxy(self, session_key: Optional[str] = None) -> Optional[Dict[str, str]]:
+        """Return a proxy mapping for requests, or None if disabled."""
+        if not self._enabled or not self._proxies:
             return None
-        proxy_url = next(self._cycle)
-        LOGGER.debug("Using proxy %s", proxy_url)
+        with self._lock:
+            proxy_url = self._pick(session_key)
+        LOGGER.debug("Using proxy %s", redact(proxy_url))
         return {
             "http": proxy_url,
             "https": proxy_url,
         }
 
+    def _pick(self, session_key: Optional[str]) -> str:
+        now = time.monotonic()
+        if self.sticky and session_key is not None:
+            current = self._sticky.get(session_key)
+            if current is not None and self._states[current].cooldown_until <= now:
+                return current
+        available = [s for s in self._states.values() if s.cooldown_until <= now]
+        if available:
+            state = self._random.choices(available, weights=[s.score() for s in available])[0]
+        else:
+            # Everything is cooling down; probe the one that is due back first.
+            state = min(self._states.values(), key=lambda s: s.cooldown_until)
+        if self.sticky and session_key is not None:
+            self._sticky[session_key] = state.url
+        return state.url
+
+    def report(
+        self,
+        proxies: Optional[Dict[str, str]],
+        latency: float,
+        status: Optional[int] = None,
+        body: Optional[bytes] = None,
+    ) -> bool:
+        """Record the outcome of a request made through ``proxies``.
+
+        ``status`` is None for transport errors (connection refused,
+        timeout). Returns True if the response was a block page, whether or
+        not a proxy was used.
+        """
+        banned = looks_blocked(status, body)
+        proxy_url = proxies.get("https") if proxies else None
+        state = self._states.get(proxy_url) if proxy_url else None
+        if state is None:
+            return banned
+        failed = banned or status is None or status == 429 or status >= 500
+        with self._lock:
+            state.requests += 1
+            if status is not None:
+                state.latency = (
+                    latency
+                    if state.latency is None
+                    else state.latency + self.alpha * (latency - state.latency)
+                )
+            state.error_rate += self.alpha * (float(failed) - state.error_rate)
+            if not failed:
+                state.strikes = 0
+                return False
+            state.failures += 1
+            state.strikes += 1
+            if banned:
+                state.bans += 1
+            if banned or state.strikes >= self.max_strikes:
+                self._cool_down(state, "blocked" if banned else f"{state.strikes} failures in a row")
+        return banned
+
+    def _cool_down(self, state: _ProxyState, reason: str) -> None:
+        seconds = min(self.max_cooldown, self.cooldown * 2 ** state.cooldowns)
+        state.cooldowns += 1
+        state.cooldown_until = time.monotonic() + seconds
+        state.strikes = 0
+        # Give it a neutral start when it comes back, not its worst moment.
+        state.error_rate = 0.5
+        for key in [k for k, url in self._sticky.items() if url == state.url]:
+            del self._sticky[key]
+        LOGGER.warning("Proxy %s cooling down for %.0fs (%s)", redact(state.url), seconds, reason)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-proxy counters, credentials removed."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "proxy": redact(state.url),
+                    "requests": state.requests,
+                    "failures": state.failures,
+                    "bans": state.bans,
+                    "cooldowns": state.cooldowns,
+                    "error_rate": round(state.error_rate, 3),
+                    "latency_ewma": round(state.latency, 3) if state.latency is not None else None,
+                    "cooling_down": state.cooldown_until > now,
+                }
+                for state in self._states.values()
+            ]
+
     @property
     def enabled(self) -> bool:
         return self._enabled
@@ -34,8 +200,6 @@ class ProxyManager:
             LOGGER.warning("Cannot enable ProxyManager: no proxies available.")
             return
         self._enabled = True
-        if not self._cycle:
-            self._cycle = itertools.cycle(self._proxies)
 
     def disable(self) -> None:
-        self._enabled = False
\ No newline at end of file
+        self._enabled = False
@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+LOGGER = logging.getLogger("zoopla_scraper.rate_limiter")
+
+THROTTLE_STATUSES = {429, 503}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+class _HostState:
+    """Token bucket, AIMD window and pause deadline for one host."""
+
+    def __init__(self, rate: float, limit: float) -> None:
+        self.tokens = max(1.0, rate)
+        self.refilled_at = time.monotonic()
+        self.limit = limit
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_backoff = 0.0
+        self.latency_floor: Optional[float] = None
+        self.completed = 0
+        self.throttled = 0
+
+class AdaptiveRateLimiter:
+    """Per-host request pacing shared by every extractor and both engines.
+
+    Each host gets a token bucket capping requests per second (``rate``;
+    0 disables it) and an in-flight window. With ``adaptive`` on, the window
+    grows by about one request per window's worth of healthy responses and
+    halves on 429, 503 or a timeout (AIMD), between ``min_concurrency``
+    and ``max_concurrency``. A Retry-After header pauses the host for the
+    time it asks, whether or not adaptation is on.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        rate: float = 0,
+        adaptive: bool = False,
+        min_concurrency: int = 1,
+        report_interval: float = 30.0,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.rate = rate
+        self.adaptive = adaptive
+        self.report_interval = report_interval
+        self.history: List[Tuple[float, str, float, float]] = []
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_report = self._started
+        self._completed_at_report: Dict[str, int] = {}
+
+    def _state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            start = self.max_concurrency
+            if self.adaptive:
+                start = max(self.min_concurrency, self.max_concurrency // 4)
+            state = self._hosts[host] = _HostState(self.rate, float(start))
+        return state
+
+    def try_acquire(self, host: str) -> float:
+        """Take a request slot for ``host``; returns 0, or seconds to wait before retrying."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(host)
+            if now < state.paused_until:
+                return state.paused_until - now
+            if state.in_flight >= int(state.limit):
+                return 0.01
+            if self.rate > 0:
+                burst = max(1.0, self.rate)
+                state.tokens = min(burst, state.tokens + (now - state.refilled_at) * self.rate)
+                state.refilled_at = now
+                if state.tokens < 1:
+                    return (1 - state.tokens) / self.rate
+                state.tokens -= 1
+            state.in_flight += 1
+            return 0.0
+
+    def acquire(self, host: str) -> None:
+        while True:
+            wait = self.try_acquire(host)
+            if not wait:
+                return
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self, host: str) -> None:
+        import asyncio
+
+        while True:
+            wait = self.try_acquire(host)
+            if not wait:
+                return
+            await asyncio.sleep(min(wait, 1.0))
+
+    def release(
+        self,
+        host: str,
+        latency: float,
+        status: Optional[int] = None,
+        timed_out: bool = False,
+        retry_after: Optional[str] = None,
+    ) -> None:
+        """Return a slot and feed the response outcome to the controller."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(host)
+            state.in_flight = max(0, state.in_flight - 1)
+            state.completed += 1
+            throttled = timed_out or status in THROTTLE_STATUSES
+            pause = parse_retry_after(retry_after) if status in THROTTLE_STATUSES else None
+            if pause:
+                state.paused_until = max(state.paused_until, now + pause)
+                LOGGER.warning("%s asked us to wait %.0fs (HTTP %s)", host, pause, status)
+            if throttled:
+                state.throttled += 1
+                # One cut per window: responses already in flight when the
+                # first throttle arrived should not each halve it again.
+                if self.adaptive and now - state.last_backoff > max(latency, 1.0):
+                    state.limit = max(float(self.min_concurrency), state.limit / 2)
+                    state.last_backoff = now
+                    LOGGER.info("Backing off %s to %d in-flight request(s)", host, int(state.limit))
+            elif status is not None and status < 400:
+                if state.latency_floor is None or latency < state.latency_floor:
+                    state.latency_floor = latency
+                healthy = latency <= 2 * state.latency_floor + 0.05
+                if self.adaptive and healthy:
+                    state.limit = min(float(self.max_concurrency), state.limit + 1 / state.limit)
+            self._maybe_report(now)
+
+    def _maybe_report(self, now: float) -> None:
+        elapsed = now - self._last_report
+        if elapsed < self.report_interval:
+            return
+        for host, state in self._hosts.items():
+            done = state.completed - self._completed_at_report.get(host, 0)
+            self._completed_at_report[host] = state.completed
+            rate = done / elapsed
+            self.history.append((now - self._started, host, rate, state.limit))
+            LOGGER.info(
+                "%s: %.1f req/s, %d in-flight allowed, %d throttled so far",
+                host,
+                rate,
+                int(state.limit),
+                state.throttled,
+            )
+        self._last_report = now
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        with self._lock:
+            return {
+                host: {
+                    "requests": state.completed,
+                    "throttled": state.throttled,
+                    "avg_rate": state.completed / elapsed,
+                    "final_limit": int(state.limit),
+                }
+                for host, state in self._hosts.items()
+            }
@@ -0,0 +1,246 @@
+import logging
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from utils.frontier import normalize_url
+
+LOGGER = logging.getLogger("zoopla_scraper.replay")
+
+FETCH_MODES = ("live", "record", "replay")
+
+class ArchivedResponse(NamedTuple):
+    url: str
+    status: int
+    content_type: Optional[str]
+    body: bytes
+
+class ResponseArchive:
+    """Responses saved by a ``record`` run for ``replay`` runs to serve.
+
+    Bodies are stored zlib-compressed in SQLite, keyed by normalized URL,
+    the same way as the HTTP cache. Only successful (2xx) responses are
+    kept: errors are what replay injects, not what it reproduces.
+    """
+
+    def __init__(self, directory: str) -> None:
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path / "archive.sqlite3"
+        self.saved = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                content_type TEXT,
+                body BLOB NOT NULL,
+                recorded_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def save(self, url: str, status: int, body: bytes, content_type: Optional[str]) -> None:
+        compressed = zlib.compress(body, 6)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), url, status, content_type, compressed, time.time()),
+            )
+            self._conn.commit()
+            self.saved += 1
+
+    def lookup(self, url: str) -> Optional[ArchivedResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, content_type, body FROM responses WHERE key = ?",
+                (normalize_url(url),),
+            ).fetchone()
+        if row is None:
+            return None
+        return ArchivedResponse(url, row[0], row[1], zlib.decompress(row[2]))
+
+    def urls(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT url FROM responses ORDER BY url").fetchall()
+        return [url for (url,) in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class Replayer:
+    """Serves archived responses with simulated network behaviour.
+
+    Each request waits ``latency`` seconds, plus or minus up to ``jitter``.
+    A share ``error_rate`` of requests fails instead, half as dropped
+    connections and half as HTTP 503, so retries, proxy scoring and the
+    rate limiter see realistic trouble. URLs missing from the archive are
+    answered with 404.
+    """
+
+    def __init__(
+        self,
+        archive: ResponseArchive,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.archive = archive
+        self.latency = max(0.0, latency)
+        self.jitter = max(0.0, jitter)
+        self.error_rate = min(1.0, max(0.0, error_rate))
+        self.served = 0
+        self.missing = 0
+        self.injected = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def plan(self, url: str) -> Tuple[float, Optional[str], ArchivedResponse]:
+        """Delay, injected fault ("connect", "server_error" or None) and response for ``url``."""
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            roll = self._random.random()
+        fault = None
+        if roll < self.error_rate:
+            fault = "connect" if roll < self.error_rate / 2 else "server_error"
+        archived = self.archive.lookup(url) if fault is None else None
+        if fault is None and archived is None:
+            LOGGER.debug("Not in archive: %s", url)
+            archived = ArchivedResponse(url, 404, "text/plain", b"Not in archive")
+        elif fault == "server_error":
+            archived = ArchivedResponse(url, 503, "text/plain", b"Injected failure")
+        with self._lock:
+            if fault is not None:
+                self.injected += 1
+            elif archived.status == 404:
+                self.missing += 1
+            else:
+                self.served += 1
+        return delay, fault, archived
+
+    def stats(self) -> Dict[str, int]:
+        return {"served": self.served, "missing": self.missing, "injected": self.injected}
+
+class RecordingAdapter(HTTPAdapter):
+    """``HTTPAdapter`` that also saves each successful response to an archive."""
+
+    def __init__(self, archive: ResponseArchive, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.archive = archive
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        resp = super().send(request, **kwargs)
+        if 200 <= resp.status_code < 300:
+            self.archive.save(
+                request.url, resp.status_code, resp.content, resp.headers.get("Content-Type")
+            )
+        return resp
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter answering from a ``Replayer`` instead of the network."""
+
+    def __init__(self, replayer: Replayer) -> None:
+        super().__init__()
+        self.replayer = replayer
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        delay, fault, archived = self.replayer.plan(request.url)
+        if delay:
+            time.sleep(delay)
+        if fault == "connect":
+            raise requests.ConnectionError("Injected connection failure", request=request)
+        resp = requests.Response()
+        resp.status_code = archived.status
+        resp.reason = "OK" if archived.status < 400 else "Replayed error"
+        resp.url = request.url
+        resp.request = request
+        resp._content = archived.body
+        resp.headers = CaseInsensitiveDict(
+            {"Content-Type": archived.content_type} if archived.content_type else {}
+        )
+        resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+        return resp
+
+    def close(self) -> None:
+        pass
+
+class _ReplayResponse:
+    def __init__(self, archived: ArchivedResponse) -> None:
+        self.archived = archived
+        self.status = archived.status
+        self.headers: Dict[str, str] = (
+            {"Content-Type": archived.content_type} if archived.content_type else {}
+        )
+
+    def raise_for_status(self) -> None:
+        if self.status < 400:
+            return
+        import aiohttp
+        from multidict import CIMultiDict, CIMultiDictProxy
+        from yarl import URL
+
+        url = URL(self.archived.url)
+        raise aiohttp.ClientResponseError(
+            aiohttp.RequestInfo(url, "GET", CIMultiDictProxy(CIMultiDict()), url),
+            (),
+            status=self.status,
+            message="Replayed error",
+            headers=CIMultiDict(self.headers),
+        )
+
+    async def read(self) -> bytes:
+        return self.archived.body
+
+class _ReplayRequest:
+    def __init__(self, replayer: Replayer, url: str) -> None:
+        self.replayer = replayer
+        self.url = url
+
+    async def __aenter__(self) -> _ReplayResponse:
+        import asyncio
+
+        delay, fault, archived = self.replayer.plan(self.url)
+        if delay:
+            await asyncio.sleep(delay)
+        if fault == "connect":
+            import aiohttp
+
+            raise aiohttp.ServerDisconnectedError("Injected connection failure")
+        return _ReplayResponse(archived)
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+class ReplaySession:
+    """Stands in for ``aiohttp.ClientSession`` in the async engine during replay."""
+
+    def __init__(self, replayer: Replayer) -> None:
+        self.replayer = replayer
+
+    def get(self, url: str, **kwargs: Any) -> _ReplayRequest:
+        return _ReplayRequest(self.replayer, url)
+
+    async def __aenter__(self) -> "ReplaySession":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
@@ -0,0 +1,221 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Type, TypeVar
+
+from utils.rate_limiter import parse_retry_after
+
+LOGGER = logging.getLogger("zoopla_scraper.retry")
+
+T = TypeVar("T")
+
+Errors = Tuple[Type[BaseException], ...]
+
+class RetryPolicy(NamedTuple):
+    retries: int
+    base_delay: float
+    max_delay: float
+
+# Error class -> policy. Throttling gets more patience than hard failures.
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    "connect": RetryPolicy(retries=3, base_delay=1.0, max_delay=30.0),
+    "read_timeout": RetryPolicy(retries=3, base_delay=2.0, max_delay=60.0),
+    "server_error": RetryPolicy(retries=3, base_delay=2.0, max_delay=60.0),
+    "throttled": RetryPolicy(retries=5, base_delay=5.0, max_delay=120.0),
+    # Blocked (403 or a challenge page): the retry goes out on another proxy.
+    "banned": RetryPolicy(retries=2, base_delay=1.0, max_delay=10.0),
+}
+
+def _status_of(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status", None)  # aiohttp.ClientResponseError
+    if status is None:
+        response = getattr(exc, "response", None)  # requests.HTTPError
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+def _retry_after_of(exc: BaseException) -> Optional[str]:
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    return headers.get("Retry-After") if headers else None
+
+def classify(exc: BaseException) -> str:
+    """Map a requests/aiohttp/asyncio exception to an error class name."""
+    error_class = getattr(exc, "error_class", None)
+    if error_class:
+        return error_class
+    status = _status_of(exc)
+    if status is not None:
+        if status == 403:
+            return "banned"
+        if status == 429:
+            return "throttled"
+        if status >= 500:
+            return "server_error"
+        return f"http_{status}"
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & {"ConnectTimeout", "ConnectionError", "ClientConnectorError", "ServerDisconnectedError"}:
+        return "connect"
+    if names & {"Timeout", "ReadTimeout", "TimeoutError", "ServerTimeoutError"}:
+        return "read_timeout"
+    return type(exc).__name__
+
+class RetryError(Exception):
+    """Raised once a request has failed for good."""
+
+    def __init__(self, cause: BaseException, attempts: int) -> None:
+        super().__init__(str(cause))
+        self.cause = cause
+        self.attempts = attempts
+        self.error_class = classify(cause)
+
+class Retrier:
+    """Per-error-class retry policies with full-jitter backoff and a run budget.
+
+    ``budget`` caps retries across the whole run so a site-wide outage
+    cannot multiply the request count; once it is spent every failure is
+    final.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, RetryPolicy]] = None,
+        budget: Optional[int] = 1000,
+    ) -> None:
+        self.policies = dict(DEFAULT_POLICIES if policies is None else policies)
+        self.budget = budget
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def delay_for(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before retry number ``attempt`` (1-based), or None to give up."""
+        policy = self.policies.get(classify(exc))
+        if policy is None or attempt > policy.retries:
+            return None
+        with self._lock:
+            if self.budget is not None and self.retries >= self.budget:
+                LOGGER.warning("Retry budget of %d exhausted; not retrying.", self.budget)
+                return None
+            self.retries += 1
+        ceiling = min(policy.max_delay, policy.base_delay * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        retry_after = parse_retry_after(_retry_after_of(exc))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, policy.max_delay))
+        return delay
+
+    def call(self, func: Callable[[], T], url: str, errors: Errors = (Exception,)) -> T:
+        """Run ``func`` until it succeeds; failures of type ``errors`` end in RetryError."""
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except errors as exc:
+                attempt += 1
+                delay = self.delay_for(exc, attempt)
+                if delay is None:
+                    raise RetryError(exc, attempt) from exc
+                LOGGER.warning(
+                    "Retrying %s in %.1fs (attempt %d, %s): %s",
+                    url, delay, attempt + 1, classify(exc), exc,
+                )
+                time.sleep(delay)
+
+    async def call_async(
+        self, func: Callable[[], Awaitable[T]], url: str, errors: Errors = (Exception,)
+    ) -> T:
+        import asyncio
+
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except errors as exc:
+                attempt += 1
+                delay = self.delay_for(exc, attempt)
+                if delay is None:
+                    raise RetryError(exc, attempt) from exc
+                LOGGER.warning(
+                    "Retrying %s in %.1fs (attempt %d, %s): %s",
+                    url, delay, attempt + 1, classify(exc), exc,
+                )
+                await asyncio.sleep(delay)
+
+def dead_letter_entry(stream: str, url: str, error: RetryError) -> Dict[str, Any]:
+    return {
+        "stream": stream,
+        "url": url,
+        "error_class": error.error_class,
+        "error": str(error),
+        "attempts": error.attempts,
+        "failed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+class DeadLetterQueue:
+    """Append-only JSON Lines file of URLs that failed after all retries.
+
+    Feeding the file back with ``--resume-failed`` re-crawls just those URLs.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        # While drained URLs are re-crawled, new failures go to this file and
+        # replace the queue only once the run ends.
+        self._pending: Optional[Path] = None
+
+    def add(self, stream: str, url: str, error: RetryError) -> None:
+        self.add_entry(dead_letter_entry(stream, url, error))
+
+    def add_entry(self, entry: Dict[str, Any]) -> None:
+        """Append an entry made by ``dead_letter_entry``, possibly in another process."""
+        with self._lock:
+            path = self._pending or self.path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.count += 1
+
+    def reset(self) -> None:
+        """Forget failures left over from an earlier run."""
+        with self._lock:
+            if self.path.is_file():
+                self.path.unlink()
+
+    def drain(self) -> Dict[str, List[str]]:
+        """Read the queue, returning failed URLs grouped by stream.
+
+        The file stays until ``finish``, so a retry run that stops early
+        can be repeated.
+        """
+        urls: Dict[str, Dict[str, None]] = {}
+        with self._lock:
+            self._pending = self.path.with_name(self.path.name + ".tmp")
+            # Left behind by a retry run that did not finish.
+            self._pending.unlink(missing_ok=True)
+            if not self.path.is_file():
+                return {}
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry: Dict[str, Any] = json.loads(line)
+                    urls.setdefault(entry["stream"], {})[entry["url"]] = None
+        return {stream: list(found) for stream, found in urls.items()}
+
+    def finish(self) -> None:
+        """At the end of a run that drained the queue, keep only the URLs that failed again."""
+        with self._lock:
+            if self._pending is None:
+                return
+            if self._pending.is_file():
+                os.replace(self._pending, self.path)
+            else:
+                self.path.unlink(missing_ok=True)
+            self._pending = None
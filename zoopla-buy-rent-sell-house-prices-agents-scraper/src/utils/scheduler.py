@@ -0,0 +1,67 @@
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+class StreamScheduler:
+    """Share one budget of in-flight requests between output streams.
+
+    When the property, agent and house price streams run side by side,
+    each request first takes one of ``slots`` slots. A free slot goes to
+    the waiting stream using the smallest share of its weight, so streams
+    with equal weights interleave evenly, and a stream's slots pass to the
+    others as soon as it runs out of work.
+    """
+
+    def __init__(self, slots: int, weights: Optional[Dict[str, float]] = None) -> None:
+        self.slots = max(1, slots)
+        self.weights = dict(weights or {})
+        self._in_use: Counter = Counter()
+        self._waiting: Counter = Counter()
+        self._cond = threading.Condition()
+
+    def _share(self, stream: str) -> float:
+        return self._in_use[stream] / max(self.weights.get(stream, 1.0), 1e-9)
+
+    def _can_take(self, stream: str) -> bool:
+        if sum(self._in_use.values()) >= self.slots:
+            return False
+        share = self._share(stream)
+        return all(
+            share <= self._share(other) for other, count in self._waiting.items() if count
+        )
+
+    def try_acquire(self, stream: str) -> bool:
+        with self._cond:
+            if not self._can_take(stream):
+                return False
+            self._in_use[stream] += 1
+            return True
+
+    def acquire(self, stream: str) -> None:
+        with self._cond:
+            self._waiting[stream] += 1
+            try:
+                while not self._can_take(stream):
+                    self._cond.wait()
+                self._in_use[stream] += 1
+            finally:
+                self._waiting[stream] -= 1
+                self._cond.notify_all()
+
+    async def acquire_async(self, stream: str) -> None:
+        import asyncio
+
+        with self._cond:
+            self._waiting[stream] += 1
+        try:
+            while not self.try_acquire(stream):
+                await asyncio.sleep(0.005)
+        finally:
+            with self._cond:
+                self._waiting[stream] -= 1
+                self._cond.notify_all()
+
+    def release(self, stream: str) -> None:
+        with self._cond:
+            self._in_use[stream] -= 1
+            self._cond.notify_all()
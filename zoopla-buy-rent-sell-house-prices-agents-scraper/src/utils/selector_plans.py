@@ -0,0 +1,195 @@
+import copy
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from lxml import etree
+
+from utils.parse_pool import ParsePool
+
+LOGGER = logging.getLogger("zoopla_scraper.selector_plans")
+
+# DOM fallback extraction, per page type. ``card`` matches one record's
+# element; each field is a CSS selector whose first match inside the card
+# gives the field's text, or a dict adding ``attr`` (take that attribute
+# instead of the text, or ``default`` if the match lacks it) and ``all``
+# (a list from every match). A field without ``css`` reads ``attr`` from
+# the card itself. When Zoopla renames its CSS classes, point
+# ``selectors_path`` at a JSON file overriding the changed entries instead
+# of editing this table.
+SELECTOR_SPECS: Dict[str, Dict[str, Any]] = {
+    "property": {
+        "card": "[data-listing-id]",
+        "fields": {
+            "listingId": {"attr": "data-listing-id"},
+            "title": "h2, h3",
+            "price": ".css-1e28vvi, .css-1e4fdj9, .price",
+            "address": "[data-testid='listing-card-address'], .css-1f3n3r9, .address",
+            "url": {
+                "css": "a[href*='/for-sale/'], a[href*='/to-rent/'], a[href*='/details/']",
+                "attr": "href",
+            },
+            "property_type": "[data-testid='listing-card-subtitle'], .property-type",
+            "agent_name": "[data-testid='listing-card-agent-name'], .agent_name",
+        },
+    },
+    # A listing's own page; the whole page is the one "card".
+    "property_detail": {
+        "card": "html",
+        "fields": {
+            "description": "[data-testid='listing_description'], .listing-description",
+            "features": {"css": "[data-testid='listing_features'] li, .features li", "all": True},
+            "num_bedrooms": "[data-testid='beds-label'], .num-beds",
+            "num_bathrooms": "[data-testid='baths-label'], .num-baths",
+            "num_reception_rooms": "[data-testid='receptions-label'], .num-reception-rooms",
+            "tenure": "[data-testid='tenure'], .tenure",
+            "council_tax_band": "[data-testid='council-tax-band'], .council-tax-band",
+            "broadband": "[data-testid='broadband'], .broadband",
+            "transport": {"css": "[data-testid='transport'] li, .transport li", "all": True},
+            "floorplans": {
+                "css": "[data-testid='floorplan'] img, .floorplan img",
+                "attr": "src",
+                "all": True,
+            },
+            "images": {"css": "[data-testid='gallery'] img, .gallery img", "attr": "src", "all": True},
+            "first_published": "[data-testid='first-published'], .first-published",
+            "first_published_price": "[data-testid='first-published-price']",
+        },
+    },
+    "agent": {
+        "card": "[data-testid='agent-card'], .agent-card",
+        "fields": {
+            "name": "h2, h3, .agent-name",
+            "telephone": {"css": "a[href^='tel:'], .agent-phone", "attr": "href", "default": ""},
+            "logo": {"css": "img", "attr": "src"},
+            "address": ".agent-address, address",
+            "url": {"css": "a[href]", "attr": "href"},
+        },
+    },
+    "house_prices": {
+        "card": "table tr",
+        "fields": {
+            "cells": {"css": "td", "all": True},
+        },
+    },
+}
+
+FieldSpec = Union[str, Dict[str, Any]]
+
+# Visible text only: BeautifulSoup's get_text() leaves out script, style
+# and template contents, and comments are never text() nodes.
+_TEXT = etree.XPath(
+    "descendant-or-self::text()[not(ancestor::script or ancestor::style or ancestor::template)]",
+    smart_strings=False,
+)
+
+def _compile(css: str, prefix: str) -> etree.XPath:
+    from lxml.cssselect import LxmlHTMLTranslator, SelectorError
+
+    try:
+        path = LxmlHTMLTranslator().css_to_xpath(css, prefix=prefix)
+    except SelectorError as exc:
+        raise ValueError(f"Invalid CSS selector {css!r}: {exc}") from exc
+    return etree.XPath(path)
+
+def text_of(element: Any) -> str:
+    """Text of ``element`` with each piece stripped, as BeautifulSoup's get_text(strip=True)."""
+    return "".join(piece.strip() for piece in _TEXT(element) if piece.strip())
+
+class _Field:
+    __slots__ = ("name", "xpath", "attr", "default", "all")
+
+    def __init__(self, name: str, spec: FieldSpec) -> None:
+        if isinstance(spec, str):
+            spec = {"css": spec}
+        self.name = name
+        self.attr: Optional[str] = spec.get("attr")
+        self.default: Optional[str] = spec.get("default")
+        self.all = bool(spec.get("all", False))
+        css = spec.get("css")
+        # Below the card only, like BeautifulSoup's select() on a tag.
+        self.xpath = _compile(css, "descendant::") if css else None
+
+    def value(self, card: Any) -> Any:
+        if self.xpath is None:
+            return card.get(self.attr)
+        matches = self.xpath(card)
+        if self.all:
+            return [self._take(m) for m in matches]
+        return self._take(matches[0]) if matches else None
+
+    def _take(self, element: Any) -> Optional[str]:
+        if self.attr:
+            return element.get(self.attr, self.default)
+        return text_of(element)
+
+class SelectorPlan:
+    """One page type's selector spec, compiled to lxml XPath once.
+
+    ``extract`` finds every card in a tree and returns, per card, a dict of
+    raw field values: text, attribute, a list for ``all`` fields, or None
+    when nothing matched.
+    """
+
+    def __init__(self, page_type: str, spec: Dict[str, Any]) -> None:
+        self.page_type = page_type
+        self.card = _compile(spec["card"], "descendant-or-self::")
+        self.fields: Tuple[_Field, ...] = tuple(
+            _Field(name, field) for name, field in spec["fields"].items()
+        )
+
+    def extract(self, tree: Any) -> List[Dict[str, Any]]:
+        if tree is None:
+            return []
+        return [{f.name: f.value(card) for f in self.fields} for card in self.card(tree)]
+
+def _build(specs: Dict[str, Dict[str, Any]]) -> Dict[str, SelectorPlan]:
+    return {page_type: SelectorPlan(page_type, spec) for page_type, spec in specs.items()}
+
+# Compiled on first use, so a run never compiles the page types it does not parse.
+PLANS: Dict[str, SelectorPlan] = {}
+_specs: Dict[str, Dict[str, Any]] = dict(SELECTOR_SPECS)
+_loaded_path: Optional[str] = None
+
+def plan(page_type: str) -> SelectorPlan:
+    """The compiled selector plan of ``page_type``."""
+    compiled = PLANS.get(page_type)
+    if compiled is None:
+        compiled = PLANS[page_type] = SelectorPlan(page_type, _specs[page_type])
+    return compiled
+
+def load_selectors(path: Optional[str]) -> None:
+    """Merge the overrides in JSON file ``path`` into the built-in specs and recompile.
+
+    The file mirrors ``SELECTOR_SPECS``, listing only what changes, e.g.
+    ``{"property": {"fields": {"price": ".new-price-class, .price"}}}``.
+    """
+    if not path:
+        return
+    with Path(path).open("r", encoding="utf-8") as f:
+        overrides = json.load(f)
+    specs = copy.deepcopy(SELECTOR_SPECS)
+    for page_type, override in overrides.items():
+        if page_type not in specs:
+            raise ValueError(f"Unknown page type in {path}: {page_type}")
+        if "card" in override:
+            specs[page_type]["card"] = override["card"]
+        specs[page_type]["fields"].update(override.get("fields", {}))
+    # Compile the overridden page types now, so a bad selector fails the run at startup.
+    compiled = _build({page_type: specs[page_type] for page_type in overrides})
+    global _loaded_path
+    _specs.update(specs)
+    PLANS.clear()
+    PLANS.update(compiled)
+    _loaded_path = path
+    LOGGER.info("Loaded selector overrides from %s", path)
+
+def selector_pool(workers: Optional[int] = None, queue_size: Optional[int] = None) -> ParsePool:
+    """A ``ParsePool`` whose workers load the same selector overrides as this process."""
+    return ParsePool(
+        workers=workers,
+        queue_size=queue_size,
+        initializer=load_selectors if _loaded_path else None,
+        initargs=(_loaded_path,) if _loaded_path else (),
+    )
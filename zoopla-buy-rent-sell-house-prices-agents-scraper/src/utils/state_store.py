@@ -0,0 +1,206 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.normalize import normalize_rows
+
+LOGGER = logging.getLogger("zoopla_scraper.state_store")
+
+# Fields whose change makes a listing worth re-emitting.
+PROPERTY_FINGERPRINT_FIELDS = ("price", "publication_status", "price_history")
+# The ones a search card has; price_history comes from the detail page.
+CARD_FINGERPRINT_FIELDS = ("price", "publication_status")
+
+CHANGE_FIELD = "change"
+
+def fingerprint(record: Dict[str, Any], fields: Sequence[str] = PROPERTY_FINGERPRINT_FIELDS) -> str:
+    """Stable hash of the fields of ``record`` that matter between runs."""
+    payload = json.dumps([record.get(f) for f in fields], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def _card_fingerprint(record: Dict[str, Any]) -> str:
+    card = {field: record.get(field) for field in CARD_FINGERPRINT_FIELDS}
+    return fingerprint(normalize_rows("property", [card])[0], CARD_FINGERPRINT_FIELDS)
+
+class ListingStateStore:
+    """SQLite record of every listing seen, for incremental runs.
+
+    Each run compares listings against the fingerprints stored by earlier
+    runs and emits only the delta, tagged in the ``change`` field as
+    ``new``, ``changed`` or ``removed``.
+
+    Followed by a checkpoint (``StreamCheckpoint.follow``), changes are held
+    back until ``mark`` and committed only when the checkpoint is saved, so
+    the stored state never runs ahead of the output file a resumed run
+    continues.
+    """
+
+    def __init__(self, path: str, key_field: str = "listingId") -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.key_field = key_field
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.follows_checkpoint = False
+        # Changes since the last ``mark``, and the rows they give, while followed.
+        self._unmarked: List[Tuple[str, Tuple[Any, ...]]] = []
+        self._unmarked_rows: Dict[str, Tuple[str, int]] = {}
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS listings (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                record TEXT NOT NULL,
+                last_seen_run INTEGER NOT NULL,
+                removed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at REAL NOT NULL,
+                complete INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                records INTEGER NOT NULL,
+                output_offset INTEGER NOT NULL
+            );
+            """
+        )
+        cursor = self._conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),))
+        self.run_id = cursor.lastrowid
+        self._conn.commit()
+
+    def unchanged_record(self, card: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The stored record of ``card``'s listing if the card fields match it, else None.
+
+        Lets a run reuse the detail fields of a listing whose search card has
+        not changed instead of fetching its detail page again. Both sides are
+        compared normalized, as stored records may be.
+        """
+        key = card.get(self.key_field)
+        if key is None:
+            return None
+        row = self._conn.execute(
+            "SELECT record FROM listings WHERE key = ? AND removed = 0", (str(key),)
+        ).fetchone()
+        if row is None:
+            return None
+        stored = json.loads(row[0])
+        if _card_fingerprint(stored) != _card_fingerprint(card):
+            return None
+        return stored
+
+    def delta(
+        self,
+        records: Iterable[Dict[str, Any]],
+        complete: Callable[[], bool] = lambda: True,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield new and changed records, then listings missing from this run.
+
+        Removals are only reported when ``complete()`` says the run saw the
+        full result set; a partial crawl cannot tell a removed listing from
+        one that simply was not reached.
+        """
+        for record in records:
+            key = record.get(self.key_field)
+            if key is None:
+                yield record
+                continue
+            change = self._observe(str(key), record)
+            if change is not None:
+                yield {**record, CHANGE_FIELD: change}
+        if not self.follows_checkpoint:
+            self._conn.commit()
+
+        if not complete():
+            LOGGER.info("Run did not cover the full result set; skipping removal detection.")
+            return
+        rows = self._conn.execute(
+            "SELECT key, record FROM listings WHERE removed = 0 AND last_seen_run < ?",
+            (self.run_id,),
+        ).fetchall()
+        for key, stored in rows:
+            if key in self._unmarked_rows:
+                # Seen in this run, not yet written to the table.
+                continue
+            self._execute("UPDATE listings SET removed = 1 WHERE key = ?", (key,))
+            self.removed += 1
+            yield {**json.loads(stored), CHANGE_FIELD: "removed"}
+        self._execute("UPDATE runs SET complete = 1 WHERE id = ?", (self.run_id,))
+        if not self.follows_checkpoint:
+            self._conn.commit()
+
+    def mark(self) -> None:
+        """Write the changes so far: the output file now holds every record they emitted."""
+        for sql, params in self._unmarked:
+            self._conn.execute(sql, params)
+        self._unmarked.clear()
+        self._unmarked_rows.clear()
+
+    def commit(self, records: int, offset: int) -> None:
+        """Make the changes written by ``mark`` durable, as of the checkpoint at ``offset``."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO checkpoint (id, records, output_offset) VALUES (1, ?, ?)",
+            (records, offset),
+        )
+        self._conn.commit()
+
+    def checkpointed_at(self) -> Optional[Tuple[int, int]]:
+        """``(records, output offset)`` of the checkpoint last committed with, if any."""
+        return self._conn.execute("SELECT records, output_offset FROM checkpoint").fetchone()
+
+    def _execute(self, sql: str, params: Tuple[Any, ...]) -> None:
+        if self.follows_checkpoint:
+            self._unmarked.append((sql, params))
+        else:
+            self._conn.execute(sql, params)
+
+    def _row(self, key: str) -> Optional[Tuple[str, int]]:
+        row = self._unmarked_rows.get(key)
+        if row is None:
+            row = self._conn.execute(
+                "SELECT fingerprint, removed FROM listings WHERE key = ?", (key,)
+            ).fetchone()
+        return row
+
+    def _observe(self, key: str, record: Dict[str, Any]) -> Optional[str]:
+        digest = fingerprint(record)
+        row = self._row(key)
+        self._execute(
+            "INSERT OR REPLACE INTO listings (key, fingerprint, record, last_seen_run, removed) "
+            "VALUES (?, ?, ?, ?, 0)",
+            (key, digest, json.dumps(record, ensure_ascii=False, default=str), self.run_id),
+        )
+        if self.follows_checkpoint:
+            self._unmarked_rows[key] = (digest, 0)
+        if row is None or row[1]:
+            self.new += 1
+            return "new"
+        if row[0] != digest:
+            self.changed += 1
+            return "changed"
+        self.unchanged += 1
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "new": self.new,
+            "changed": self.changed,
+            "unchanged": self.unchanged,
+            "removed": self.removed,
+        }
+
+    def close(self) -> None:
+        if self.follows_checkpoint:
+            # Anything not committed with a checkpoint is past its output offset.
+            self._conn.rollback()
+        else:
+            self._conn.commit()
+        self._conn.close()
@@ -0,0 +1,396 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from utils.frontier import normalize_url
+from utils.retry import RetryError, dead_letter_entry
+
+LOGGER = logging.getLogger("zoopla_scraper.work_queue")
+
+# Matches while the crawl has pages left to do.
+_UNFINISHED = "SELECT 1 FROM tasks WHERE state IN ('pending', 'leased')"
+
+class Task(NamedTuple):
+    id: int
+    stream: str
+    url: str
+
+class WorkQueue:
+    """Search-result pages shared out to worker processes through one SQLite file.
+
+    The coordinator seeds it with the configured URLs. Workers lease a
+    batch of pending pages, at most an even share of them among the live
+    workers, and acknowledge each page with its records and
+    next-page link in one transaction, so a page's records are stored once
+    however often it was leased, and its next page is queued as it
+    finishes. A lease not acknowledged within ``lease_seconds`` goes back
+    to pending, up to ``max_attempts`` leases per page; every
+    acknowledgement renews the worker's other leases.
+
+    The file must be on a volume all processes can lock: a local disk
+    for several processes on one box, or a network filesystem with
+    working locks.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 3,
+        fresh: bool = False,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fresh and path.is_file():
+            LOGGER.info("Discarding old work queue %s", path)
+            path.unlink()
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        # Autocommit, so each method opens its own BEGIN IMMEDIATE transaction.
+        self._conn = sqlite3.connect(
+            str(path), timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                stream TEXT NOT NULL,
+                url TEXT NOT NULL,
+                url_key TEXT NOT NULL,
+                seed TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                records INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                UNIQUE (stream, url_key)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, id);
+            CREATE TABLE IF NOT EXISTS workers (
+                name TEXT PRIMARY KEY,
+                seen REAL NOT NULL
+            );
+            """
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """``BEGIN IMMEDIATE`` ... ``COMMIT`` under the lock, rolled back on error."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def seed(
+        self,
+        urls: Dict[str, List[str]],
+        follow_pagination: bool = False,
+        max_pages_per_url: Optional[int] = None,
+    ) -> int:
+        """Queue each stream's start URLs, and the crawl settings workers follow."""
+        added = 0
+        with self._transaction() as conn:
+            for stream, stream_urls in urls.items():
+                for url in stream_urls:
+                    added += self._add(conn, stream, url, seed=url)
+            settings = {
+                "follow_pagination": int(follow_pagination),
+                "max_pages_per_url": max_pages_per_url or 0,
+                "seeded": 1,
+            }
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in settings.items()],
+            )
+        return added
+
+    @staticmethod
+    def _add(conn: sqlite3.Connection, stream: str, url: str, seed: str) -> int:
+        return conn.execute(
+            "INSERT OR IGNORE INTO tasks (stream, url, url_key, seed) VALUES (?, ?, ?, ?)",
+            (stream, url, normalize_url(url), seed),
+        ).rowcount
+
+    def _meta(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else default
+
+    @property
+    def seeded(self) -> bool:
+        return bool(self._meta("seeded", 0))
+
+    @property
+    def truncated(self) -> bool:
+        """True once a known next page was left unqueued (pagination off or a page cap hit)."""
+        return bool(self._meta("truncated", 0))
+
+    def join(self, worker: str) -> None:
+        """Count ``worker`` among the live workers pending pages are shared out to."""
+        with self._transaction() as conn:
+            self._seen(conn, worker, time.time())
+
+    @staticmethod
+    def _seen(conn: sqlite3.Connection, worker: str, now: float) -> None:
+        # Only while the crawl runs: once it is over the coordinator deletes
+        # the file, and idle workers must not write to it on their way out.
+        conn.execute(
+            "INSERT OR REPLACE INTO workers (name, seen) SELECT ?, ? "
+            f"WHERE EXISTS ({_UNFINISHED})",
+            (worker, now),
+        )
+
+    def lease(self, worker: str, size: int) -> List[Task]:
+        """Lease up to ``size`` pending pages to ``worker``, oldest first.
+
+        Never more than ``ceil(pending / live workers)``, so while the
+        queue is shallow one worker does not take it all and leave the
+        others idle. A worker is live while it leases or acknowledges
+        pages at least once per ``lease_seconds``.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._reclaim(conn, now)
+            self._seen(conn, worker, now)
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE state = 'pending'"
+            ).fetchone()[0]
+            live = conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE seen >= ?", (now - self.lease_seconds,)
+            ).fetchone()[0]
+            share = -(-pending // max(1, live))
+            rows = conn.execute(
+                "SELECT id, stream, url FROM tasks WHERE state = 'pending' ORDER BY id LIMIT ?",
+                (max(1, min(size, share)),),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET state = 'leased', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                [(worker, now + self.lease_seconds, row[0]) for row in rows],
+            )
+        return [Task(*row) for row in rows]
+
+    def _reclaim(self, conn: sqlite3.Connection, now: float) -> int:
+        # Leases of workers that died or stalled: retry them, or give up.
+        expired = conn.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = CASE WHEN attempts >= ? THEN ? ELSE error END, "
+            "worker = NULL, lease_expires = NULL "
+            "WHERE state = 'leased' AND lease_expires < ?",
+            (
+                self.max_attempts,
+                self.max_attempts,
+                json.dumps({"error_class": "lease_expired", "error": "lease expired"}),
+                now,
+            ),
+        ).rowcount
+        if expired:
+            LOGGER.info("%d lease(s) expired; their pages were re-queued or given up on", expired)
+        return expired
+
+    def reclaim(self) -> int:
+        """Re-queue pages whose lease expired; returns how many."""
+        with self._transaction() as conn:
+            return self._reclaim(conn, time.time())
+
+    def complete(
+        self,
+        worker: str,
+        task: Task,
+        records: List[Dict[str, Any]],
+        next_url: Optional[str] = None,
+    ) -> bool:
+        """Store a leased page's records and queue its next page.
+
+        False if ``worker`` no longer holds the lease, in which case the
+        records are dropped: the page went back to the queue and another
+        worker will store them.
+        """
+        result = json.dumps(records, ensure_ascii=False, default=str)
+        now = time.time()
+        with self._transaction() as conn:
+            done = conn.execute(
+                "UPDATE tasks SET state = 'done', result = ?, records = ?, lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND state = 'leased'",
+                (result, len(records), task.id, worker),
+            ).rowcount
+            if not done:
+                return False
+            if next_url:
+                self._schedule(conn, task, next_url)
+            conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE worker = ? AND state = 'leased'",
+                (now + self.lease_seconds, worker),
+            )
+            self._seen(conn, worker, now)
+        return True
+
+    def _schedule(self, conn: sqlite3.Connection, task: Task, next_url: str) -> None:
+        settings = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        if not json.loads(settings.get("follow_pagination", "0")):
+            self._set_truncated(conn)
+            return
+        seed = conn.execute("SELECT seed FROM tasks WHERE id = ?", (task.id,)).fetchone()[0]
+        cap = json.loads(settings.get("max_pages_per_url", "0"))
+        if cap:
+            scheduled = conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE stream = ? AND seed = ?", (task.stream, seed)
+            ).fetchone()[0]
+            if scheduled >= cap:
+                LOGGER.debug("Page limit reached for %s; not following %s", seed, next_url)
+                self._set_truncated(conn)
+                return
+        self._add(conn, task.stream, next_url, seed=seed)
+
+    @staticmethod
+    def _set_truncated(conn: sqlite3.Connection) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('truncated', '1')")
+
+    def fail(self, worker: str, stream: str, url: str, entry: Dict[str, Any]) -> None:
+        """Mark a leased page as failed for good, with its dead-letter entry."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET state = 'failed', error = ?, lease_expires = NULL "
+                "WHERE stream = ? AND url = ? AND worker = ? AND state = 'leased'",
+                (json.dumps(entry), stream, url, worker),
+            )
+
+    def release(self, worker: str, ids: Optional[List[int]] = None, counted: bool = False) -> int:
+        """Hand ``worker``'s leased pages (or just ``ids``) back to the queue.
+
+        Unless ``counted``, the lease does not count as an attempt: the
+        worker is shutting down, not failing on the page. Releasing all
+        of them also stops counting ``worker`` as live.
+        """
+        sql = (
+            "UPDATE tasks SET state = 'pending', worker = NULL, lease_expires = NULL, "
+            "attempts = attempts - ? WHERE worker = ? AND state = 'leased'"
+        )
+        params: List[Any] = [0 if counted else 1, worker]
+        if ids is not None:
+            if not ids:
+                return 0
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        with self._transaction() as conn:
+            released = conn.execute(sql, params).rowcount
+            if ids is None:
+                conn.execute(
+                    f"DELETE FROM workers WHERE name = ? AND EXISTS ({_UNFINISHED})", (worker,)
+                )
+            if counted:
+                conn.execute(
+                    "UPDATE tasks SET state = 'failed', error = ? "
+                    "WHERE state = 'pending' AND attempts >= ?",
+                    (
+                        json.dumps({"error_class": "extraction", "error": "page not extracted"}),
+                        self.max_attempts,
+                    ),
+                )
+        return released
+
+    def cancel(self, stream: str) -> int:
+        """Drop ``stream``'s pending pages, e.g. once it has enough records."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE tasks SET state = 'cancelled' WHERE stream = ? AND state = 'pending'",
+                (stream,),
+            ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Pages per state, plus ``records`` stored so far."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*), SUM(records) FROM tasks GROUP BY state"
+            ).fetchall()
+        counts = {state: 0 for state in ("pending", "leased", "done", "failed", "cancelled")}
+        counts["records"] = 0
+        for state, pages, records in rows:
+            counts[state] = pages
+            counts["records"] += records or 0
+        return counts
+
+    def stream_records(self, stream: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT SUM(records) FROM tasks WHERE stream = ? AND state = 'done'", (stream,)
+            ).fetchone()
+        return row[0] or 0
+
+    @property
+    def finished(self) -> bool:
+        """True once the queue was seeded and no page is pending or leased."""
+        if not self.seeded:
+            return False
+        counts = self.counts()
+        return not counts["pending"] and not counts["leased"]
+
+    def results(self, stream: str, chunk: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """Each finished page's records for ``stream``, in the order the pages were queued."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, result FROM tasks WHERE stream = ? AND state = 'done' AND id > ? "
+                    "ORDER BY id LIMIT ?",
+                    (stream, last, chunk),
+                ).fetchall()
+            if not rows:
+                return
+            for task_id, result in rows:
+                yield json.loads(result)
+            last = rows[-1][0]
+
+    def failures(self) -> List[Dict[str, Any]]:
+        """Dead-letter entries of the pages that failed for good."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stream, url, attempts, error FROM tasks WHERE state = 'failed' ORDER BY id"
+            ).fetchall()
+        entries = []
+        for stream, url, attempts, error in rows:
+            entry = {"stream": stream, "url": url, "attempts": attempts}
+            entry.update(json.loads(error) if error else {})
+            entries.append(entry)
+        return entries
+
+    def discard(self) -> None:
+        """Remove the queue file once its results have been written out."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class QueueDeadLetters:
+    """Stands in for ``DeadLetterQueue`` in a worker.
+
+    Pages that fail after all retries are marked failed on their task; the
+    coordinator writes them to its dead-letter file.
+    """
+
+    def __init__(self, queue: WorkQueue, worker: str) -> None:
+        self.queue = queue
+        self.worker = worker
+        self.count = 0
+
+    def add(self, stream: str, url: str, error: RetryError) -> None:
+        self.queue.fail(self.worker, stream, url, dead_letter_entry(stream, url, error))
+        self.count += 1
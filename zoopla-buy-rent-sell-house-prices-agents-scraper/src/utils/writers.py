@@ -0,0 +1,228 @@
+import csv
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+from utils.parser import AGENT_FIELDS, HOUSE_PRICE_FIELDS, PROPERTY_FIELDS
+
+LOGGER = logging.getLogger("zoopla_scraper.writers")
+
+OUTPUT_FORMATS = ("json", "jsonl", "csv", "parquet", "arrow")
+
+# Formats that can be appended to (--resume-failed) and checkpointed.
+APPENDABLE_FORMATS = ("json", "jsonl", "csv")
+
+# Output stream -> (file stem per format, CSV column order)
+STREAMS: Dict[str, Dict[str, Any]] = {
+    "property": {
+        "stems": {
+            "json": "sample_property",
+            "jsonl": "properties",
+            "csv": "properties",
+            "parquet": "properties",
+            "arrow": "properties",
+        },
+        "fields": PROPERTY_FIELDS,
+    },
+    "agent": {
+        "stems": {
+            "json": "agents",
+            "jsonl": "agents",
+            "csv": "agents",
+            "parquet": "agents",
+            "arrow": "agents",
+        },
+        "fields": AGENT_FIELDS,
+    },
+    "house_prices": {
+        "stems": {
+            "json": "house_prices",
+            "jsonl": "house_prices",
+            "csv": "house_prices",
+            "parquet": "house_prices",
+            "arrow": "house_prices",
+        },
+        "fields": HOUSE_PRICE_FIELDS,
+    },
+}
+
+class RecordWriter:
+    """Append records to an output file one at a time.
+
+    Nothing is buffered beyond the file object's own buffer, so memory use
+    does not depend on how many records a run produces. With ``append`` the
+    records are added after those already in the file; with
+    ``resume_offset`` the file is first cut back to that length, dropping
+    whatever an interrupted run wrote after its last checkpoint.
+    """
+
+    def __init__(
+        self, path: Path, append: bool = False, resume_offset: Optional[int] = None
+    ) -> None:
+        self.path = path
+        self.count = 0
+        if resume_offset is not None:
+            _truncate(path, resume_offset)
+            append = True
+        self._file = path.open("a" if append else "w", encoding="utf-8", newline="")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._write(record)
+        self.count += 1
+
+    def write_all(self, records: Iterable[Dict[str, Any]]) -> int:
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def tell(self) -> int:
+        """Length of the file including every record written so far."""
+        return self._file.tell()
+
+    def sync(self) -> None:
+        """Push written records to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+        LOGGER.info("Wrote %d record(s) to %s", self.count, self.path)
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class JsonLinesWriter(RecordWriter):
+    """One JSON object per line."""
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write("\n")
+
+class JsonArrayWriter(RecordWriter):
+    """A single JSON array, written element by element."""
+
+    def __init__(
+        self, path: Path, append: bool = False, resume_offset: Optional[int] = None
+    ) -> None:
+        if resume_offset is not None:
+            super().__init__(path, resume_offset=resume_offset)
+            self._has_items = _last_byte(path) != b"["
+            return
+        append = append and _nonempty(path)
+        self._has_items = _reopen_array(path) if append else False
+        super().__init__(path, append=append)
+        if not append:
+            self._file.write("[")
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(",\n  " if self._has_items else "\n  ")
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._has_items = True
+
+    def close(self) -> None:
+        self._file.write("\n]\n" if self._has_items else "]\n")
+        super().close()
+
+def _nonempty(path: Path) -> bool:
+    return path.is_file() and path.stat().st_size > 0
+
+def _truncate(path: Path, length: int) -> None:
+    if not path.is_file() or path.stat().st_size < length:
+        raise ValueError(f"Cannot resume {path}: file is missing or shorter than the checkpoint")
+    os.truncate(path, length)
+
+def _last_byte(path: Path) -> bytes:
+    """Last non-whitespace byte of ``path``."""
+    with path.open("rb") as f:
+        size = f.seek(0, 2)
+        f.seek(max(0, size - 256))
+        return f.read().rstrip()[-1:]
+
+def _reopen_array(path: Path) -> bool:
+    """Cut the closing bracket off a JSON array file; True if it has elements."""
+    with path.open("rb+") as f:
+        size = f.seek(0, 2)
+        start = f.seek(max(0, size - 256))
+        tail = f.read().rstrip()
+        if not tail.endswith(b"]"):
+            raise ValueError(f"Cannot append to {path}: not a JSON array")
+        body = tail[:-1].rstrip()
+        f.truncate(start + len(body))
+    return not body.endswith(b"[")
+
+class CsvWriter(RecordWriter):
+    """CSV with a fixed header; fields outside the schema are dropped."""
+
+    def __init__(
+        self,
+        path: Path,
+        fieldnames: Sequence[str],
+        append: bool = False,
+        resume_offset: Optional[int] = None,
+    ) -> None:
+        append = resume_offset is not None or (append and _nonempty(path))
+        super().__init__(path, append=append, resume_offset=resume_offset)
+        self._writer = csv.DictWriter(
+            self._file, fieldnames=list(fieldnames), extrasaction="ignore"
+        )
+        if not append:
+            self._writer.writeheader()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._writer.writerow(record)
+
+def output_path(output_format: str, output_dir: Path, stream: str) -> Path:
+    return output_dir / f"{STREAMS[stream]['stems'][output_format]}.{output_format}"
+
+def read_records(path: Path, output_format: str) -> Iterator[Dict[str, Any]]:
+    """The records in an output file of ``open_writer``, also one cut short at a checkpoint."""
+    if output_format not in APPENDABLE_FORMATS:
+        raise ValueError(f"{output_format} output cannot be read back")
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if output_format == "csv":
+            yield from csv.DictReader(f)
+            return
+        # JSON arrays are written one element per line too.
+        for line in f:
+            line = line.strip().rstrip(",")
+            if line not in ("", "[", "]", "[]"):
+                yield json.loads(line)
+
+def open_writer(
+    output_format: str,
+    output_dir: Path,
+    stream: str,
+    extra_fields: Sequence[str] = (),
+    append: bool = False,
+    resume_offset: Optional[int] = None,
+) -> RecordWriter:
+    """Open the writer for one output stream (property, agent or house_prices).
+
+    ``extra_fields`` are appended to the CSV header for columns that only
+    some runs add, such as the ``change`` tag of incremental runs. With
+    ``append`` the records are added to an existing output file, and with
+    ``resume_offset`` a checkpointed file is continued from that length.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    path = output_path(output_format, output_dir, stream)
+    fields = tuple(STREAMS[stream]["fields"]) + tuple(extra_fields)
+    if output_format not in APPENDABLE_FORMATS:
+        if append or resume_offset is not None:
+            raise ValueError(f"{output_format} output cannot be appended to")
+        from utils.columnar import ColumnarWriter
+
+        return ColumnarWriter(path, output_format, stream, fields)
+    if output_format == "json":
+        return JsonArrayWriter(path, append=append, resume_offset=resume_offset)
+    if output_format == "jsonl":
+        return JsonLinesWriter(path, append=append, resume_offset=resume_offset)
+    return CsvWriter(path, fields, append=append, resume_offset=resume_offset)
@@ -0,0 +1,92 @@
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+def listing_id(page: int, i: int) -> str:
+    return str(70_000_000 + page * 100 + i)
+
+def results_page(page: int, pages: int, per_page: int) -> str:
+    """A search results page of ``per_page`` JSON-LD listings, linking to the next page."""
+    offers = "".join(
+        '<script type="application/ld+json">'
+        + json.dumps(
+            {
+                "@type": "Offer",
+                "sku": listing_id(page, i),
+                "url": f"https://www.zoopla.co.uk/for-sale/details/{listing_id(page, i)}/",
+                "name": "3 bed semi-detached house for sale",
+                "price": 300_000 + page * 1000 + i,
+                "priceCurrency": "GBP",
+                "itemOffered": {
+                    "@type": "House",
+                    "address": {"streetAddress": f"{i} Test Road", "postalCode": "OX2 7DE"},
+                },
+            }
+        )
+        + "</script>\n"
+        for i in range(per_page)
+    )
+    link = f'<link rel="next" href="/p{page + 1}.html">' if page < pages else ""
+    return f"<!DOCTYPE html><html><head><meta charset=\"utf-8\">{link}\n{offers}</head><body></body></html>"
+
+class Site:
+    """Paginated results on a local server; requests for page ``block_at`` wait on ``gate``."""
+
+    def __init__(self, pages: int = 100, per_page: int = 10) -> None:
+        self.pages = pages
+        self.per_page = per_page
+        self.hits = 0
+        self.block_at: Optional[int] = None
+        self.gate = threading.Event()
+        self.reached = threading.Event()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                site.hits += 1
+                try:
+                    page = int(self.path.strip("/").removeprefix("p").removesuffix(".html"))
+                except ValueError:
+                    page = 0
+                if not 1 <= page <= site.pages:
+                    self.send_error(404)
+                    return
+                if page == site.block_at:
+                    site.reached.set()
+                    site.gate.wait(30)
+                body = results_page(page, site.pages, site.per_page).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def listing_ids(self) -> set:
+        return {listing_id(p, i) for p in range(1, self.pages + 1) for i in range(self.per_page)}
+
+@pytest.fixture
+def site() -> Iterator[Site]:
+    site = Site()
+    thread = threading.Thread(target=site.server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield site
+    finally:
+        site.gate.set()
+        site.server.shutdown()
+        site.server.server_close()
@@ -0,0 +1,71 @@
+from typing import Any, Iterator, List, Tuple
+
+import pytest
+
+from conftest import Site
+from extractors.async_engine import AsyncEngine
+from utils.frontier import CrawlFrontier
+from utils.parse_pool import ParsePool
+from utils.parser import parse_property_listings
+from utils.proxy_manager import ProxyManager
+
+pytest.importorskip("aiohttp")
+
+@pytest.fixture(scope="module")
+def pool() -> Iterator[ParsePool]:
+    with ParsePool(workers=2) as pool:
+        yield pool
+
+def engine(pool: ParsePool, **options: Any) -> AsyncEngine:
+    return AsyncEngine(parse_property_listings, ProxyManager(), parse_pool=pool, timeout=10, **options)
+
+def test_follows_pagination(site: Site, pool: ParsePool) -> None:
+    site.pages = 12
+    frontier = CrawlFrontier([f"{site.url}/p1.html"], follow_pagination=True)
+    pages = list(engine(pool, concurrency=4).iter_pages(frontier))
+    assert [url for url, _, _ in pages] == [f"{site.url}/p{n}.html" for n in range(1, 13)]
+    assert {r["listingId"] for _, items, _ in pages for r in items} == site.listing_ids()
+    assert pages[-1][2] is None
+    assert frontier.exhausted
+
+def test_fetches_seeds_concurrently(site: Site, pool: ParsePool) -> None:
+    # Page 1 hangs until released; the other seeds must not wait behind it.
+    site.pages = 8
+    site.block_at = 1
+    frontier = CrawlFrontier([f"{site.url}/p{n}.html" for n in range(1, 9)])
+    pages = engine(pool, concurrency=4).iter_pages(frontier)
+    first = [next(pages)[0] for _ in range(3)]
+    assert f"{site.url}/p1.html" not in first
+    site.gate.set()
+    rest = [url for url, _, _ in pages]
+    assert sorted(first + rest) == sorted(f"{site.url}/p{n}.html" for n in range(1, 9))
+
+def test_failures_are_reported(site: Site, pool: ParsePool) -> None:
+    site.pages = 2
+    failed: List[Tuple[str, str]] = []
+    frontier = CrawlFrontier([f"{site.url}/p{n}.html" for n in (1, 2, 3)])
+
+    def on_failure(url: str, exc: Exception) -> None:
+        failed.append((url, type(exc).__name__))
+
+    pages = list(engine(pool, on_failure=on_failure).iter_pages(frontier))
+    assert len(pages) == 2
+    assert failed == [(f"{site.url}/p3.html", "ClientResponseError")]
+    assert frontier.failed == 1 and not frontier.exhausted
+
+def test_dedupe_runs_before_pages_are_handed_over(site: Site, pool: ParsePool) -> None:
+    site.pages = 3
+    frontier = CrawlFrontier([f"{site.url}/p1.html"], follow_pagination=True)
+    pages = list(engine(pool, dedupe=lambda items: items[:3]).iter_pages(frontier))
+    assert [len(items) for _, items, _ in pages] == [3, 3, 3]
+    # The frontier's max_items budget counts what is kept.
+    assert frontier.records == 9
+
+def test_closing_early_stops_the_crawl(site: Site, pool: ParsePool) -> None:
+    site.pages = 100
+    frontier = CrawlFrontier([f"{site.url}/p1.html"], follow_pagination=True)
+    pages = engine(pool, concurrency=1).iter_pages(frontier)
+    next(pages)
+    pages.close()
+    assert site.hits <= 3
+    assert frontier.pages <= 2 and frontier.pending <= 1
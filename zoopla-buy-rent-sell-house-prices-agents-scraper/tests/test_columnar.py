@@ -0,0 +1,17 @@
+from pathlib import Path
+
+import pytest
+
+from utils.columnar import ColumnarWriter
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+def test_int_columns_parse_numbers(tmp_path: Path) -> None:
+    path = tmp_path / "property.parquet"
+    writer = ColumnarWriter(path, "parquet", "property", ["price", "num_bedrooms"])
+    for price, beds in [("705000.00", "3 beds"), ("£1.2m", 2.0), ("£1,250.50", "Studio"), ("POA", None)]:
+        writer.write({"price": price, "num_bedrooms": beds})
+    writer.close()
+    table = pq.read_table(str(path))
+    assert table.column("price").to_pylist() == [705000, 1200000, 1250, None]
+    assert table.column("num_bedrooms").to_pylist() == [3, 2, None, None]
@@ -0,0 +1,118 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from conftest import SRC_DIR, Site
+from utils.dedup import BloomFilter, _digest, open_deduplicator, record_key
+
+def listing(i: int) -> dict:
+    return {"listingId": str(i), "price": 100_000 + i}
+
+@pytest.mark.parametrize("capacity, error_rate", [(20_000, 0.01), (50_000, 0.001)])
+def test_bloom_false_positive_rate(capacity: int, error_rate: float) -> None:
+    bloom = BloomFilter(capacity, error_rate)
+    assert all(bloom.add(_digest(f"property:id:{i}")) for i in range(capacity // 10))
+    for i in range(capacity // 10, capacity):
+        bloom.add(_digest(f"property:id:{i}"))
+    full = bytes(bloom._map)
+    probes = 200_000
+    false_positives = 0
+    for i in range(probes):
+        # add() also inserts the probe; put the bits back now and then so
+        # the filter stays at capacity.
+        if i % 100 == 0:
+            bloom._map[:] = full
+        false_positives += not bloom.add(_digest(f"property:id:unseen-{i}"))
+    bloom.close()
+    # Double hashing and a whole number of hashes put it a little over the nominal rate.
+    assert false_positives / probes <= 1.5 * error_rate
+
+@pytest.mark.parametrize("bloom_capacity", [0, 10_000])
+def test_drops_duplicates_across_runs(tmp_path: Path, bloom_capacity: int) -> None:
+    path = str(tmp_path / "seen.idx")
+    dedup = open_deduplicator(path, bloom_capacity=bloom_capacity)
+    assert dedup.unique("property", [listing(1), listing(2), listing(1)]) == [listing(1), listing(2)]
+    dedup.close()
+
+    dedup = open_deduplicator(path, bloom_capacity=bloom_capacity)
+    assert dedup.unique("property", [listing(2), listing(3)]) == [listing(3)]
+    assert dedup.dropped == {"property": 1}
+    # An unsaved run leaves the index as the last saved one.
+    dedup.close(save=False)
+
+    dedup = open_deduplicator(path, bloom_capacity=bloom_capacity)
+    assert dedup.unique("property", [listing(3)]) == [listing(3)]
+    dedup.close()
+
+def test_run_only_streams_are_not_saved(tmp_path: Path) -> None:
+    path = str(tmp_path / "seen.idx")
+    dedup = open_deduplicator(path, run_only=["property"])
+    assert dedup.unique("property", [listing(1), listing(1)]) == [listing(1)]
+    assert dedup.unique("agent", [{"url": "https://example.com/a"}]) == [{"url": "https://example.com/a"}]
+    dedup.close()
+
+    dedup = open_deduplicator(path, run_only=["property"])
+    assert dedup.unique("property", [listing(1)]) == [listing(1)]
+    assert dedup.unique("agent", [{"url": "https://example.com/a"}]) == []
+    dedup.close()
+
+def test_house_price_key_survives_normalize() -> None:
+    raw = {"address": "1 Mill Lane, Leeds LS6 1AB", "date_sold": "3rd Mar 2024"}
+    normalized = {"address": "1 Mill Lane, Leeds LS6 1AB", "date_sold": "2024-03-03"}
+    assert record_key("house_prices", raw) == record_key("house_prices", normalized)
+
+def deduped_run(site: Site, tmp_path: Path) -> List[str]:
+    """The command of a paginated crawl of ``site`` deduplicated across runs, writing JSON."""
+    config = {
+        "mode": "property",
+        "property_urls": [f"{site.url}/p1.html"],
+        "agent_urls": [],
+        "house_price_urls": [],
+        "output_format": "json",
+        "output_dir": str(tmp_path / "out"),
+        "max_items": 0,
+        "concurrency": 1,
+        "use_proxies": False,
+        "proxies": [],
+        "follow_pagination": True,
+        "parse_workers": 0,
+        "dedupe": True,
+        "dedupe_path": str(tmp_path / "seen.idx"),
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+    return [sys.executable, "main.py", "--config", str(config_path)]
+
+def listing_ids(tmp_path: Path) -> List[str]:
+    with (tmp_path / "out" / "sample_property.json").open(encoding="utf-8") as f:
+        return sorted(record["listingId"] for record in json.load(f))
+
+def test_resumed_run_keeps_records_written_before_checkpoint(site: Site, tmp_path: Path) -> None:
+    site.pages = 6
+    site.block_at = 4
+    command = deduped_run(site, tmp_path)
+    env = {**os.environ, "XDG_CACHE_HOME": str(tmp_path / "cache")}
+
+    first = subprocess.Popen(command, cwd=SRC_DIR, env=env, stderr=subprocess.DEVNULL)
+    try:
+        assert site.reached.wait(60), "the first run never reached page 4"
+    finally:
+        # Saves the checkpoint after pages 1-3 on the way out.
+        os.kill(first.pid, signal.SIGTERM)
+        site.gate.set()
+        first.wait(60)
+
+    subprocess.run(
+        command + ["--resume"], cwd=SRC_DIR, env=env, check=True, stderr=subprocess.DEVNULL
+    )
+    assert listing_ids(tmp_path) == sorted(site.listing_ids())
+
+    # The saved index covers the pages written before the checkpoint too.
+    subprocess.run(command, cwd=SRC_DIR, env=env, check=True, stderr=subprocess.DEVNULL)
+    assert listing_ids(tmp_path) == []
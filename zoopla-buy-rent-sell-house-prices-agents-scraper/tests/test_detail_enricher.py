@@ -0,0 +1,85 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from extractors.detail_enricher import DetailEnricher
+from utils.metrics import Metrics
+from utils.normalize import normalize_records
+from utils.state_store import ListingStateStore
+
+PAGE = "https://www.zoopla.co.uk/for-sale/property/oxford/"
+HISTORY = {"firstPublished": "2024-01-02", "price": "£300,000"}
+
+def card(key: str, price: Any) -> Dict[str, Any]:
+    return {"listingId": key, "url": f"/for-sale/details/{key}/", "price": price, "description": None}
+
+class FakeDetails:
+    def __init__(self) -> None:
+        self.urls: List[str] = []
+
+    def __call__(self, url: str) -> Optional[Dict[str, Any]]:
+        self.urls.append(url)
+        return {"description": f"details of {url}", "price_history": HISTORY}
+
+def enrich(enricher: DetailEnricher, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    enricher.merge(items, enricher.submit(items, PAGE))
+    return items
+
+def test_unchanged_listings_reuse_stored_details(tmp_path: Path) -> None:
+    path = str(tmp_path / "state.sqlite3")
+    store = ListingStateStore(path)
+    first = DetailEnricher(FakeDetails())
+    # As with normalize on: stored records are normalized, cards are not.
+    items = enrich(first, [card("1", 300_000), card("2", "£450,000")])
+    list(store.delta(normalize_records("property", items)))
+    first.close()
+    store.close()
+
+    store = ListingStateStore(path)
+    fetch = FakeDetails()
+    metrics = Metrics()
+    enricher = DetailEnricher(fetch, metrics=metrics)
+    enricher.state = store
+    # 1 and 2 are unchanged and 3 is new: only the new listing's page is fetched.
+    items = enrich(enricher, [card("1", 300_000), card("2", "£450,000"), card("3", 500_000)])
+    enricher.close()
+    assert fetch.urls == ["https://www.zoopla.co.uk/for-sale/details/3/"]
+    assert items[0]["description"] == "details of https://www.zoopla.co.uk/for-sale/details/1/"
+    assert items[1]["price_history"] == HISTORY
+    assert enricher.stats() == {"fetched": 1, "reused": 0, "unchanged": 2, "failed": 0}
+    assert 'zoopla_detail_pages_total{outcome="reused"} 2' in metrics.render_prometheus()
+    # Reused details fingerprint the same, so unchanged listings stay out of the delta.
+    delta = store.delta(normalize_records("property", items), lambda: False)
+    assert [r["listingId"] for r in delta] == ["3"]
+    store.close()
+
+def test_changed_card_fetches_details_again(tmp_path: Path) -> None:
+    path = str(tmp_path / "state.sqlite3")
+    store = ListingStateStore(path)
+    list(store.delta(enrich(DetailEnricher(FakeDetails()), [card("1", 300_000)])))
+    store.close()
+
+    store = ListingStateStore(path)
+    fetch = FakeDetails()
+    enricher = DetailEnricher(fetch)
+    enricher.state = store
+    enrich(enricher, [card("1", 295_000)])
+    enricher.close()
+    assert fetch.urls == ["https://www.zoopla.co.uk/for-sale/details/1/"]
+    store.close()
+
+def test_listing_without_stored_details_is_fetched_again(tmp_path: Path) -> None:
+    path = str(tmp_path / "state.sqlite3")
+    store = ListingStateStore(path)
+    failing = DetailEnricher(lambda url: None)
+    list(store.delta(enrich(failing, [card("1", 300_000)])))
+    failing.close()
+    store.close()
+
+    store = ListingStateStore(path)
+    fetch = FakeDetails()
+    enricher = DetailEnricher(fetch)
+    enricher.state = store
+    enrich(enricher, [card("1", 300_000)])
+    enricher.close()
+    assert fetch.urls == ["https://www.zoopla.co.uk/for-sale/details/1/"]
+    store.close()
@@ -0,0 +1,74 @@
+from typing import List, Optional
+
+from utils.frontier import CrawlFrontier, normalize_url
+
+def crawl(frontier: CrawlFrontier, pages: int, per_page: int = 10) -> List[str]:
+    """Fetch pages one at a time from ``frontier``; page ``n`` links to ``n + 1`` up to ``pages``."""
+    fetched = []
+    while True:
+        url = frontier.next_url()
+        if url is None:
+            return fetched
+        fetched.append(url)
+        n = int(url.rsplit("/p", 1)[1])
+        next_url: Optional[str] = f"https://example.com/p{n + 1}" if n < pages else None
+        frontier.page_done(url, per_page, next_url)
+
+def test_follows_pagination_to_the_end() -> None:
+    frontier = CrawlFrontier(["https://example.com/p1"], follow_pagination=True)
+    assert crawl(frontier, pages=5) == [f"https://example.com/p{n}" for n in range(1, 6)]
+    assert frontier.exhausted
+
+def test_next_pages_are_only_noted_without_pagination() -> None:
+    frontier = CrawlFrontier(["https://example.com/p1"])
+    assert crawl(frontier, pages=5) == ["https://example.com/p1"]
+    assert frontier.truncated and not frontier.exhausted
+
+def test_page_cap_per_seed() -> None:
+    seeds = ["https://example.com/p1", "https://example.com/p11"]
+    frontier = CrawlFrontier(seeds, follow_pagination=True, max_pages_per_seed=3)
+    fetched = crawl(frontier, pages=20)
+    assert sorted(fetched) == sorted(
+        f"https://example.com/p{n}" for n in (1, 2, 3, 11, 12, 13)
+    )
+    assert frontier.truncated
+
+def test_duplicate_seeds_are_fetched_once() -> None:
+    frontier = CrawlFrontier(
+        ["https://example.com/p1?b=2&a=1", "HTTPS://EXAMPLE.COM/p1?a=1&b=2#top"]
+    )
+    assert frontier.pending == 1
+    assert normalize_url("HTTPS://Example.com?b=2&a=1") == "https://example.com/?a=1&b=2"
+
+def test_budget_stops_handing_out_pages() -> None:
+    frontier = CrawlFrontier(
+        [f"https://example.com/p{n}" for n in range(1, 21)], max_items=25
+    )
+    # Nothing parsed yet: no yield to judge by, so pages go out freely.
+    assert frontier.next_url(in_flight=5) == "https://example.com/p1"
+    frontier.page_done("https://example.com/p1", 10)
+    # 10 records so far at 10 a page: one more page in flight makes 20, two make 30.
+    assert frontier.next_url(in_flight=1) == "https://example.com/p2"
+    assert frontier.next_url(in_flight=2) is None
+    frontier.page_done("https://example.com/p2", 10)
+    frontier.page_done("https://example.com/p3", 10)
+    assert frontier.limit_reached
+    assert frontier.next_url() is None
+    assert not frontier.exhausted
+
+def test_failed_pages_leave_the_crawl_incomplete() -> None:
+    frontier = CrawlFrontier(["https://example.com/p1"])
+    frontier.page_failed(frontier.next_url())
+    assert frontier.failed == 1
+    assert not frontier.exhausted
+
+def test_restore_skips_done_pages_and_keeps_seed_caps() -> None:
+    frontier = CrawlFrontier(["https://example.com/p1"], follow_pagination=True, max_pages_per_seed=4)
+    seed = "https://example.com/p1"
+    frontier.restore(
+        done=[(seed, seed), ("https://example.com/p2", seed)],
+        pending=[("https://example.com/p3", seed)],
+        records=20,
+    )
+    assert crawl(frontier, pages=10) == ["https://example.com/p3", "https://example.com/p4"]
+    assert (frontier.pages, frontier.records) == (4, 40)
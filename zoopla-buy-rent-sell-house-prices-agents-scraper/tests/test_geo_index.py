@@ -0,0 +1,90 @@
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+
+from utils.geo_index import DISTANCE_FIELD, RecordIndex, haversine_km
+from utils.state_store import CHANGE_FIELD
+
+POSTCODES = ["OX2 7DE", "OX25 4AB", "OX26 1AA", "LS6 1AB", "SW1A 1AA", "M1 1AE"]
+
+def listing(i: int, lat: float, lon: float, postcode: str) -> Dict[str, Any]:
+    return {
+        "listingId": str(i),
+        "address": f"{i} Test Road, Somewhere {postcode}",
+        "coordinates": {"latitude": lat, "longitude": lon},
+    }
+
+@pytest.fixture
+def index(tmp_path: Path) -> Iterator[RecordIndex]:
+    index = RecordIndex(str(tmp_path / "index.sqlite3"), commit_every=50)
+    yield index
+    index.close()
+
+@pytest.fixture
+def listings(index: RecordIndex) -> List[Dict[str, Any]]:
+    rng = random.Random(7)
+    records = [
+        listing(i, rng.uniform(50, 56), rng.uniform(-5, 1), rng.choice(POSTCODES))
+        for i in range(2000)
+    ]
+    list(index.indexing("property", records))
+    return records
+
+def point(record: Dict[str, Any]) -> Tuple[float, float]:
+    return record["coordinates"]["latitude"], record["coordinates"]["longitude"]
+
+def ids(records: List[Dict[str, Any]]) -> List[str]:
+    return [r["listingId"] for r in records]
+
+@pytest.mark.parametrize("radius_km", [1, 25, 150])
+def test_radius_matches_brute_force(
+    index: RecordIndex, listings: List[Dict[str, Any]], radius_km: float
+) -> None:
+    lat, lon = 51.75, -1.26
+    by_distance = sorted(
+        (haversine_km(lat, lon, *point(r)), r["listingId"]) for r in listings
+    )
+    expected = [key for distance, key in by_distance if distance <= radius_km]
+    found = index.within_radius(lat, lon, radius_km)
+    assert ids(found) == expected
+    distances = [r[DISTANCE_FIELD] for r in found]
+    assert distances == sorted(distances)
+    assert ids(index.within_radius(lat, lon, radius_km, limit=3)) == expected[:3]
+
+def test_bbox_matches_brute_force(index: RecordIndex, listings: List[Dict[str, Any]]) -> None:
+    south, west, north, east = 51.0, -2.0, 52.5, 0.0
+    expected = {
+        r["listingId"]
+        for r in listings
+        if south <= point(r)[0] <= north and west <= point(r)[1] <= east
+    }
+    assert set(ids(index.within_bbox(south, west, north, east))) == expected
+    assert index.within_bbox(south, west, north, east, stream="agent") == []
+
+def test_postcode_prefix_and_district(index: RecordIndex, listings: List[Dict[str, Any]]) -> None:
+    def with_postcode(*postcodes: str) -> set:
+        return {r["listingId"] for r in listings if r["address"].endswith(postcodes)}
+
+    assert set(ids(index.by_postcode("ox2"))) == with_postcode("OX2 7DE", "OX25 4AB", "OX26 1AA")
+    assert set(ids(index.by_postcode("OX2 7"))) == with_postcode("OX2 7DE")
+    assert set(ids(index.by_district("OX2"))) == with_postcode("OX2 7DE")
+    assert set(ids(index.by_postcode("SW1A1AA"))) == with_postcode("SW1A 1AA")
+    assert index.by_postcode("") == []
+    assert len(index.by_district("LS6", limit=5)) == 5
+
+def test_records_seen_again_replace_the_stored_copy(index: RecordIndex) -> None:
+    list(index.indexing("property", [listing(1, 51.75, -1.26, "OX2 7DE")]))
+    moved = listing(1, 53.8, -1.57, "LS6 1AB")
+    list(index.indexing("property", [moved]))
+    assert len(index) == 1
+    assert index.within_radius(51.75, -1.26, 5) == []
+    assert ids(index.by_district("LS6")) == ["1"]
+
+def test_removed_listings_leave_the_index(index: RecordIndex) -> None:
+    first, second = (listing(i, 51.75, -1.26, "OX2 7DE") for i in (1, 2))
+    list(index.indexing("property", [first, second]))
+    list(index.indexing("property", [{**first, CHANGE_FIELD: "removed"}]))
+    assert ids(index.within_radius(51.75, -1.26, 1)) == ["2"]
+    assert index.removed == 1
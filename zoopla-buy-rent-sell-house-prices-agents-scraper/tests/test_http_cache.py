@@ -0,0 +1,34 @@
+import os
+import sqlite3
+from pathlib import Path
+
+from utils.http_cache import ResponseCache
+
+def stored_size(cache: ResponseCache) -> int:
+    with sqlite3.connect(str(cache.path)) as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+def test_evicts_least_recently_used(tmp_path: Path) -> None:
+    # Random bytes do not compress, so each entry is a little over 1 KB.
+    cache = ResponseCache(str(tmp_path), max_bytes=5 * 1024)
+    for i in range(4):
+        cache.store(f"https://example.com/p{i}", os.urandom(1024), {})
+    cache.hit(cache.lookup("https://example.com/p0"))
+    cache.store("https://example.com/p4", os.urandom(1024), {})
+    cache.store("https://example.com/p5", os.urandom(1024), {})
+    kept = [i for i in range(6) if cache.lookup(f"https://example.com/p{i}") is not None]
+    assert kept == [0, 3, 4, 5]
+    assert cache._size == stored_size(cache) <= cache.max_bytes
+    cache.close()
+
+def test_size_survives_reopen_and_replace(tmp_path: Path) -> None:
+    cache = ResponseCache(str(tmp_path), max_bytes=5 * 1024)
+    cache.store("https://example.com/p0", os.urandom(1024), {})
+    cache.store("https://example.com/p1", os.urandom(1024), {})
+    cache.close()
+
+    cache = ResponseCache(str(tmp_path), max_bytes=5 * 1024)
+    assert cache._size == stored_size(cache)
+    cache.store("https://example.com/p0", os.urandom(2048), {})
+    assert cache._size == stored_size(cache)
+    cache.close()
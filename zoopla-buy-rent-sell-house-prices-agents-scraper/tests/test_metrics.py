@@ -0,0 +1,92 @@
+import random
+import re
+import urllib.request
+from typing import Dict
+
+import pytest
+
+from utils.metrics import LATENCY_BUCKETS, Histogram, Metrics, MetricsReporter
+
+SAMPLE_RE = re.compile(r'^(?P<name>[a-z_]+)(?:\{(?P<labels>[^}]*)\})? (?P<value>\S+)$')
+
+def samples(text: str) -> Dict[str, float]:
+    """Prometheus text format as ``{'name{labels}': value}``; fails on a malformed line."""
+    values = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) [a-z_]+ \S", line), line
+            continue
+        match = SAMPLE_RE.match(line)
+        assert match, line
+        values[f"{match['name']}{{{match['labels'] or ''}}}"] = float(match["value"])
+    return values
+
+def test_quantiles_land_within_a_bucket_of_the_truth() -> None:
+    rng = random.Random(3)
+    values = sorted(rng.lognormvariate(-2.5, 1.2) for _ in range(20_000))
+    histogram = Histogram()
+    for value in values:
+        histogram.observe(value)
+    for q in (0.5, 0.9, 0.99):
+        truth = values[int(q * len(values)) - 1]
+        i = next(i for i, bound in enumerate(LATENCY_BUCKETS) if truth <= bound)
+        lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+        assert lower <= histogram.quantile(q) <= LATENCY_BUCKETS[i]
+
+def test_quantiles_stay_within_what_was_seen() -> None:
+    histogram = Histogram()
+    assert histogram.quantile(0.5) is None
+    histogram.observe(0.3)
+    assert histogram.quantile(0.01) == histogram.quantile(0.99) == 0.3
+    # Beyond the last bucket, interpolated up to the largest value seen.
+    histogram.observe(90.0)
+    assert histogram.quantile(0.99) <= 90.0
+
+def test_prometheus_rendering() -> None:
+    metrics = Metrics()
+    metrics.record_request("www.zoopla.co.uk", "200", 0.3, ttfb=0.1, size=2048)
+    metrics.record_request("www.zoopla.co.uk", "200", 0.02)
+    metrics.record_request("www.zoopla.co.uk", "read_timeout", 30.0)
+    written = [0]
+    metrics.gauge("zoopla_records_written", lambda: written[0], stream="property")
+    written[0] = 25
+
+    text = metrics.render_prometheus()
+    values = samples(text)
+    assert values['zoopla_http_requests_total{host="www.zoopla.co.uk",status="200"}'] == 2
+    assert values['zoopla_http_requests_total{host="www.zoopla.co.uk",status="read_timeout"}'] == 1
+    assert values['zoopla_http_response_bytes_total{host="www.zoopla.co.uk"}'] == 2048
+    # Gauges are read when rendered.
+    assert values['zoopla_records_written{stream="property"}'] == 25
+    assert "# TYPE zoopla_http_request_seconds histogram" in text
+
+    buckets = [
+        values[f'zoopla_http_request_seconds_bucket{{phase="total",le="{bound:g}"}}']
+        for bound in LATENCY_BUCKETS
+    ]
+    assert buckets == sorted(buckets)
+    assert values['zoopla_http_request_seconds_bucket{phase="total",le="0.025"}'] == 1
+    assert values['zoopla_http_request_seconds_bucket{phase="total",le="0.5"}'] == 2
+    assert values['zoopla_http_request_seconds_bucket{phase="total",le="+Inf"}'] == 3
+    assert values['zoopla_http_request_seconds_count{phase="total"}'] == 3
+    assert values['zoopla_http_request_seconds_sum{phase="total"}'] == pytest.approx(30.32)
+    assert values['zoopla_http_request_seconds_count{phase="download"}'] == 1
+
+def test_snapshot_and_endpoint() -> None:
+    metrics = Metrics()
+    metrics.observe("zoopla_parse_seconds", 0.004, stream="agent")
+    metrics.inc("zoopla_pages_parsed_total", stream="agent", source="dom")
+    snapshot = metrics.snapshot()
+    [row] = snapshot["histograms"]["zoopla_parse_seconds"]
+    assert (row["labels"], row["count"], row["p50"]) == ({"stream": "agent"}, 1, 0.004)
+    assert snapshot["counters"]["zoopla_pages_parsed_total"][0]["value"] == 1
+
+    reporter = MetricsReporter(metrics, port=0)
+    reporter.start()
+    try:
+        url = f"http://127.0.0.1:{reporter._server.server_port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert samples(response.read().decode("utf-8")) == samples(metrics.render_prometheus())
+    finally:
+        reporter.stop()
@@ -0,0 +1,85 @@
+import copy
+import random
+from typing import Any, Dict, List
+
+import pytest
+
+from utils.normalize import COLUMNAR_MIN_RECORDS, normalize_columns, normalize_rows, number_of
+from utils.parser import parse_house_prices, parse_property_listings
+
+pytest.importorskip("pyarrow")
+
+PROPERTY_CARDS = "".join(
+    f'<div data-listing-id="{i}"><h2>2 bed flat</h2><p class="price">{price}</p>'
+    f'<p class="address">{i} High Street, Oxford OX2 7DE</p></div>'
+    for i, price in enumerate(["£705,000", "€250,000", "$1,200,000", "POA", ""])
+)
+HOUSE_PRICE_ROWS = "".join(
+    f"<tr><td>{i} Mill Lane, Leeds LS6 {i}AB</td><td>{price}</td><td>{date}</td></tr>"
+    for i, (price, date) in enumerate(
+        [("£250,000", "3rd Mar 2024"), ("€90,000", "2024-02-29"), ("n/a", "31/02/2024")]
+    )
+)
+
+def property_records() -> List[Dict[str, Any]]:
+    return [
+        *parse_property_listings(f"<html><body>{PROPERTY_CARDS}</body></html>"),
+        {"price": "£1,250,000.50", "address": "Flat 2, 10 Kings Road, London SW3"},
+        {"price": 450000, "currency": "GBP", "num_bedrooms": "3 beds"},
+        {"price": 99.5, "num_bathrooms": 2.0, "coordinates": {"latitude": 0, "longitude": 0}},
+        {"price": "€300,000", "currency": "", "coordinates": {"latitude": "51.5", "longitude": -0.1}},
+        {"price": None, "num_reception_rooms": True, "coordinates": {"latitude": 91, "longitude": 0}},
+        {"address": "no postcode here"},
+    ]
+
+def house_price_records() -> List[Dict[str, Any]]:
+    return parse_house_prices(f"<html><body><table>{HOUSE_PRICE_ROWS}</table></body></html>")
+
+def test_dom_fallback_keeps_currency() -> None:
+    normalized = normalize_rows("property", property_records())
+    assert [(r["price"], r["currency"]) for r in normalized[:5]] == [
+        (705000, "GBP"),
+        (250000, "EUR"),
+        (1200000, "USD"),
+        (None, None),
+        (None, None),
+    ]
+    normalized = normalize_rows("house_prices", house_price_records())
+    assert [(r["price"], r["currency"]) for r in normalized] == [
+        (250000, "GBP"),
+        (90000, "EUR"),
+        (None, None),
+    ]
+
+def test_price_magnitudes() -> None:
+    prices = ["£1.2m", "£450K", "705000.00", "£1,250,000.50", "3 months", "450kg", "POA"]
+    assert [number_of(p) for p in prices] == [1200000, 450000, 705000, 1250000, 3, 450, None]
+
+@pytest.mark.parametrize(
+    "stream, records", [("property", property_records), ("house_prices", house_price_records)]
+)
+def test_rows_and_columns_agree(stream: str, records: Any) -> None:
+    batch = records()
+    assert normalize_columns(stream, copy.deepcopy(batch)) == normalize_rows(stream, batch)
+
+# Messy values as pages give them, to mix into generated records.
+VALUES = {
+    "price": ["£705,000", "€1,250.50", "$99.5", "POA", "", None, 450000, 2.5, True, "£ 1,000 pcm",
+              "£1.2m", "£450K", "3 months", "705000.00"],
+    "currency": [None, "", "GBP", "EUR"],
+    "num_bedrooms": ["3 beds", "Studio", 2.0, 4, None, "10+"],
+    "num_bathrooms": ["1 bath", None, 1.7, "two"],
+    "date_sold": ["3rd Mar 2024", "31/02/2024", "2024-02-29", "1 Jan 24", "2023-10-01T12:00:00Z", None, "soon"],
+    "coordinates": [None, {"latitude": 51.5, "longitude": -0.1}, {"latitude": 0, "longitude": 0},
+                    {"latitude": "91", "longitude": 1}, {"latitude": None}, "51.5,-0.1"],
+    "address": ["1 High St, Oxford OX2 7DE", "Leeds LS6", "sw1a 1aa", "London", None, 42],
+}
+
+@pytest.mark.parametrize("stream", ["property", "house_prices"])
+def test_rows_and_columns_agree_on_generated_records(stream: str) -> None:
+    rng = random.Random(stream)
+    batch = [
+        {field: rng.choice(values) for field, values in VALUES.items() if rng.random() < 0.8}
+        for _ in range(COLUMNAR_MIN_RECORDS * 2)
+    ]
+    assert normalize_columns(stream, copy.deepcopy(batch)) == normalize_rows(stream, batch)
@@ -0,0 +1,33 @@
+from utils.parser import ParsedDocument, header_encoding, parse_property_details
+
+PAGE = "<html><head><title>Café £450,000</title></head><body></body></html>"
+
+def title(doc: ParsedDocument) -> str:
+    return doc.tree.findtext(".//title")
+
+def test_header_encoding() -> None:
+    assert header_encoding("text/html; charset=windows-1252") == "windows-1252"
+    assert header_encoding('text/html; Charset="ISO-8859-1"') == "ISO-8859-1"
+    assert header_encoding("text/html") is None
+    assert header_encoding(None) is None
+
+def test_header_charset_decodes_page() -> None:
+    doc = ParsedDocument(PAGE.encode("cp1252"), header_encoding("text/html; charset=windows-1252"))
+    assert title(doc) == "Café £450,000"
+
+def test_header_charset_beats_meta_but_not_bom() -> None:
+    meta = PAGE.replace("<head>", '<head><meta charset="utf-8">')
+    assert title(ParsedDocument(meta.encode("cp1252"), "windows-1252")) == "Café £450,000"
+    bom = b"\xef\xbb\xbf" + PAGE.encode("utf-8")
+    assert title(ParsedDocument(bom, "windows-1252")) == "Café £450,000"
+
+def test_unknown_header_charset_falls_back_to_meta() -> None:
+    meta = PAGE.replace("<head>", '<head><meta charset="windows-1252">')
+    assert title(ParsedDocument(meta.encode("cp1252"), "x-no-such-charset")) == "Café £450,000"
+
+def test_wide_header_charset() -> None:
+    assert title(ParsedDocument(PAGE.encode("utf-16-le"), "utf-16-le")) == "Café £450,000"
+
+def test_detail_page_uses_header_charset() -> None:
+    page = '<html><body><h1 data-testid="title-label">Café flat</h1></body></html>'
+    assert parse_property_details(page.encode("cp1252"), "windows-1252") == parse_property_details(page)
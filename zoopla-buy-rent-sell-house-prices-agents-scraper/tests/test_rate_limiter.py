@@ -0,0 +1,74 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from utils.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+HOST = "www.zoopla.co.uk"
+
+def fill(limiter: AdaptiveRateLimiter, host: str = HOST) -> int:
+    """Take slots until the window is full; returns how many were taken."""
+    taken = 0
+    while limiter.try_acquire(host) == 0:
+        taken += 1
+    return taken
+
+def test_window_grows_additively_and_halves_once_per_throttle() -> None:
+    limiter = AdaptiveRateLimiter(max_concurrency=16, adaptive=True)
+    assert fill(limiter) == 4
+    for _ in range(4):
+        limiter.release(HOST, 0.1, status=200)
+    # About one more slot per window's worth of healthy responses.
+    assert fill(limiter) == 4
+    for _ in range(40):
+        limiter.release(HOST, 0.1, status=200)
+        limiter.try_acquire(HOST)
+    assert limiter.summary()[HOST]["final_limit"] == 10
+
+    # Responses already in flight when the first 429 arrives do not halve it again.
+    limiter.release(HOST, 0.1, status=429)
+    limiter.release(HOST, 0.1, status=503)
+    limiter.release(HOST, 0.1, timed_out=True)
+    summary = limiter.summary()[HOST]
+    assert (summary["throttled"], summary["final_limit"]) == (3, 5)
+
+def test_window_stays_within_bounds() -> None:
+    limiter = AdaptiveRateLimiter(max_concurrency=4, adaptive=True, min_concurrency=2)
+    for _ in range(100):
+        limiter.release(HOST, 0.1, status=200)
+    assert limiter.summary()[HOST]["final_limit"] == 4
+    limiter._hosts[HOST].last_backoff = 0.0
+    limiter.release(HOST, 0.1, status=429)
+    limiter._hosts[HOST].last_backoff = 0.0
+    limiter.release(HOST, 0.1, status=429)
+    assert limiter.summary()[HOST]["final_limit"] == 2
+
+def test_slow_responses_do_not_grow_the_window() -> None:
+    limiter = AdaptiveRateLimiter(max_concurrency=16, adaptive=True)
+    limiter.release(HOST, 0.1, status=200)
+    for _ in range(50):
+        limiter.release(HOST, 1.0, status=200)
+    assert limiter.summary()[HOST]["final_limit"] == 4
+
+def test_retry_after_pauses_only_that_host() -> None:
+    limiter = AdaptiveRateLimiter(max_concurrency=4)
+    limiter.release(HOST, 0.1, status=429, retry_after="5")
+    assert 4 < limiter.try_acquire(HOST) <= 5
+    assert limiter.try_acquire("other.example.com") == 0
+    # Only honoured on throttling responses, and never for the window without adaptation.
+    limiter.release("other.example.com", 0.1, status=200, retry_after="60")
+    assert limiter.try_acquire("other.example.com") == 0
+    assert limiter.summary()[HOST]["final_limit"] == 4
+
+def test_token_bucket_paces_requests() -> None:
+    limiter = AdaptiveRateLimiter(max_concurrency=10, rate=2)
+    assert fill(limiter) == 2
+    assert limiter.try_acquire(HOST) == pytest.approx(0.5, abs=0.05)
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(formatdate(time.time() + 60, usegmt=True)) == pytest.approx(60, abs=2)
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
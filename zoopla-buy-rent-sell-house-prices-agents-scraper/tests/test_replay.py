@@ -0,0 +1,111 @@
+import asyncio
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+import requests
+
+from conftest import Site
+from extractors.property_extractor import PropertyExtractor
+from utils.http_client import HttpClient
+from utils.parse_pool import ParsePool
+from utils.proxy_manager import ProxyManager
+from utils.replay import ReplayAdapter, Replayer, ReplaySession, ResponseArchive
+from utils.retry import classify
+
+def archive_with_page(tmp_path: Path) -> ResponseArchive:
+    archive = ResponseArchive(str(tmp_path / "archive"))
+    archive.save("https://example.com/p1?b=2&a=1", 200, b"<html>one</html>", "text/html; charset=utf-8")
+    return archive
+
+def replay_session(replayer: Replayer) -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", ReplayAdapter(replayer))
+    return session
+
+def test_archive_keys_on_normalized_urls(tmp_path: Path) -> None:
+    archive_with_page(tmp_path).close()
+    archive = ResponseArchive(str(tmp_path / "archive"))
+    archived = archive.lookup("HTTPS://example.com/p1?a=1&b=2")
+    assert (archived.status, archived.content_type, archived.body) == (
+        200, "text/html; charset=utf-8", b"<html>one</html>",
+    )
+    assert archive.lookup("https://example.com/p2") is None
+    assert (len(archive), archive.urls()) == (1, ["https://example.com/p1?b=2&a=1"])
+    archive.close()
+
+def test_replay_adapter_serves_archive_and_404s_the_rest(tmp_path: Path) -> None:
+    replayer = Replayer(archive_with_page(tmp_path))
+    session = replay_session(replayer)
+    resp = session.get("https://example.com/p1?a=1&b=2")
+    assert (resp.status_code, resp.text, resp.headers["Content-Type"]) == (
+        200, "<html>one</html>", "text/html; charset=utf-8",
+    )
+    assert session.get("https://example.com/p2").status_code == 404
+    assert replayer.stats() == {"served": 1, "missing": 1, "injected": 0}
+
+def test_injected_faults_split_between_connect_and_server_errors(tmp_path: Path) -> None:
+    replayer = Replayer(archive_with_page(tmp_path), error_rate=0.3, seed=1)
+    session = replay_session(replayer)
+    outcomes: Counter = Counter()
+    for _ in range(2000):
+        try:
+            resp = session.get("https://example.com/p1?a=1&b=2")
+            outcomes[resp.status_code] += 1
+        except requests.ConnectionError as exc:
+            outcomes[classify(exc)] += 1
+    assert outcomes.keys() == {200, 503, "connect"}
+    assert outcomes[503] + outcomes["connect"] == pytest.approx(600, rel=0.15)
+    assert outcomes[503] == pytest.approx(outcomes["connect"], rel=0.25)
+    assert replayer.injected == outcomes[503] + outcomes["connect"]
+
+def test_seeded_replays_repeat(tmp_path: Path) -> None:
+    archive = archive_with_page(tmp_path)
+
+    def faults(seed: int) -> List[Any]:
+        replayer = Replayer(archive, latency=0.05, jitter=0.05, error_rate=0.5, seed=seed)
+        return [replayer.plan("https://example.com/p1?a=1&b=2")[:2] for _ in range(50)]
+
+    assert faults(7) == faults(7)
+    assert faults(7) != faults(8)
+    assert all(0 <= delay <= 0.1 for delay, _ in faults(7))
+
+def test_replay_session_stands_in_for_aiohttp(tmp_path: Path) -> None:
+    pytest.importorskip("aiohttp")
+    replayer = Replayer(archive_with_page(tmp_path))
+
+    async def get(url: str) -> bytes:
+        async with ReplaySession(replayer) as session:
+            async with session.get(url) as resp:
+                resp.raise_for_status()
+                return await resp.read()
+
+    assert asyncio.run(get("https://example.com/p1?a=1&b=2")) == b"<html>one</html>"
+    with pytest.raises(Exception) as raised:
+        asyncio.run(get("https://example.com/p2"))
+    assert classify(raised.value) == "http_404"
+
+def crawl(site: Site, engine: str, **client: Any) -> List[Dict[str, Any]]:
+    with ParsePool(workers=1) as pool:
+        extractor = PropertyExtractor(
+            ProxyManager(),
+            engine=engine,
+            parse_pool=pool,
+            follow_pagination=True,
+            http_client=HttpClient(**client),
+        )
+        return list(extractor.extract([f"{site.url}/p1.html"]))
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_recorded_crawl_replays_offline(site: Site, tmp_path: Path, engine: str) -> None:
+    site.pages = 4
+    archive = ResponseArchive(str(tmp_path / "archive"))
+    recorded = crawl(site, engine, archive=archive)
+    assert len(archive) == 4
+    hits = site.hits
+
+    replayed = crawl(site, engine, replayer=Replayer(archive))
+    assert site.hits == hits
+    assert replayed == recorded
+    archive.close()
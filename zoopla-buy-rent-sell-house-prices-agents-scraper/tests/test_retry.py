@@ -0,0 +1,158 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+import requests
+
+from conftest import Site, listing_id
+from extractors.property_extractor import PropertyExtractor
+from utils.parse_pool import ParsePool
+from utils.parser import parse_property_listings
+from utils.proxy_manager import ProxyBanned, ProxyManager
+from utils.retry import DeadLetterQueue, Retrier, RetryError, RetryPolicy, classify
+
+def http_error(status: int, retry_after: Optional[str] = None) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+def failing(errors: List[BaseException]) -> Callable[[], str]:
+    """A call raising ``errors`` in turn, then returning "ok"."""
+    remaining = list(errors)
+
+    def call() -> str:
+        if remaining:
+            raise remaining.pop(0)
+        return "ok"
+
+    return call
+
+INSTANT = {
+    name: RetryPolicy(retries=3, base_delay=0.0, max_delay=0.0) for name in ("connect", "server_error")
+}
+
+def test_classify() -> None:
+    assert [classify(http_error(status)) for status in (403, 429, 500, 503, 404)] == [
+        "banned", "throttled", "server_error", "server_error", "http_404",
+    ]
+    assert classify(requests.ConnectTimeout()) == "connect"
+    assert classify(requests.ConnectionError()) == "connect"
+    assert classify(requests.ReadTimeout()) == "read_timeout"
+    assert classify(asyncio.TimeoutError()) == "read_timeout"
+    assert classify(ProxyBanned()) == "banned"
+    assert classify(ValueError()) == "ValueError"
+    assert classify(RetryError(http_error(429), 6)) == "throttled"
+
+def test_aiohttp_errors_classify_like_requests_errors() -> None:
+    aiohttp = pytest.importorskip("aiohttp")
+    error = aiohttp.ClientResponseError(None, (), status=503)
+    assert classify(error) == "server_error"
+    assert classify(aiohttp.ServerDisconnectedError()) == "connect"
+
+def test_retries_until_success() -> None:
+    retrier = Retrier(INSTANT)
+    assert retrier.call(failing([requests.ConnectionError(), http_error(502)]), "u") == "ok"
+    assert retrier.retries == 2
+
+def test_gives_up_after_policy_retries_or_unknown_errors() -> None:
+    retrier = Retrier(INSTANT)
+    with pytest.raises(RetryError) as raised:
+        retrier.call(failing([requests.ConnectionError()] * 5), "u")
+    assert (raised.value.attempts, raised.value.error_class) == (4, "connect")
+    with pytest.raises(RetryError) as raised:
+        retrier.call(failing([http_error(404)]), "u")
+    assert raised.value.attempts == 1
+    # Errors outside ``errors`` are not the retrier's business.
+    with pytest.raises(KeyError):
+        retrier.call(failing([KeyError("x")]), "u", errors=(requests.RequestException,))
+
+def test_budget_caps_retries_across_calls() -> None:
+    retrier = Retrier(INSTANT, budget=3)
+    with pytest.raises(RetryError):
+        retrier.call(failing([http_error(500)] * 2 + [requests.ConnectionError()] * 5), "a")
+    assert retrier.retries == 3
+    # Spent: the next failure is final at once.
+    with pytest.raises(RetryError) as raised:
+        retrier.call(failing([http_error(500)]), "b")
+    assert raised.value.attempts == 1
+
+def test_retry_after_sets_the_least_delay() -> None:
+    retrier = Retrier({"throttled": RetryPolicy(retries=5, base_delay=0.01, max_delay=30.0)})
+    assert 7 <= retrier.delay_for(http_error(429, retry_after="7"), 1) <= 30
+    # Capped by the policy's longest delay.
+    assert retrier.delay_for(http_error(429, retry_after="3600"), 1) == 30
+    assert retrier.delay_for(http_error(429), 1) <= 0.01
+
+def test_async_calls_share_the_budget() -> None:
+    retrier = Retrier(INSTANT, budget=1)
+
+    async def call(errors: List[BaseException]) -> str:
+        sync = failing(errors)
+
+        async def attempt() -> str:
+            return sync()
+
+        return await retrier.call_async(attempt, "u")
+
+    assert asyncio.run(call([requests.ConnectionError()])) == "ok"
+    with pytest.raises(RetryError):
+        asyncio.run(call([requests.ConnectionError()]))
+
+def fail(queue: DeadLetterQueue, url: str) -> None:
+    queue.add("property", url, RetryError(ConnectionError("connection reset"), 3))
+
+def test_drain_keeps_queue_until_finish(tmp_path: Path) -> None:
+    path = tmp_path / "failed_urls.jsonl"
+    queue = DeadLetterQueue(path)
+    fail(queue, "https://example.com/a")
+    fail(queue, "https://example.com/b")
+
+    # A retry run that dies before finishing leaves the list as it was.
+    retry = DeadLetterQueue(path)
+    assert retry.drain() == {"property": ["https://example.com/a", "https://example.com/b"]}
+    fail(retry, "https://example.com/b")
+    assert DeadLetterQueue(path).drain() == {
+        "property": ["https://example.com/a", "https://example.com/b"]
+    }
+
+    retry = DeadLetterQueue(path)
+    retry.drain()
+    fail(retry, "https://example.com/b")
+    retry.finish()
+    assert DeadLetterQueue(path).drain() == {"property": ["https://example.com/b"]}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["failed_urls.jsonl"]
+
+def test_finish_clears_queue_when_all_retries_succeed(tmp_path: Path) -> None:
+    path = tmp_path / "failed_urls.jsonl"
+    fail(DeadLetterQueue(path), "https://example.com/a")
+    retry = DeadLetterQueue(path)
+    retry.drain()
+    retry.finish()
+    assert not path.exists()
+
+def parse_all_but_page_2(doc: Any) -> List[Dict[str, Any]]:
+    items = parse_property_listings(doc)
+    if any(item.get("listingId") == listing_id(2, 0) for item in items):
+        raise ValueError("truncated page")
+    return items
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_parse_failures_are_dead_lettered(site: Site, tmp_path: Path, engine: str) -> None:
+    site.pages = 3
+    path = tmp_path / "failed_urls.jsonl"
+    with ParsePool(workers=1) as pool:
+        extractor = PropertyExtractor(
+            ProxyManager(),
+            engine=engine,
+            parse_pool=pool,
+            dead_letters=DeadLetterQueue(path),
+        )
+        extractor.parse_page = parse_all_but_page_2
+        urls = [f"{site.url}/p{page}.html" for page in range(1, 4)]
+        assert len(list(extractor.extract(urls))) == 20
+    [entry] = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert (entry["url"], entry["error_class"], entry["attempts"]) == (urls[1], "ValueError", 1)
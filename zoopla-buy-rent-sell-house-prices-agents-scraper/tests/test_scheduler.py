@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from utils.scheduler import StreamScheduler
+
+def wait_until_waiting(scheduler: StreamScheduler, stream: str) -> None:
+    deadline = time.monotonic() + 5
+    while not scheduler._waiting[stream]:
+        assert time.monotonic() < deadline, f"{stream} never started waiting"
+        time.sleep(0.001)
+
+def test_slots_are_capped_and_freed() -> None:
+    scheduler = StreamScheduler(2)
+    assert scheduler.try_acquire("property") and scheduler.try_acquire("agent")
+    assert not scheduler.try_acquire("property")
+    scheduler.release("agent")
+    assert scheduler.try_acquire("property")
+
+def test_idle_streams_leave_their_share_to_others() -> None:
+    scheduler = StreamScheduler(4, weights={"property": 1, "agent": 1})
+    assert all(scheduler.try_acquire("property") for _ in range(4))
+
+def test_waiting_stream_gets_the_next_free_slot() -> None:
+    scheduler = StreamScheduler(2)
+    scheduler.try_acquire("property")
+    scheduler.try_acquire("property")
+    waiter = threading.Thread(target=scheduler.acquire, args=("agent",))
+    waiter.start()
+    wait_until_waiting(scheduler, "agent")
+    scheduler.release("property")
+    # Property already holds more than its share while agent waits.
+    assert not scheduler.try_acquire("property")
+    waiter.join(5)
+    assert not waiter.is_alive()
+    assert scheduler._in_use == Counter({"property": 1, "agent": 1})
+
+def test_async_waiters_count_too() -> None:
+    scheduler = StreamScheduler(2)
+    scheduler.try_acquire("property")
+    scheduler.try_acquire("property")
+
+    async def main() -> bool:
+        waiter = asyncio.create_task(scheduler.acquire_async("house_prices"))
+        while not scheduler._waiting["house_prices"]:
+            await asyncio.sleep(0.001)
+        scheduler.release("property")
+        taken_by_property = scheduler.try_acquire("property")
+        await asyncio.wait_for(waiter, 5)
+        return taken_by_property
+
+    assert asyncio.run(main()) is False
+    assert scheduler._in_use["house_prices"] == 1
+
+def test_busy_streams_split_slots_by_weight() -> None:
+    scheduler = StreamScheduler(4, weights={"property": 3, "agent": 1})
+    requests: Counter = Counter()
+    stop = threading.Event()
+
+    def worker(stream: str) -> None:
+        while not stop.is_set():
+            scheduler.acquire(stream)
+            requests[stream] += 1
+            time.sleep(0.002)
+            scheduler.release(stream)
+
+    threads = [
+        threading.Thread(target=worker, args=(stream,))
+        for stream in ("property", "agent")
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    stop.set()
+    for thread in threads:
+        thread.join(5)
+    assert requests["property"] / requests["agent"] == pytest.approx(3, rel=0.3)
@@ -0,0 +1,94 @@
+import functools
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+from lxml import html
+
+from utils import parse_pool, selector_plans
+from utils.parser import parse_property_listings
+from utils.selector_plans import SELECTOR_SPECS, SelectorPlan, load_selectors, plan, selector_pool
+
+PAGE = '<html><body><div data-listing-id="7"><h2>Flat</h2><p class="asking">£300,000</p></div></body></html>'
+
+@pytest.fixture
+def overrides(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A selectors file moving the price to ``.asking``; the built-in specs come back afterwards."""
+    monkeypatch.setattr(selector_plans, "_specs", dict(SELECTOR_SPECS))
+    monkeypatch.setattr(selector_plans, "PLANS", {})
+    monkeypatch.setattr(selector_plans, "_loaded_path", None)
+    return write_overrides(tmp_path, {"property": {"fields": {"price": ".asking"}}})
+
+def write_overrides(tmp_path: Path, overrides: Dict[str, Any]) -> Path:
+    path = tmp_path / "selectors.json"
+    path.write_text(json.dumps(overrides), encoding="utf-8")
+    return path
+
+def test_overrides_replace_only_the_fields_given(overrides: Path) -> None:
+    assert parse_property_listings(PAGE)[0]["price"] is None
+    load_selectors(str(overrides))
+    [record] = parse_property_listings(PAGE)
+    assert (record["listingId"], record["title"], record["price"]) == ("7", "Flat", 300000)
+
+def test_card_override(overrides: Path, tmp_path: Path) -> None:
+    page = '<ul><li class="branch"><h3>Acme Lettings</h3><a href="tel:0123">Call</a></li></ul>'
+    assert plan("agent").extract(html.fromstring(page)) == []
+    load_selectors(str(write_overrides(tmp_path, {"agent": {"card": "li.branch"}})))
+    [card] = plan("agent").extract(html.fromstring(page))
+    assert (card["name"], card["telephone"]) == ("Acme Lettings", "tel:0123")
+
+@pytest.mark.parametrize(
+    "bad, message",
+    [
+        ({"propertee": {"fields": {"price": ".asking"}}}, "Unknown page type"),
+        ({"property": {"fields": {"price": ".asking["}}}, "Invalid CSS selector"),
+    ],
+)
+def test_bad_overrides_fail_at_load_and_change_nothing(
+    overrides: Path, tmp_path: Path, bad: Dict[str, Any], message: str
+) -> None:
+    with pytest.raises(ValueError, match=message):
+        load_selectors(str(write_overrides(tmp_path, bad)))
+    assert parse_property_listings(PAGE)[0]["price"] is None
+    assert selector_plans._loaded_path is None
+
+def test_field_spec_forms() -> None:
+    spec = {
+        "card": "[data-id]",
+        "fields": {
+            "id": {"attr": "data-id"},
+            "name": "h2",
+            "phone": {"css": "a.tel", "attr": "href", "default": ""},
+            "logo": {"css": "img.logo", "attr": "src"},
+            "images": {"css": ".gallery img", "attr": "src", "all": True},
+            "features": {"css": "li", "all": True},
+        },
+    }
+    page = (
+        '<div data-id="1"><h2> Two <b>bed</b> <script>x()</script></h2><a class="tel">Call</a>'
+        '<div class="gallery"><img src="a.jpg"><img src="b.jpg"></div><ul><li> Garden </li></ul></div>'
+        '<div data-id="2"></div>'
+    )
+    assert SelectorPlan("test", spec).extract(html.fromstring(f"<body>{page}</body>")) == [
+        {
+            "id": "1",
+            "name": "Twobed",
+            "phone": "",
+            "logo": None,
+            "images": ["a.jpg", "b.jpg"],
+            "features": ["Garden"],
+        },
+        {"id": "2", "name": None, "phone": None, "logo": None, "images": [], "features": []},
+    ]
+
+def test_pool_workers_load_overrides(overrides: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Spawned workers start from the built-in specs, as on macOS and Windows.
+    spawn = functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn"))
+    monkeypatch.setattr(parse_pool, "ProcessPoolExecutor", spawn)
+    load_selectors(str(overrides))
+    with selector_pool(workers=1) as pool:
+        records = pool.submit(parse_property_listings, PAGE).result(timeout=60)
+    assert records[0]["price"] == 300000
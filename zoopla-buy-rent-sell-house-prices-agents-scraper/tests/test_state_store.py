@@ -0,0 +1,149 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from conftest import SRC_DIR, Site
+from utils.checkpoint import CrawlCheckpoint
+from utils.state_store import CHANGE_FIELD, ListingStateStore
+from utils.writers import open_writer
+
+def listing(key: str, price: int) -> Dict[str, Any]:
+    return {"listingId": key, "price": price}
+
+def run_delta(store: ListingStateStore, records: List[Dict[str, Any]], complete: bool = True):
+    return [(r["listingId"], r[CHANGE_FIELD]) for r in store.delta(records, lambda: complete)]
+
+def test_delta_across_runs(tmp_path: Path) -> None:
+    path = str(tmp_path / "state.sqlite3")
+    store = ListingStateStore(path)
+    assert run_delta(store, [listing("1", 100), listing("2", 200)]) == [("1", "new"), ("2", "new")]
+    store.close()
+
+    store = ListingStateStore(path)
+    assert run_delta(store, [listing("1", 100), listing("3", 300)]) == [
+        ("3", "new"),
+        ("2", "removed"),
+    ]
+    store.close()
+
+    store = ListingStateStore(path)
+    assert run_delta(store, [listing("1", 150)], complete=False) == [("1", "changed")]
+    assert store.stats() == {"new": 0, "changed": 1, "unchanged": 0, "removed": 0}
+    store.close()
+
+def test_followed_store_commits_with_checkpoint(tmp_path: Path) -> None:
+    path = str(tmp_path / "state.sqlite3")
+    checkpoint = CrawlCheckpoint(tmp_path / "checkpoint.sqlite3")
+    progress = checkpoint.stream("property")
+    store = ListingStateStore(path)
+    with open_writer("jsonl", tmp_path, "property") as writer:
+        progress.follow(store)
+        progress.attach(writer)
+        records = store.delta(iter([listing("1", 100), listing("2", 200), listing("3", 300)]))
+        writer.write(next(records))
+        writer.write(next(records))
+        progress.page_done("page1", None, 2)
+        progress.save()
+        writer.write(next(records))
+        # Seen but past the saved offset: dies with the run.
+        store.close()
+    checkpoint.close()
+
+    store = ListingStateStore(path)
+    assert run_delta(store, [listing("1", 100), listing("2", 200), listing("3", 300)]) == [
+        ("3", "new")
+    ]
+    store.close()
+
+def test_resume_refused_when_store_does_not_match(tmp_path: Path) -> None:
+    checkpoint = CrawlCheckpoint(tmp_path / "checkpoint.sqlite3")
+    progress = checkpoint.stream("property")
+    store = ListingStateStore(str(tmp_path / "state.sqlite3"))
+    with open_writer("jsonl", tmp_path, "property") as writer:
+        progress.follow(store)
+        progress.attach(writer)
+        writer.write_all(store.delta(iter([listing("1", 100)])))
+        progress.page_done("page1", None, 1)
+        progress.save()
+    store.close()
+    checkpoint.close()
+
+    checkpoint = CrawlCheckpoint(tmp_path / "checkpoint.sqlite3", fresh=False)
+    store = ListingStateStore(str(tmp_path / "state.sqlite3"))
+    checkpoint.stream("property").follow(store)
+    store.close()
+    other = ListingStateStore(str(tmp_path / "other_state.sqlite3"))
+    with pytest.raises(ValueError, match="does not match the checkpoint"):
+        checkpoint.stream("property").follow(other)
+    other.close()
+    checkpoint.close()
+
+def incremental_run(site: Site, tmp_path: Path, **options: Any) -> List[str]:
+    """The command of a paginated incremental crawl of ``site``, writing to tmp_path/out."""
+    config = {
+        "mode": "property",
+        "property_urls": [f"{site.url}/p1.html"],
+        "agent_urls": [],
+        "house_price_urls": [],
+        "output_format": "jsonl",
+        "output_dir": str(tmp_path / "out"),
+        "max_items": 0,
+        "concurrency": 1,
+        "use_proxies": False,
+        "proxies": [],
+        "follow_pagination": True,
+        "parse_workers": 0,
+        "incremental": True,
+        **options,
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+    return [sys.executable, "main.py", "--config", str(config_path)]
+
+def output(tmp_path: Path) -> List[Dict[str, Any]]:
+    with (tmp_path / "out" / "properties.jsonl").open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_incremental_resume_after_kill(site: Site, tmp_path: Path) -> None:
+    # Page 61 hangs, so the run dies with 600 listings seen and no
+    # checkpoint saved after the start: the resumed run starts over and
+    # must still write every listing.
+    site.block_at = 61
+    command = incremental_run(site, tmp_path)
+    env = {**os.environ, "XDG_CACHE_HOME": str(tmp_path / "cache")}
+
+    first = subprocess.Popen(command, cwd=SRC_DIR, env=env, stderr=subprocess.DEVNULL)
+    try:
+        assert site.reached.wait(60), "the first run never reached page 61"
+    finally:
+        os.kill(first.pid, signal.SIGKILL)
+        first.wait()
+    site.gate.set()
+
+    subprocess.run(
+        command + ["--resume"], cwd=SRC_DIR, env=env, check=True, stderr=subprocess.DEVNULL
+    )
+    records = output(tmp_path)
+    assert sorted(r["listingId"] for r in records) == sorted(site.listing_ids())
+    assert {r[CHANGE_FIELD] for r in records} == {"new"}
+
+def test_incremental_with_cross_run_dedupe(site: Site, tmp_path: Path) -> None:
+    # The persisted index must not hide listings from the listing state,
+    # or an unchanged site reads as every listing removed.
+    site.pages = 3
+    command = incremental_run(
+        site, tmp_path, dedupe=True, dedupe_path=str(tmp_path / "seen.idx")
+    )
+    env = {**os.environ, "XDG_CACHE_HOME": str(tmp_path / "cache")}
+    subprocess.run(command, cwd=SRC_DIR, env=env, check=True, stderr=subprocess.DEVNULL)
+    assert {r[CHANGE_FIELD] for r in output(tmp_path)} == {"new"}
+    assert len(output(tmp_path)) == 30
+
+    subprocess.run(command, cwd=SRC_DIR, env=env, check=True, stderr=subprocess.DEVNULL)
+    assert output(tmp_path) == []
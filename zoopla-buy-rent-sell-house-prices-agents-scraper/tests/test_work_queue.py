@@ -0,0 +1,75 @@
+import time
+from pathlib import Path
+
+from utils.work_queue import WorkQueue
+
+def seeded_queue(tmp_path: Path, pages: int, **options: float) -> WorkQueue:
+    queue = WorkQueue(tmp_path / "queue.sqlite3", **options)
+    queue.seed({"property": [f"https://example.com/p{i}" for i in range(pages)]})
+    return queue
+
+def test_lease_shares_shallow_queue(tmp_path: Path) -> None:
+    queue = seeded_queue(tmp_path, 5)
+    for worker in ("a", "b", "c"):
+        queue.join(worker)
+    assert len(queue.lease("a", 10)) == 2
+    assert len(queue.lease("b", 10)) == 1
+    assert len(queue.lease("c", 10)) == 1
+    # Once the others have left, the last page is not held back.
+    queue.release("b")
+    queue.release("c")
+    assert len(queue.lease("a", 10)) == 3
+    queue.close()
+
+def test_lease_batch_caps_deep_queue(tmp_path: Path) -> None:
+    queue = seeded_queue(tmp_path, 100)
+    queue.join("a")
+    queue.join("b")
+    assert len(queue.lease("a", 10)) == 10
+    queue.close()
+
+def test_idle_worker_leaves_discarded_queue(tmp_path: Path) -> None:
+    queue = seeded_queue(tmp_path, 1)
+    worker = WorkQueue(queue.path)
+    worker.join("a")
+    (task,) = worker.lease("a", 10)
+    assert worker.complete("a", task, [{"listingId": "1"}])
+    queue.discard()
+    assert worker.finished
+    assert worker.lease("a", 10) == []
+    worker.release("a")
+    worker.close()
+
+def test_expired_lease_goes_to_another_worker(tmp_path: Path) -> None:
+    queue = seeded_queue(tmp_path, 2, lease_seconds=0.2)
+    first, second = queue.lease("a", 10)
+    time.sleep(0.3)
+    # Worker a stalled: b gets its pages, and a's late results are dropped.
+    assert queue.lease("b", 10) == [first, second]
+    assert not queue.complete("a", first, [{"listingId": "1"}])
+    assert queue.complete("b", first, [{"listingId": "1"}])
+    assert queue.counts()["leased"] == 1
+    queue.close()
+
+def test_acknowledgement_renews_other_leases(tmp_path: Path) -> None:
+    queue = seeded_queue(tmp_path, 2, lease_seconds=0.4)
+    first, second = queue.lease("a", 10)
+    time.sleep(0.25)
+    assert queue.complete("a", first, [])
+    time.sleep(0.25)
+    assert queue.lease("b", 10) == []
+    assert queue.complete("a", second, [])
+    queue.close()
+
+def test_page_fails_after_max_attempts(tmp_path: Path) -> None:
+    queue = seeded_queue(tmp_path, 1, lease_seconds=0.05, max_attempts=2)
+    for worker in ("a", "b"):
+        assert len(queue.lease(worker, 10)) == 1
+        time.sleep(0.1)
+    assert queue.lease("c", 10) == []
+    assert queue.counts()["failed"] == 1
+    assert queue.finished
+    (entry,) = queue.failures()
+    assert entry["error_class"] == "lease_expired"
+    assert entry["attempts"] == 2
+    queue.close()